@@ -3,13 +3,30 @@ Marketing Attribution Models - Streamlit Application
 Demonstrates "Last Touch" vs "U-Shaped" attribution with Navigation Filter
 """
 
+import json
+import time
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import random
+
+from attribution_cube import AttributionCube
+from attribution_engine import ConversionTouches
+from background_jobs import POLL_SECONDS, JobRunner, render_job_status, shared_executor
+from bootstrap import bootstrap_credit
+from data_export import channel_credit_frame, columnar_extension, export_bytes, journey_credit_frame
+from attribution_models import (apply_last_touch_attribution, apply_smart_attribution, apply_time_decay_attribution,
+                                generate_synthetic_data, get_top_conversion_paths)
+from navigation_index import build_smart_index
+from instrumentation import PROCESS_TRACER, TRACER, Tracer, bind_tracer, render_timings
+from path_trie import PathTrie
+from result_cache import ResultCache, dataset_fingerprint
+from touch_filters import RuleEvaluator, TouchRule, app_navigation_rule, parse_rules
+
+# Seed of the synthetic dataset until a session regenerates it
+DATA_SEED = 42
 
 # Page configuration
 st.set_page_config(
@@ -18,324 +35,6 @@ st.set_page_config(
     layout="wide"
 )
 
-def generate_synthetic_data(num_users=500):
-    """
-    Generate synthetic user journey data with realistic scenarios.
-    
-    Scenario A: Digital -> Push -> TM -> Conversion (Strong TM influence)
-    Scenario B: Digital -> Stories (clicked 30 sec before conversion) -> Conversion (Navigation problem)
-    """
-    
-    channels = ["Digital Ads", "Stories", "Push", "SMS", "Telemarketing"]
-    data = []
-    user_id = 1
-    
-    # Scenario A: Digital -> Push -> Telemarketing -> Conversion (40% of conversions)
-    for _ in range(100):
-        base_time = datetime.now() - timedelta(days=random.randint(1, 30))
-        journey = [
-            {
-                "User_ID": user_id,
-                "Channel": "Digital Ads",
-                "Interaction_Time": base_time,
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Push",
-                "Interaction_Time": base_time + timedelta(hours=random.randint(2, 24)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Telemarketing",
-                "Interaction_Time": base_time + timedelta(hours=random.randint(25, 48)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Telemarketing",  # Final conversion event
-                "Interaction_Time": base_time + timedelta(hours=random.randint(48, 50)),
-                "Converted": True,
-                "Conversion_Value": random.randint(5000, 50000)
-            }
-        ]
-        data.extend(journey)
-        user_id += 1
-    
-    # Scenario B: Digital -> Stories (navigation) -> Conversion (30% of conversions)
-    # Stories clicked 20-60 seconds before conversion (the "navigation problem")
-    for _ in range(75):
-        base_time = datetime.now() - timedelta(days=random.randint(1, 30))
-        journey = [
-            {
-                "User_ID": user_id,
-                "Channel": "Digital Ads",
-                "Interaction_Time": base_time,
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Stories",
-                "Interaction_Time": base_time + timedelta(hours=random.randint(5, 24)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Stories",  # Navigation click - very close to conversion
-                "Interaction_Time": base_time + timedelta(hours=24, seconds=random.randint(-60, -20)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Stories",  # Final conversion event
-                "Interaction_Time": base_time + timedelta(hours=24),
-                "Converted": True,
-                "Conversion_Value": random.randint(5000, 50000)
-            }
-        ]
-        data.extend(journey)
-        user_id += 1
-    
-    # Scenario C: SMS -> Push -> Conversion (15% of conversions)
-    for _ in range(38):
-        base_time = datetime.now() - timedelta(days=random.randint(1, 30))
-        journey = [
-            {
-                "User_ID": user_id,
-                "Channel": "SMS",
-                "Interaction_Time": base_time,
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Push",
-                "Interaction_Time": base_time + timedelta(hours=random.randint(12, 48)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Push",  # Final conversion event
-                "Interaction_Time": base_time + timedelta(hours=random.randint(48, 72)),
-                "Converted": True,
-                "Conversion_Value": random.randint(5000, 50000)
-            }
-        ]
-        data.extend(journey)
-        user_id += 1
-    
-    # Scenario D: Digital -> Stories (legitimate) -> Telemarketing -> Conversion (15% of conversions)
-    # Stories clicked hours before conversion (legitimate marketing influence)
-    for _ in range(37):
-        base_time = datetime.now() - timedelta(days=random.randint(1, 30))
-        journey = [
-            {
-                "User_ID": user_id,
-                "Channel": "Digital Ads",
-                "Interaction_Time": base_time,
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Stories",
-                "Interaction_Time": base_time + timedelta(hours=random.randint(6, 24)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Telemarketing",
-                "Interaction_Time": base_time + timedelta(hours=random.randint(25, 48)),
-                "Converted": False,
-                "Conversion_Value": 0
-            },
-            {
-                "User_ID": user_id,
-                "Channel": "Telemarketing",  # Final conversion event
-                "Interaction_Time": base_time + timedelta(hours=random.randint(48, 72)),
-                "Converted": True,
-                "Conversion_Value": random.randint(5000, 50000)
-            }
-        ]
-        data.extend(journey)
-        user_id += 1
-    
-    # Add some non-converting users (noise)
-    for _ in range(250):
-        base_time = datetime.now() - timedelta(days=random.randint(1, 30))
-        num_touches = random.randint(1, 4)
-        for i in range(num_touches):
-            data.append({
-                "User_ID": user_id,
-                "Channel": random.choice(channels),
-                "Interaction_Time": base_time + timedelta(hours=i * random.randint(1, 24)),
-                "Converted": False,
-                "Conversion_Value": 0
-            })
-        user_id += 1
-    
-    df = pd.DataFrame(data)
-    df = df.sort_values(['User_ID', 'Interaction_Time']).reset_index(drop=True)
-    
-    return df
-
-
-def apply_last_touch_attribution(df):
-    """
-    Simple Last Touch Attribution: Credit goes to the last channel before conversion.
-    No filtering applied.
-    """
-    # Get only converted users
-    converted_users = df[df['Converted'] == True]['User_ID'].unique()
-    
-    attribution_results = []
-    
-    for user in converted_users:
-        user_journey = df[df['User_ID'] == user].sort_values('Interaction_Time')
-        
-        # Get the conversion event
-        conversion_event = user_journey[user_journey['Converted'] == True].iloc[0]
-        conversion_value = conversion_event['Conversion_Value']
-        
-        # Get the last touch channel (the channel of the conversion event itself)
-        last_channel = conversion_event['Channel']
-        
-        attribution_results.append({
-            'User_ID': user,
-            'Channel': last_channel,
-            'Attributed_Value': conversion_value
-        })
-    
-    attribution_df = pd.DataFrame(attribution_results)
-    channel_attribution = attribution_df.groupby('Channel')['Attributed_Value'].sum().reset_index()
-    channel_attribution.columns = ['Channel', 'Revenue']
-    
-    return channel_attribution
-
-
-def apply_smart_attribution(df, navigation_threshold_seconds, first_weight, last_weight, middle_weight):
-    """
-    Smart Attribution: U-Shaped model with Navigation Filter
-    
-    1. First, filter out "Stories" clicks that happened within navigation_threshold_seconds of conversion
-    2. Then apply U-Shaped attribution to remaining touchpoints
-    
-    U-Shaped weights:
-    - First Touch: first_weight (default 0.4)
-    - Last Touch: last_weight (default 0.4)
-    - Middle Touches: middle_weight divided equally (default 0.2 total)
-    """
-    converted_users = df[df['Converted'] == True]['User_ID'].unique()
-    
-    attribution_results = []
-    
-    for user in converted_users:
-        user_journey = df[df['User_ID'] == user].sort_values('Interaction_Time')
-        
-        # Get the conversion event
-        conversion_event = user_journey[user_journey['Converted'] == True].iloc[0]
-        conversion_value = conversion_event['Conversion_Value']
-        conversion_time = conversion_event['Interaction_Time']
-        
-        # Get all touchpoints before conversion (excluding the conversion event itself)
-        touchpoints = user_journey[user_journey['Converted'] == False].copy()
-        
-        if len(touchpoints) == 0:
-            # Edge case: only conversion event exists, credit it fully
-            attribution_results.append({
-                'User_ID': user,
-                'Channel': conversion_event['Channel'],
-                'Attributed_Value': conversion_value
-            })
-            continue
-        
-        # NAVIGATION FILTER: Remove "Stories" clicks within threshold
-        touchpoints['Time_to_Conversion'] = (conversion_time - touchpoints['Interaction_Time']).dt.total_seconds()
-        
-        # Filter out Stories that are too close to conversion (navigation clicks)
-        filtered_touchpoints = touchpoints[
-            ~((touchpoints['Channel'] == 'Stories') & 
-              (touchpoints['Time_to_Conversion'] <= navigation_threshold_seconds))
-        ].copy()
-        
-        if len(filtered_touchpoints) == 0:
-            # If all touchpoints were filtered, credit the conversion event channel
-            attribution_results.append({
-                'User_ID': user,
-                'Channel': conversion_event['Channel'],
-                'Attributed_Value': conversion_value
-            })
-            continue
-        
-        # U-SHAPED ATTRIBUTION on filtered touchpoints
-        num_touchpoints = len(filtered_touchpoints)
-        
-        # Calculate attribution for each touchpoint
-        for idx, (_, touchpoint) in enumerate(filtered_touchpoints.iterrows()):
-            if num_touchpoints == 1:
-                # Only one touchpoint: give it full credit
-                weight = 1.0
-            elif num_touchpoints == 2:
-                # Two touchpoints: split between first and last
-                weight = first_weight if idx == 0 else last_weight
-            else:
-                # Three or more touchpoints: U-shaped distribution
-                if idx == 0:
-                    # First touch
-                    weight = first_weight
-                elif idx == num_touchpoints - 1:
-                    # Last touch
-                    weight = last_weight
-                else:
-                    # Middle touches: distribute middle_weight equally
-                    num_middle = num_touchpoints - 2
-                    weight = middle_weight / num_middle
-            
-            attributed_value = conversion_value * weight
-            
-            attribution_results.append({
-                'User_ID': user,
-                'Channel': touchpoint['Channel'],
-                'Attributed_Value': attributed_value
-            })
-    
-    attribution_df = pd.DataFrame(attribution_results)
-    channel_attribution = attribution_df.groupby('Channel')['Attributed_Value'].sum().reset_index()
-    channel_attribution.columns = ['Channel', 'Revenue']
-    
-    return channel_attribution
-
-
-def get_top_conversion_paths(df, top_n=5):
-    """
-    Get the most common conversion paths.
-    """
-    converted_users = df[df['Converted'] == True]['User_ID'].unique()
-    
-    paths = []
-    for user in converted_users:
-        user_journey = df[df['User_ID'] == user].sort_values('Interaction_Time')
-        # Exclude the final conversion event, just get the touchpoint sequence
-        touchpoints = user_journey[user_journey['Converted'] == False]['Channel'].tolist()
-        path_string = ' → '.join(touchpoints) if touchpoints else 'Direct'
-        paths.append(path_string)
-    
-    path_df = pd.DataFrame({'Path': paths})
-    path_counts = path_df['Path'].value_counts().head(top_n).reset_index()
-    path_counts.columns = ['Conversion Path', 'Count']
-    
-    return path_counts
-
-
 # ============================
 # STREAMLIT APP
 # ============================
@@ -392,29 +91,187 @@ weights_sum = first_touch_weight + last_touch_weight + middle_weight
 if abs(weights_sum - 1.0) > 0.01:
     st.sidebar.warning(f"⚠️ Weights sum to {weights_sum:.2f}, should be 1.0")
 
+# Extra drop rules on top of the Stories Navigation Filter (touch_filters.py)
+with st.sidebar.expander("🧹 Extra Touch Filters"):
+    drop_push = st.checkbox("Drop Push opened shortly before conversion")
+    push_seconds = st.slider("Push Window (Seconds)", 0, 600, 30, 10, disabled=not drop_push)
+    drop_sms = st.checkbox("Drop repeated SMS")
+    sms_minutes = st.slider("SMS Repeat Window (Minutes)", 1, 1440, 60, disabled=not drop_sms)
+
+extra_rules = []
+if drop_push:
+    extra_rules.append(TouchRule('push_open', channel='Push', max_seconds=push_seconds))
+if drop_sms:
+    extra_rules.append(TouchRule('sms_repeat', channel='SMS', repeat_within_seconds=sms_minutes * 60))
+rules_spec = [rule.to_dict() for rule in extra_rules]
+
+st.sidebar.markdown("---")
+st.sidebar.subheader("Time-Decay Model")
+
+half_life_hours = st.sidebar.slider(
+    "Half-Life (Hours)",
+    min_value=1,
+    max_value=72,
+    value=24,
+    step=1,
+    help="A touch this many hours further from conversion gets half the credit."
+)
+
 st.sidebar.markdown("---")
 
-# Generate Data button
+# Generate Data button: a new seed for this session (the default one is shared)
 if st.sidebar.button("🔄 Regenerate Data"):
     st.cache_data.clear()
+    st.session_state.data_seed = int(np.random.default_rng().integers(2**31))
+data_seed = st.session_state.get('data_seed', DATA_SEED)
+
+# Stage timings: spans / counters of this session's rerun (instrumentation.py);
+# the tracer is bound to this script thread, so other sessions never touch it
+if 'tracer' not in st.session_state:
+    st.session_state.tracer = Tracer(enabled=PROCESS_TRACER.enabled)
+tracer = st.session_state.tracer
+show_timings = st.sidebar.checkbox("⏱️ Show stage timings", value=tracer.enabled)
+tracer.enable(show_timings)
+tracer.reset()
+bind_tracer(tracer)
+
+# Generate synthetic data: seeded and dated to the day, so every process
+# generates the same dataset and shares its result cache entries
+@st.cache_data
+def load_data(seed):
+    return generate_synthetic_data(num_users=500, seed=seed, reference_time=pd.Timestamp.now().normalize())
+
+@st.cache_data
+def load_touches(seed):
+    return ConversionTouches(load_data(seed))
 
-# Generate synthetic data
 @st.cache_data
-def load_data():
-    return generate_synthetic_data(num_users=500)
+def load_fingerprint(seed):
+    return dataset_fingerprint(load_data(seed))
 
-df = load_data()
+# Results shared on disk by every session / process, keyed by dataset content and parameters
+@st.cache_resource
+def load_result_cache():
+    return ResultCache()
+
+result_cache = load_result_cache()
+
+# Threshold index: moving the navigation slider or any weight slider is a
+# lookup plus a basis combination, not a recompute
+@st.cache_data
+def load_smart_index(seed):
+    return result_cache.get_or_compute(load_fingerprint(seed), 'smart_index', {},
+                                       lambda: build_smart_index(load_touches(seed)))
+
+# The same index with the extra touch rules' drops applied at every threshold
+@st.cache_data
+def load_rules_index(seed, rules_spec):
+    touches = load_touches(seed)
+    evaluator = load_rule_evaluator(touches, load_fingerprint(seed))
+    return result_cache.get_or_compute(
+        load_fingerprint(seed), 'smart_index', {'rules': rules_spec},
+        lambda: build_smart_index(touches, keep=evaluator.keep_mask(parse_rules(rules_spec)))
+    )
+
+# Per-rule masks are cached, so toggling one rule leaves the others alone
+@st.cache_resource
+def load_rule_evaluator(_touches, fingerprint):
+    return RuleEvaluator(_touches)
+
+# Channel x conversion day cube; the attribution job builds each (model, parameters)
+# slice once, and the least recently used ones are dropped
+@st.cache_resource
+def load_cube(_touches, fingerprint):
+    return AttributionCube(_touches.channels)
+
+df = load_data(data_seed)
+touches = load_touches(data_seed)
+fingerprint = load_fingerprint(data_seed)
+smart_index = load_smart_index(data_seed)
+cube = load_cube(touches, fingerprint)
+weights = (first_touch_weight, last_touch_weight, middle_weight)
 
 # Calculate attributions
-last_touch_attribution = apply_last_touch_attribution(df)
-smart_attribution = apply_smart_attribution(
-    df, 
-    nav_threshold, 
-    first_touch_weight, 
-    last_touch_weight, 
-    middle_weight
+last_touch_attribution = result_cache.get_or_compute(
+    fingerprint, 'last_touch', {},
+    lambda: apply_last_touch_attribution(df, touches)
 )
 
+# Parameter-dependent models run as background jobs (background_jobs.py): a
+# slider move supersedes the running job, and the page keeps showing the last
+# finished result until the new one is ready
+def compute_attribution(token, nav_threshold, weights, extra_rules, half_life_hours, evaluator):
+    token.report(0.0, 'Smart Attribution')
+    with TRACER.span('app.smart_attribution'):
+        if extra_rules:
+            smart_attribution = result_cache.get_or_compute(
+                fingerprint, 'smart',
+                {'navigation_threshold': nav_threshold, 'weights': weights,
+                 'rules': [rule.to_dict() for rule in extra_rules]},
+                lambda: apply_smart_attribution(df, nav_threshold, *weights, touches=touches, rules=extra_rules,
+                                                evaluator=evaluator)
+            )
+        else:
+            smart_attribution = result_cache.get_or_compute(
+                fingerprint, 'smart', {'navigation_threshold': nav_threshold, 'weights': weights},
+                lambda: touches.to_frame(*smart_index.lookup(nav_threshold, *weights), value_name='Revenue')
+            )
+    token.report(0.5, 'Time Decay')
+    time_decay_attribution = result_cache.get_or_compute(
+        fingerprint, 'time_decay', {'half_life_hours': half_life_hours},
+        lambda: apply_time_decay_attribution(df, half_life_hours * 3600, touches)
+    )
+    # Date cube slices of these parameters (new ones cost a full-history pass)
+    token.report(0.7, 'Date cube')
+    smart_params = {'navigation_threshold_seconds': nav_threshold, 'first_weight': weights[0],
+                    'last_weight': weights[1], 'middle_weight': weights[2]}
+    smart_keep = None
+    if extra_rules:
+        # Same touches as the chart: the rules are part of the slice key
+        rules = [app_navigation_rule(nav_threshold)] + extra_rules
+        smart_params['rules'] = [rule.to_dict() for rule in rules]
+        smart_keep = evaluator.keep_mask(rules)
+    cube_models = {
+        'Last Touch': ('last_touch', {}, None),
+        'Smart Attribution': ('smart', smart_params, smart_keep),
+        'Time Decay': ('time_decay', {'half_life_seconds': half_life_hours * 3600}, None),
+    }
+    with TRACER.span('app.cube_build'):
+        cube_slices = {label: cube.add_slice(model, params, touches, keep)
+                       for label, (model, params, keep) in cube_models.items()}
+    return smart_attribution, time_decay_attribution, cube_slices
+
+if 'jobs' not in st.session_state:
+    st.session_state.jobs = JobRunner(shared_executor())
+jobs = st.session_state.jobs
+jobs.tracing = show_timings
+
+attribution_job = jobs.submit(
+    'attribution',
+    {'data': fingerprint, 'navigation_threshold': nav_threshold, 'weights': weights, 'rules': rules_spec,
+     'half_life_hours': half_life_hours},
+    compute_attribution, nav_threshold, weights, extra_rules, half_life_hours,
+    load_rule_evaluator(touches, fingerprint)
+)
+if jobs.last_finished('attribution') is None:
+    with st.spinner("Computing attribution..."):
+        attribution_job.wait()
+shown, fresh = jobs.display_result(attribution_job)
+render_job_status(st, attribution_job, showing_previous=shown is not None and not fresh)
+if shown is None:
+    st.stop()
+smart_attribution, time_decay_attribution, cube_slices = shown
+running_jobs = [attribution_job]
+TRACER.count('app.rows', len(df))
+
+cache_stats = result_cache.stats()
+with st.sidebar.expander("🗄️ Result Cache"):
+    st.write(f"Hits: {cache_stats['hits']:,} · Misses: {cache_stats['misses']:,} (all sessions)")
+    st.write(f"This server process: {cache_stats['process_hits']:,} hits / "
+             f"{cache_stats['process_misses']:,} misses")
+    st.write(f"{cache_stats['entries']:,} entries, {cache_stats['bytes'] / 2**20:.1f} of "
+             f"{cache_stats['max_bytes'] / 2**20:.0f} MB")
+
 # ============================
 # VISUALIZATION 1: Model Comparison
 # ============================
@@ -428,36 +285,41 @@ comparison_df.columns = ['Channel', 'Last Touch']
 smart_df = smart_attribution.copy()
 smart_df.columns = ['Channel', 'Smart Attribution']
 
-merged = pd.merge(comparison_df, smart_df, on='Channel', how='outer').fillna(0)
+decay_df = time_decay_attribution.copy()
+decay_df.columns = ['Channel', 'Time Decay']
+
+merged = pd.merge(comparison_df, smart_df, on='Channel', how='outer')
+merged = pd.merge(merged, decay_df, on='Channel', how='outer').fillna(0)
 
 # Melt for grouped bar chart
 melted = merged.melt(id_vars='Channel', var_name='Model', value_name='Revenue')
 
 # Create grouped bar chart
-fig = px.bar(
-    melted,
-    x='Channel',
-    y='Revenue',
-    color='Model',
-    barmode='group',
-    title='Revenue Attribution: Last Touch vs Smart Attribution (U-Shaped + Navigation Filter)',
-    labels={'Revenue': 'Attributed Revenue ($)', 'Channel': 'Marketing Channel'},
-    color_discrete_map={'Last Touch': '#FF6B6B', 'Smart Attribution': '#4ECDC4'},
-    height=500
-)
+with TRACER.span('app.plotly_render', chart='comparison'):
+    fig = px.bar(
+        melted,
+        x='Channel',
+        y='Revenue',
+        color='Model',
+        barmode='group',
+        title='Revenue Attribution: Last Touch vs Smart Attribution (U-Shaped + Navigation Filter) vs Time Decay',
+        labels={'Revenue': 'Attributed Revenue ($)', 'Channel': 'Marketing Channel'},
+        color_discrete_map={'Last Touch': '#FF6B6B', 'Smart Attribution': '#4ECDC4', 'Time Decay': '#FFD166'},
+        height=500
+    )
 
-fig.update_layout(
-    xaxis_tickangle=-45,
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="right",
-        x=1
+    fig.update_layout(
+        xaxis_tickangle=-45,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
     )
-)
 
-st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True)
 
 # Show the difference
 st.subheader("📊 Attribution Difference (Smart - Last Touch)")
@@ -478,52 +340,186 @@ st.dataframe(
     merged.style.format({
         'Last Touch': '${:,.0f}',
         'Smart Attribution': '${:,.0f}',
+        'Time Decay': '${:,.0f}',
         'Difference': '${:,.0f}',
         'Difference %': '{:.1f}%'
     }),
     use_container_width=True
 )
 
+# Navigation threshold sensitivity over the whole slider range
+st.subheader("🎚️ Navigation Threshold Sensitivity")
+
+sweep_index = load_rules_index(data_seed, rules_spec) if extra_rules else smart_index
+threshold_curve = sweep_index.sweep(*weights, thresholds=np.arange(0, 301, 10))
+with TRACER.span('app.plotly_render', chart='sweep'):
+    fig_sweep = px.line(
+        threshold_curve,
+        labels={'Threshold': 'Navigation Threshold (Seconds)', 'value': 'Attributed Revenue ($)', 'variable': 'Channel'},
+        title='Smart Attribution by Navigation Threshold',
+        height=400
+    )
+    fig_sweep.add_vline(x=nav_threshold, line_dash='dash', line_color='gray')
+
+    st.plotly_chart(fig_sweep, use_container_width=True)
+
 # ============================
 # VISUALIZATION 2: Top Conversion Paths
 # ============================
 
 st.header("🛤️ Top Conversion Paths")
 
-top_paths = get_top_conversion_paths(df, top_n=10)
-
-fig2 = px.bar(
-    top_paths,
-    x='Count',
-    y='Conversion Path',
-    orientation='h',
-    title='Most Common Customer Journeys to Conversion',
-    labels={'Count': 'Number of Conversions', 'Conversion Path': 'Customer Journey'},
-    color='Count',
-    color_continuous_scale='Viridis',
-    height=400
+@st.cache_data
+def load_path_trie(seed):
+    return result_cache.get_or_compute(load_fingerprint(seed), 'path_trie', {},
+                                       lambda: PathTrie(load_touches(seed).journey_batch()))
+
+path_trie = load_path_trie(data_seed)
+top_paths = result_cache.get_or_compute(
+    fingerprint, 'top_paths', {'top_n': 10},
+    lambda: get_top_conversion_paths(df, top_n=10, trie=path_trie)
 )
 
-fig2.update_layout(yaxis={'categoryorder': 'total ascending'})
+with TRACER.span('app.plotly_render', chart='top_paths'):
+    fig2 = px.bar(
+        top_paths,
+        x='Count',
+        y='Conversion Path',
+        orientation='h',
+        title='Most Common Customer Journeys to Conversion',
+        labels={'Count': 'Number of Conversions', 'Conversion Path': 'Customer Journey'},
+        color='Count',
+        color_continuous_scale='Viridis',
+        height=400
+    )
+
+    fig2.update_layout(yaxis={'categoryorder': 'total ascending'})
+
+    st.plotly_chart(fig2, use_container_width=True)
+
+# Drill-down: what follows a chosen path prefix
+drill_prefix = st.multiselect(
+    "Drill down: paths starting with",
+    options=path_trie.channels.names,
+    help="Pick channels in order, e.g. Digital Ads then Stories."
+)
+
+col1, col2 = st.columns(2)
 
-st.plotly_chart(fig2, use_container_width=True)
+with col1:
+    st.metric(
+        "Conversions with this prefix",
+        f"{path_trie.prefix_count(drill_prefix):,}",
+        f"${path_trie.prefix_revenue(drill_prefix):,.0f} revenue",
+        delta_color="off"
+    )
+
+with col2:
+    st.dataframe(
+        path_trie.next_steps(drill_prefix).style.format({'Revenue': '${:,.0f}'}),
+        use_container_width=True
+    )
+
+# ============================
+# VISUALIZATION 3: Attribution by Conversion Date
+# ============================
+
+st.header("📅 Attribution by Conversion Date")
+
+# The slices come with the attribution job's result (built on its worker)
+first_day, last_day = cube.days
+date_range = st.slider(
+    "Conversion dates",
+    min_value=first_day.astype(object),
+    max_value=last_day.astype(object),
+    value=(first_day.astype(object), last_day.astype(object)),
+    help="Each range is a difference of daily prefix sums, no recompute."
+)
+
+range_rows = []
+for label, cube_slice in cube_slices.items():
+    revenue, conversions = cube_slice.range_totals(*date_range)
+    for code in np.flatnonzero(revenue):
+        range_rows.append((label, touches.channels[code], revenue[code], conversions[code]))
+range_attribution = pd.DataFrame(range_rows, columns=['Model', 'Channel', 'Revenue', 'Conversions'])
+
+with TRACER.span('app.plotly_render', chart='date_range'):
+    fig_range = px.bar(
+        range_attribution,
+        x='Channel',
+        y='Revenue',
+        color='Model',
+        barmode='group',
+        hover_data={'Conversions': ':.1f'},
+        title=f'Attributed Revenue, Conversions {date_range[0]:%b %d} - {date_range[1]:%b %d}',
+        color_discrete_map={'Last Touch': '#FF6B6B', 'Smart Attribution': '#4ECDC4', 'Time Decay': '#FFD166'},
+        height=400
+    )
+    st.plotly_chart(fig_range, use_container_width=True)
 
 # ============================
 # DATA TABLE
 # ============================
 
-st.header("📋 Raw Data")
+st.header("📋 Raw Data & Export")
 
 show_data = st.checkbox("Show raw interaction data")
 
 if show_data:
     st.dataframe(df, use_container_width=True)
-    
+
+EXPORT_TABLES = {
+    'Raw events': 'attribution_data',
+    'Per-user credits': 'attribution_credits',
+    'Per-channel results': 'attribution_results',
+}
+
+# Export files are only built when asked for, once per dataset and parameters;
+# both credit tables are computed here from `_models` (never from results on
+# screen, which may still be the previous parameters' while a job runs)
+@st.cache_data(max_entries=8, show_spinner="Preparing export...")
+def load_export(fingerprint, table, fmt, params_key, _models):
+    if table == 'Raw events':
+        frame = load_data(data_seed)
+    elif table == 'Per-user credits':
+        frame = journey_credit_frame(load_touches(data_seed), _models)
+    else:
+        frame = channel_credit_frame(load_touches(data_seed), _models)
+    return export_bytes(frame, fmt, EXPORT_TABLES[table])
+
+col1, col2 = st.columns(2)
+
+with col1:
+    export_table = st.selectbox("Export", list(EXPORT_TABLES))
+
+with col2:
+    export_format = st.radio(
+        "Format", ['csv', 'columnar'], horizontal=True,
+        format_func=lambda fmt: 'CSV' if fmt == 'csv' else f'Compressed columnar ({columnar_extension()})'
+    )
+
+export_params = '' if export_table == 'Raw events' else json.dumps(
+    [nav_threshold, weights, rules_spec, half_life_hours], default=str
+)
+export_request = (fingerprint, export_table, export_format, export_params)
+if st.button("📦 Prepare download"):
+    st.session_state.export_request = export_request
+
+if st.session_state.get('export_request') == export_request:
+    keep = load_rule_evaluator(touches, fingerprint).keep_mask(
+        [app_navigation_rule(nav_threshold)] + extra_rules) if extra_rules else None
+    export_models = {
+        'Last Touch': ('last_touch', {}),
+        'Smart Attribution': ('smart', {'navigation_threshold_seconds': nav_threshold, 'first_weight': weights[0],
+                                        'last_weight': weights[1], 'middle_weight': weights[2], 'keep': keep}),
+        'Time Decay': ('time_decay', {'half_life_seconds': half_life_hours * 3600}),
+    }
+    data, file_name, mime = load_export(*export_request, export_models)
     st.download_button(
-        label="📥 Download Data as CSV",
-        data=df.to_csv(index=False).encode('utf-8'),
-        file_name='attribution_data.csv',
-        mime='text/csv'
+        label=f"📥 Download {file_name} ({len(data) / 1e6:,.1f} MB)",
+        data=data,
+        file_name=file_name,
+        mime=mime
     )
 
 # ============================
@@ -564,6 +560,39 @@ with col3:
         total_conversions
     )
 
+# Uncertainty of the per-channel totals: one multinomial resample matrix for both models
+show_intervals = st.checkbox("📏 Show 95% bootstrap intervals (1,000 resamples of converted users)")
+
+if show_intervals:
+    def compute_intervals(token, nav_threshold, weights, extra_rules, evaluator):
+        keep = None
+        if extra_rules:
+            token.report(0.1, 'Applying touch filters')
+            keep = evaluator.keep_mask([app_navigation_rule(nav_threshold)] + extra_rules)
+        token.report(0.2, 'Resampling converted users')
+        intervals = bootstrap_credit(touches, {
+            'last_touch': {},
+            'smart': {'navigation_threshold_seconds': nav_threshold, 'first_weight': weights[0],
+                      'last_weight': weights[1], 'middle_weight': weights[2], 'keep': keep},
+        }, seed=0, token=token)
+        intervals['Model'] = intervals['Model'].map({'last_touch': 'Last Touch', 'smart': 'Smart Attribution'})
+        return intervals
+
+    intervals_job = jobs.submit(
+        'intervals',
+        {'data': fingerprint, 'navigation_threshold': nav_threshold, 'weights': weights, 'rules': rules_spec},
+        compute_intervals, nav_threshold, weights, extra_rules, load_rule_evaluator(touches, fingerprint)
+    )
+    running_jobs.append(intervals_job)
+    intervals, fresh_intervals = jobs.display_result(intervals_job)
+    render_job_status(st, intervals_job, showing_previous=intervals is not None and not fresh_intervals)
+    if intervals is not None:
+        st.dataframe(
+            intervals.style.format({'Estimate': '${:,.0f}', 'Lower': '${:,.0f}', 'Upper': '${:,.0f}',
+                                    'Std Error': '${:,.0f}'}),
+            use_container_width=True
+        )
+
 st.info(
     f"""
     **Navigation Threshold Impact:** With a {nav_threshold}-second threshold, "Stories" clicks 
@@ -575,3 +604,17 @@ st.info(
     among middle touches. This better reflects the entire customer journey.
     """
 )
+
+# ============================
+# STAGE TIMINGS
+# ============================
+
+if tracer.enabled:
+    # Plus the background jobs whose results are on screen (each traces into its own tracer)
+    shown_jobs = {job.slot: jobs.last_finished(job.slot) for job in running_jobs}
+    render_timings(st.sidebar, tracer, {slot: job.tracer for slot, job in shown_jobs.items() if job is not None})
+
+# Poll until the background jobs shown on this page have finished
+if any(not job.finished_or_failed for job in running_jobs):
+    time.sleep(POLL_SECONDS)
+    st.rerun()
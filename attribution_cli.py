@@ -0,0 +1,286 @@
+"""
+Attribution Batch CLI
+Headless command-line entry point over the attribution core, for scheduled
+batch jobs. Reads an event or journey file, runs the selected models and
+writes per-channel results as CSV (long format: Model, Channel, Revenue) or JSON.
+
+    python attribution_cli.py events.csv --models last_touch smart --output results.csv
+    python attribution_cli.py journeys.csv --models u_shape weighted_score --scores "Telemarketing=4,Push=2"
+    python attribution_cli.py loans.xlsx --models u_shape top_paths --output results.json
+    python attribution_cli.py store_dir/ --models smart --navigation-threshold 90 --weights 0.5 0.3 0.2
+
+Inputs (detected from the path, or --format):
+    events    interaction log CSV/Parquet (User_ID, Channel, Interaction_Time, Converted, Conversion_Value)
+    journeys  journey CSV/Parquet with a Journey_List column ("A → B → C") and optional Revenue /
+              Loan_Amount and Time_To_Convert_Seconds
+    store     journey_store.py directory (read in chunks through memory maps)
+    workbook  cash_loan + channel sheets (.xlsx or CSV directory), one journey per loan
+
+Models:
+    last_touch      last channel takes the revenue (app / dashboard Legacy Last Touch)
+    smart           Navigation Filter + U-Shape (app rules for events, dashboard rules for journeys)
+    time_decay      exponential Time-Decay by seconds to conversion (events only, --half-life)
+    u_shape         deduplicated U-Shape (attribution_logic)
+    weighted_score  deduplicated Weighted Score (attribution_logic, needs --scores)
+    markov          Markov-chain removal effect on deduplicated paths (markov_attribution)
+    shapley         Shapley values of each journey's channel set (shapley_attribution)
+    top_paths       most common paths with counts and revenue
+
+Default models: last_touch and smart; last_touch and u_shape for workbooks,
+which have no seconds to convert. A default 'smart' is skipped with a warning
+on journeys without a Time_To_Convert_Seconds column.
+
+Only NumPy / pandas and the attribution modules are imported, and only after
+the arguments are parsed, so --help and cold starts stay fast.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+FORMATS = ('events', 'journeys', 'store', 'workbook')
+MODELS = ('last_touch', 'smart', 'time_decay', 'u_shape', 'weighted_score', 'markov', 'shapley', 'top_paths')
+PATH_SEPARATORS = (' → ', '->', '>', ',')
+DEFAULT_MODELS = {'events': ('last_touch', 'smart'), 'journeys': ('last_touch', 'smart'),
+                  'store': ('last_touch', 'smart'), 'workbook': ('last_touch', 'u_shape')}
+SECONDS_COLUMN = 'Time_To_Convert_Seconds'
+
+
+def detect_format(path):
+    if os.path.isdir(path):
+        return 'store' if os.path.exists(os.path.join(path, 'manifest.json')) else 'workbook'
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        return 'workbook'
+    columns = _parquet_columns(path) if path.lower().endswith('.parquet') else _read_table(path, nrows=0).columns
+    return 'journeys' if 'Journey_List' in columns else 'events'
+
+
+def _parquet_columns(path):
+    """Column names from the Parquet footer, without reading the data."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        from fastparquet import ParquetFile
+        return ParquetFile(path).columns
+    return pq.read_schema(path).names
+
+
+def _read_table(path, **kwargs):
+    import pandas as pd
+    if path.lower().endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, **kwargs)
+
+
+def _parse_path(value):
+    """A Journey_List cell: a list, a list literal, or channels joined by a separator."""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if not isinstance(value, str) or not value.strip():
+        return []
+    text = value.strip()
+    if text.startswith('['):
+        import ast
+        return list(ast.literal_eval(text))
+    for separator in PATH_SEPARATORS:
+        if separator in text:
+            return [part.strip() for part in text.split(separator) if part.strip()]
+    return [text]
+
+
+def parse_scores(text):
+    """'Telemarketing=4,Push=2' or a JSON object -> {channel: score}."""
+    if not text:
+        return None
+    if text.lstrip().startswith('{'):
+        return json.loads(text)
+    scores = {}
+    for item in text.split(','):
+        name, _, score = item.partition('=')
+        scores[name.strip()] = float(score)
+    return scores
+
+
+# ---- Runners: one per input kind, each returns ({model: {channel: value}}, top paths frame or None) ----
+
+def _runnable_models(args, columns):
+    """args.models without a default 'smart' the journeys have no seconds-to-convert column for."""
+    if args.default_models and 'smart' in args.models and SECONDS_COLUMN not in columns:
+        print(f"warning: no {SECONDS_COLUMN} column, skipping the default model 'smart'", file=sys.stderr)
+        return [model for model in args.models if model != 'smart']
+    return args.models
+
+
+def _journey_credit(batch, model, args, seconds_col=SECONDS_COLUMN):
+    from attribution_engine import (last_touch_credit, last_touch_navigation_credit, u_shape_credit,
+                                    weighted_score_credit)
+    if model == 'last_touch':
+        return last_touch_credit(batch)
+    if model == 'smart':
+        if seconds_col not in batch.columns:
+            raise SystemExit(f"model 'smart' on journeys needs a {seconds_col} column")
+        return last_touch_navigation_credit(batch, batch.columns[seconds_col], args.navigation_threshold,
+                                            *args.weights)
+    if model == 'time_decay':
+        raise SystemExit("model 'time_decay' needs per-touch times: use an events input")
+    if model == 'u_shape':
+        return u_shape_credit(batch.deduplicate(), *args.weights)
+    if model == 'markov':
+        from markov_attribution import markov_credit
+        return markov_credit(batch)
+    if model == 'shapley':
+        from shapley_attribution import shapley_credit
+        return shapley_credit(batch)
+    return weighted_score_credit(batch.deduplicate(), args.scores)
+
+
+def run_events(args):
+    from attribution_engine import ConversionTouches, smart_attribution_totals, time_decay_credit
+    from attribution_models import apply_last_touch_attribution
+    from path_trie import PathTrie
+
+    df = _read_table(args.input, parse_dates=['Interaction_Time']) \
+        if not args.input.lower().endswith('.parquet') else _read_table(args.input)
+    touches = ConversionTouches(df)
+    results, top_paths = {}, None
+    for model in args.models:
+        if model == 'last_touch':
+            frame = apply_last_touch_attribution(df, touches)
+            results[model] = dict(zip(frame['Channel'], frame['Revenue'].astype(float)))
+        elif model == 'smart':
+            totals, present = smart_attribution_totals(touches, args.navigation_threshold, *args.weights)
+            results[model] = touches.journey_batch().to_channel_dict(totals, present)
+        elif model == 'time_decay':
+            results[model] = touches.journey_batch().to_channel_dict(*time_decay_credit(touches, args.half_life))
+        elif model == 'top_paths':
+            top_paths = PathTrie(touches.journey_batch()).top_paths(args.top)
+        else:
+            batch = touches.journey_batch()
+            results[model] = batch.to_channel_dict(*_journey_credit(batch, model, args))
+    return results, top_paths
+
+
+def _run_batch(batch, args):
+    from path_trie import PathTrie
+    results, top_paths = {}, None
+    for model in _runnable_models(args, batch.columns):
+        if model == 'top_paths':
+            top_paths = PathTrie(batch).top_paths(args.top)
+        else:
+            results[model] = batch.to_channel_dict(*_journey_credit(batch, model, args))
+    return results, top_paths
+
+
+def run_journeys(args):
+    from attribution_engine import JourneyBatch
+
+    df = _read_table(args.input)
+    df['Journey_List'] = df['Journey_List'].map(_parse_path)
+    revenue_col = next((c for c in ('Revenue', 'Loan_Amount', 'Conversion_Value') if c in df.columns), 'Revenue')
+    columns = [c for c in (SECONDS_COLUMN,) if c in df.columns]
+    return _run_batch(JourneyBatch.from_dataframe(df, revenue_col=revenue_col, columns=columns), args)
+
+
+def run_workbook(args):
+    from ingestion import load_event_store
+    from journey_builder import build_loan_journeys
+
+    batch = build_loan_journeys(load_event_store(args.input, workers=args.workers))
+    return _run_batch(batch, args)
+
+
+def run_store(args):
+    from journey_store import JourneyStore
+    from path_trie import PathTrie
+
+    store = JourneyStore.open(args.input)
+    results, top_paths = {}, None
+    for model in _runnable_models(args, store.columns):
+        if model == 'top_paths':
+            top_paths = PathTrie(store.batch()).top_paths(args.top)
+        elif model in ('markov', 'shapley'):
+            # Fitted on all journeys at once, not summed per chunk
+            batch = store.batch()
+            results[model] = batch.to_channel_dict(*_journey_credit(batch, model, args))
+        else:
+            results[model] = store.reduce_credit(_journey_credit, model, args)
+    return results, top_paths
+
+
+RUNNERS = {'events': run_events, 'journeys': run_journeys, 'store': run_store, 'workbook': run_workbook}
+
+
+def write_results(results, top_paths, output):
+    """
+    CSV (Model, Channel, Revenue; top paths to <name>_top_paths.csv), JSON, or
+    columnar .parquet / .npz (see data_export.py), by extension; '-' = stdout.
+    """
+    import pandas as pd
+    rows = [(model, channel, value) for model, credit in results.items() for channel, value in sorted(credit.items())]
+    frame = pd.DataFrame(rows, columns=['Model', 'Channel', 'Revenue'])
+
+    if output.lower().endswith('.json'):
+        document = {'models': results}
+        if top_paths is not None:
+            document['top_paths'] = top_paths.to_dict(orient='records')
+        with open(output, 'w') as f:
+            json.dump(document, f, indent=2, default=float)
+        return
+
+    if output.lower().endswith(('.parquet', '.npz')):
+        from data_export import write_columnar
+        write_columnar(frame, output)
+        if top_paths is not None:
+            stem, ext = os.path.splitext(output)
+            write_columnar(top_paths, f"{stem}_top_paths{ext}")
+        return
+
+    frame.to_csv(sys.stdout if output == '-' else output, index=False)
+    if top_paths is not None:
+        if output == '-':
+            sys.stdout.write('\n')
+            top_paths.to_csv(sys.stdout, index=False)
+        else:
+            stem, ext = os.path.splitext(output)
+            top_paths.to_csv(f"{stem}_top_paths{ext or '.csv'}", index=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='attribution_cli.py',
+        description='Run attribution models on an event / journey file and write per-channel results.',
+        epilog=__doc__.split('\n\n', 2)[2],
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('input', help='events / journeys CSV or Parquet, journey store directory, or workbook')
+    parser.add_argument('--format', choices=FORMATS, help='input kind (detected if omitted)')
+    parser.add_argument('--models', nargs='+', choices=MODELS,
+                        help='default: last_touch smart (last_touch u_shape for workbooks)')
+    parser.add_argument('--navigation-threshold', type=float, default=60, help='seconds (default 60)')
+    parser.add_argument('--weights', type=float, nargs=3, default=[0.4, 0.4, 0.2], metavar=('FIRST', 'LAST', 'MIDDLE'),
+                        help='U-Shape weights (default 0.4 0.4 0.2)')
+    parser.add_argument('--half-life', type=float, default=86400, help='Time-Decay half-life in seconds (default 86400)')
+    parser.add_argument('--scores', type=parse_scores, help="Weighted Score channel scores: 'A=3,B=1' or JSON")
+    parser.add_argument('--top', type=int, default=10, help='number of top paths (default 10)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for workbook parsing')
+    parser.add_argument('--output', '-o', default='-',
+                        help="output .csv / .json / .parquet / .npz file (default '-' = stdout CSV)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fmt = args.format or detect_format(args.input)
+    args.default_models = args.models is None
+    if args.default_models:
+        args.models = list(DEFAULT_MODELS[fmt])
+    if 'weighted_score' in args.models and not args.scores:
+        raise SystemExit("model 'weighted_score' needs --scores")
+    results, top_paths = RUNNERS[fmt](args)
+    write_results(results, top_paths, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Attribution Cube
+Attributed revenue and conversions pre-aggregated by (conversion day,
+channel) for every (model, parameter set), so date ranges, weeks and
+campaign periods are sliced without touching the events again:
+
+    cube = AttributionCube()
+    cube.add_slice('smart', {'navigation_threshold_seconds': 60}, touches)
+    cube.range_frame('2024-01-08', '2024-01-14')    # one week, every slice
+    cube.append(new_touches)                          # next day's conversions
+
+Each slice keeps per-day arrays (days x channels) and their prefix sums
+along the days, so any inclusive range [start, end] is
+cum[end + 1] - cum[start]: constant time in the number of days.
+
+Per-journey credit comes from bootstrap.journey_credit (same models and
+parameters). A 'rules' parameter (a touch_filters spec list) keys the slice
+by the touch rules its credit ran under: the rules' keep mask is passed to
+the model, evaluated on the appended touches by `append`, and can be given
+precomputed (`keep`) by a caller that already holds a RuleEvaluator.
+Conversions are fractional: every converted user is one
+conversion, split across channels in the same shares as its revenue.
+
+`append` adds journeys (converted users with their full touch history)
+to every slice and only rebuilds the prefix sums from the earliest day
+it touched, which for new days is just the appended tail. A new slice
+has to be built from the full history (`add_slice`); the build runs
+outside the cube's lock, and the cube keeps at most `max_slices` slices,
+dropping the least recently used.
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from attribution_engine import ConversionTouches
+from bootstrap import journey_credit
+from channels import CHANNELS
+from touch_filters import RuleEvaluator, parse_rules
+
+DAY = np.timedelta64(1, 'D')
+DEFAULT_MAX_SLICES = 32
+
+
+def slice_key(model, params=None):
+    """Stable key of a (model, parameters) slice."""
+    return json.dumps([model, params or {}], sort_keys=True, default=str)
+
+
+def _model_params(touches, params, keep=None):
+    """Model keyword arguments of slice params: 'rules' becomes the touches' keep mask."""
+    params = dict(params or {})
+    rules = params.pop('rules', None)
+    if rules is not None:
+        params['keep'] = keep if keep is not None else RuleEvaluator(touches).keep_mask(parse_rules(rules))
+    return params
+
+
+def daily_credit(touches, model, params=None, keep=None):
+    """
+    One model's credit of a ConversionTouches view by conversion day, as
+    (days, revenue, conversions): sorted datetime64[D] days and two
+    (len(days) x n_channels) arrays. With a 'rules' parameter, `keep` is the
+    rules' keep mask over these touches (evaluated here if omitted).
+    """
+    day = touches.conversion_time.astype('datetime64[D]')
+    days, day_index = np.unique(day, return_inverse=True)
+    n_ch = touches.n_channels
+
+    # Credit is linear in each journey's value: run the model on values with
+    # zeros replaced by 1, then read revenue and conversion shares off it
+    value = touches.conversion_value.astype(np.float64)
+    unit = np.where(value != 0, value, 1.0)
+    scaled = copy.copy(touches)
+    scaled.conversion_value = unit
+    journey, channel, credit = journey_credit(scaled, model, **_model_params(touches, params, keep))
+    share = credit / unit[journey]
+
+    cell = day_index[journey] * n_ch + channel
+    size = len(days) * n_ch
+    revenue = np.bincount(cell, weights=share * value[journey], minlength=size).reshape(len(days), n_ch)
+    conversions = np.bincount(cell, weights=share, minlength=size).reshape(len(days), n_ch)
+    return days, revenue, conversions
+
+
+def build_slice(touches, model, params=None, keep=None):
+    """CubeSlice of one model and parameter set from the full history (a ConversionTouches view)."""
+    days, revenue, conversions = daily_credit(touches, model, params, keep)
+    start = days[0] if len(days) else np.datetime64('NaT', 'D')
+    # Conversion days are unique but may have gaps: lay them out densely
+    dense = np.zeros((int((days[-1] - start) // DAY) + 1 if len(days) else 0, revenue.shape[1]))
+    dense_conversions = np.zeros_like(dense)
+    rows = ((days - start) // DAY).astype(np.int64)
+    dense[rows], dense_conversions[rows] = revenue, conversions
+    return CubeSlice(model, params, start, dense, dense_conversions)
+
+
+class CubeSlice:
+    """Per-day revenue / conversions of one (model, parameters) and their prefix sums."""
+
+    def __init__(self, model, params, start, revenue, conversions):
+        self.model = model
+        self.params = dict(params or {})
+        self.start = start
+        self.revenue = revenue
+        self.conversions = conversions
+        self.cum_revenue = np.zeros((len(revenue) + 1, revenue.shape[1]))
+        self.cum_conversions = np.zeros_like(self.cum_revenue)
+        self._accumulate(0)
+
+    @property
+    def n_days(self):
+        return len(self.revenue)
+
+    def _accumulate(self, first):
+        """Prefix sums from day index `first` on (earlier rows are unchanged)."""
+        np.cumsum(self.revenue[first:], axis=0, out=self.cum_revenue[first + 1:])
+        self.cum_revenue[first + 1:] += self.cum_revenue[first]
+        np.cumsum(self.conversions[first:], axis=0, out=self.cum_conversions[first + 1:])
+        self.cum_conversions[first + 1:] += self.cum_conversions[first]
+
+    def _resize(self, start, n_days, n_ch):
+        """Grows the day range to [start, start + n_days) and the channels to n_ch."""
+        old_days, old_ch = self.revenue.shape
+        shift = int((self.start - start) // DAY) if old_days else 0
+        if (shift, n_days, n_ch) == (0, old_days, old_ch):
+            return
+        for name in ('revenue', 'conversions'):
+            grown = np.zeros((n_days, n_ch))
+            grown[shift:shift + old_days, :old_ch] = getattr(self, name)
+            setattr(self, name, grown)
+        cum_revenue, cum_conversions = self.cum_revenue, self.cum_conversions
+        self.cum_revenue = np.zeros((n_days + 1, n_ch))
+        self.cum_conversions = np.zeros((n_days + 1, n_ch))
+        # Nothing is credited on the new days yet: the old prefix sums shift
+        # into place and their last row carries over to the new tail
+        self.cum_revenue[shift:shift + old_days + 1, :old_ch] = cum_revenue
+        self.cum_revenue[shift + old_days + 1:, :old_ch] = cum_revenue[-1]
+        self.cum_conversions[shift:shift + old_days + 1, :old_ch] = cum_conversions
+        self.cum_conversions[shift + old_days + 1:, :old_ch] = cum_conversions[-1]
+        self.start = start
+
+    def add(self, days, revenue, conversions):
+        """Adds daily credit (sorted days) and refreshes the prefix sums from the first day added."""
+        if not len(days):
+            return
+        start = min(self.start, days[0]) if self.n_days else days[0]
+        end = max(self.start + self.n_days * DAY, days[-1] + DAY) if self.n_days else days[-1] + DAY
+        self._resize(start, int((end - start) // DAY), max(revenue.shape[1], self.revenue.shape[1]))
+
+        rows = ((days - self.start) // DAY).astype(np.int64)
+        self.revenue[rows, :revenue.shape[1]] += revenue
+        self.conversions[rows, :conversions.shape[1]] += conversions
+        self._accumulate(int(rows[0]))
+
+    def day_index(self, day):
+        """Row of a day, clipped to [0, n_days]."""
+        offset = (np.datetime64(pd.Timestamp(day).date(), 'D') - self.start) // DAY
+        return int(np.clip(offset, 0, self.n_days))
+
+    def range_totals(self, start=None, end=None):
+        """(revenue, conversions) per channel code over the inclusive day range [start, end]."""
+        first = 0 if start is None else self.day_index(start)
+        last = self.n_days if end is None else self.day_index(np.datetime64(pd.Timestamp(end).date(), 'D') + DAY)
+        last = max(last, first)
+        return (self.cum_revenue[last] - self.cum_revenue[first],
+                self.cum_conversions[last] - self.cum_conversions[first])
+
+
+class AttributionCube:
+    """
+    (conversion day, channel, model, parameter set) cube of attributed
+    revenue and conversions; one CubeSlice per (model, parameters), at most
+    `max_slices` of them (least recently used dropped first).
+    Safe to share between threads (e.g. Streamlit sessions via st.cache_resource).
+    """
+
+    def __init__(self, registry=CHANNELS, max_slices=DEFAULT_MAX_SLICES):
+        self.channels = registry
+        self.max_slices = max_slices
+        self.slices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touches(self, data):
+        return data if isinstance(data, ConversionTouches) else ConversionTouches(data, self.channels)
+
+    def add_slice(self, model, params, data, keep=None):
+        """
+        Builds (or returns) the slice of a model and parameter set from the
+        full history `data` (`keep`: keep mask of params['rules'] over it, if
+        already evaluated). The build does not hold the lock, so other
+        threads keep reading; slices beyond max_slices are dropped, least
+        recently used first.
+        """
+        cube_slice = self.get(model, params)
+        if cube_slice is not None:
+            return cube_slice
+        built = build_slice(self._touches(data), model, params, keep)
+        key = slice_key(model, params)
+        with self._lock:
+            # Another thread may have built the same slice meanwhile
+            cube_slice = self.slices.setdefault(key, built)
+            self.slices.move_to_end(key)
+            while len(self.slices) > self.max_slices:
+                self.slices.popitem(last=False)
+        return cube_slice
+
+    def get(self, model, params=None):
+        """Slice of a model and parameter set (None if not built or dropped); marks it recently used."""
+        key = slice_key(model, params)
+        with self._lock:
+            if key in self.slices:
+                self.slices.move_to_end(key)
+            return self.slices.get(key)
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self.slices)
+
+    def append(self, data):
+        """Adds new converted journeys (interaction log or ConversionTouches) to every slice."""
+        touches = self._touches(data)
+        with self._lock:
+            for cube_slice in self.slices.values():
+                cube_slice.add(*daily_credit(touches, cube_slice.model, cube_slice.params))
+
+    @property
+    def days(self):
+        """(first day, last day) covered by any slice, or None if the cube is empty."""
+        ranges = [(s.start, s.start + (s.n_days - 1) * DAY) for s in self._snapshot().values() if s.n_days]
+        if not ranges:
+            return None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def range_totals(self, model, params=None, start=None, end=None):
+        """(revenue, conversions) per channel code of one slice over the inclusive range [start, end]."""
+        cube_slice = self.get(model, params)
+        if cube_slice is None:
+            raise KeyError(f"no cube slice for {model!r} with {params or {}}")
+        return cube_slice.range_totals(start, end)
+
+    def range_frame(self, start=None, end=None, slices=None):
+        """
+        DataFrame [Model, Params, Channel, Revenue, Conversions] over the
+        inclusive range, for the given slice keys (default: all); channels
+        without credit in the range are left out.
+        """
+        rows = []
+        snapshot = self._snapshot()
+        for key in (snapshot if slices is None else slices):
+            cube_slice = snapshot[key]
+            revenue, conversions = cube_slice.range_totals(start, end)
+            for c in np.flatnonzero((revenue != 0) | (conversions != 0)):
+                rows.append((cube_slice.model, json.dumps(cube_slice.params, sort_keys=True, default=str),
+                             self.channels[c], revenue[c], conversions[c]))
+        return pd.DataFrame(rows, columns=['Model', 'Params', 'Channel', 'Revenue', 'Conversions'])
+
+    def period_frame(self, model, params=None, freq='W'):
+        """
+        One slice's totals per calendar period (pandas period alias, e.g. 'W'
+        or 'M') as a DataFrame [Period Start, Channel, Revenue, Conversions];
+        every period is one prefix-sum difference.
+        """
+        cube_slice = self.get(model, params)
+        if cube_slice is None or not cube_slice.n_days:
+            return pd.DataFrame(columns=['Period Start', 'Channel', 'Revenue', 'Conversions'])
+        days = pd.date_range(pd.Timestamp(cube_slice.start), periods=cube_slice.n_days, freq='D')
+        starts = days.to_period(freq).start_time.unique()
+        first = np.searchsorted(days.values, starts.values.astype('datetime64[ns]'))
+        last = np.r_[first[1:], cube_slice.n_days]
+        revenue = cube_slice.cum_revenue[last] - cube_slice.cum_revenue[first]
+        conversions = cube_slice.cum_conversions[last] - cube_slice.cum_conversions[first]
+        period, channel = np.nonzero((revenue != 0) | (conversions != 0))
+        return pd.DataFrame({
+            'Period Start': starts[period],
+            'Channel': self.channels.decode(channel),
+            'Revenue': revenue[period, channel],
+            'Conversions': conversions[period, channel]
+        })
@@ -0,0 +1,539 @@
+"""
+Columnar Attribution Engine
+Stores a batch of journeys as one flat array of integer channel codes plus an
+offsets array, and computes attribution credit for the whole batch at once
+with NumPy segment operations instead of per-journey Python loops.
+
+Journey j occupies codes[offsets[j]:offsets[j + 1]].
+"""
+
+import numpy as np
+import pandas as pd
+
+from channels import CHANNELS, ChannelRegistry, Journey
+from instrumentation import TRACER
+
+
+def code_dtype(n_channels):
+    """Smallest unsigned dtype that can hold n_channels channel codes."""
+    return np.uint8 if n_channels <= 256 else np.uint16 if n_channels <= 65536 else np.int32
+
+
+class JourneyBatch:
+    """
+    Flat, columnar batch of journeys.
+
+    Attributes:
+        codes: unsigned int array of channel codes, all journeys concatenated
+        offsets: int64 array of length n_journeys + 1
+        revenue: numeric array with one value per journey
+        channels: ChannelRegistry, channels[code] -> name (shared CHANNELS by default)
+        columns: optional {name: array} of extra per-journey columns
+                 (e.g. Time_To_Convert_Seconds in marketing_dashboard.py)
+    """
+
+    def __init__(self, codes, offsets, revenue, channels, columns=None):
+        self.codes = np.asarray(codes)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.revenue = np.asarray(revenue)
+        if self.revenue.dtype.kind not in 'iuf':
+            self.revenue = self.revenue.astype(np.float64)
+        self.channels = channels if isinstance(channels, ChannelRegistry) else ChannelRegistry(channels)
+        self.columns = dict(columns or {})
+
+    @classmethod
+    def from_journeys(cls, journeys, revenue=None, columns=None, registry=CHANNELS):
+        """
+        Builds a batch from an iterable of channel-name lists or Journey objects.
+        If revenue is None every journey is worth 1 (one conversion), or its
+        own `revenue` for Journey objects.
+        """
+        journeys = list(journeys)
+        lengths = np.fromiter((len(j) for j in journeys), dtype=np.int64, count=len(journeys))
+        offsets = np.zeros(len(journeys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if journeys and all(isinstance(j, Journey) and j.registry is registry for j in journeys):
+            codes = np.concatenate([j.codes for j in journeys])
+            if revenue is None:
+                revenue = np.array([j.revenue for j in journeys])
+        else:
+            codes = registry.encode([ch for journey in journeys for ch in journey])
+
+        if revenue is None:
+            revenue = np.ones(len(journeys))
+
+        return cls(codes.astype(code_dtype(len(registry))), offsets, revenue, registry, columns)
+
+    @classmethod
+    def from_dataframe(cls, df, journey_col='Journey_List', revenue_col='Revenue', columns=()):
+        """
+        Builds a batch from a DataFrame with a list-valued journey column.
+        Mirrors `process_all_journeys`: a missing revenue column counts as 1 per journey.
+        `columns` names extra per-journey columns to carry along.
+        """
+        revenue = df[revenue_col].to_numpy() if revenue_col in df.columns else None
+        extra = {name: df[name].to_numpy() for name in columns}
+        return cls.from_journeys(df[journey_col], revenue, extra)
+
+    def __len__(self):
+        return self.n_journeys
+
+    def journey(self, j):
+        """Journey j as a compact Journey object."""
+        return Journey(self.codes[self.offsets[j]:self.offsets[j + 1]], self.revenue[j], self.channels)
+
+    def to_frame(self, start=0, stop=None):
+        """
+        Journeys [start, stop) as a DataFrame with a Journey_List column,
+        for display only (e.g. a "Peek at Raw Data" table).
+        """
+        stop = self.n_journeys if stop is None else min(stop, self.n_journeys)
+        journeys = [
+            [self.channels[c] for c in self.codes[self.offsets[j]:self.offsets[j + 1]]]
+            for j in range(start, stop)
+        ]
+        frame = pd.DataFrame({'Journey_List': journeys})
+        for name, values in self.columns.items():
+            frame[name] = values[start:stop]
+        return frame
+
+    @property
+    def n_journeys(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_channels(self):
+        return len(self.channels)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def segment_ids(self):
+        """Journey index of every touch in `codes`."""
+        return np.repeat(np.arange(self.n_journeys), self.lengths)
+
+    def positions(self):
+        """Position of every touch inside its own journey (0 = first touch)."""
+        return np.arange(len(self.codes)) - np.repeat(self.offsets[:-1], self.lengths)
+
+    def deduplicate(self):
+        """
+        Sequential Deduplication for the whole batch.
+        Same rule as `deduplicate_consecutive`, applied per segment.
+        """
+        keep = np.ones(len(self.codes), dtype=bool)
+        keep[1:] = self.codes[1:] != self.codes[:-1]
+        # A journey start never merges with the previous journey's tail
+        starts = self.offsets[:-1][self.lengths > 0]
+        keep[starts] = True
+
+        new_lengths = np.bincount(self.segment_ids()[keep], minlength=self.n_journeys)
+        offsets = np.zeros(self.n_journeys + 1, dtype=np.int64)
+        np.cumsum(new_lengths, out=offsets[1:])
+
+        return JourneyBatch(self.codes[keep], offsets, self.revenue, self.channels, self.columns)
+
+    def to_channel_dict(self, totals, present=None):
+        """
+        Converts a per-channel array to {channel: value}.
+        `present` restricts the keys to channels that actually received credit.
+        """
+        if present is None:
+            present = np.ones(self.n_channels, dtype=bool)
+        return {self.channels[c]: float(totals[c]) for c in np.flatnonzero(present)}
+
+
+def as_journey_batch(data, revenue_col='Revenue', columns=()):
+    """
+    Accepts any of the journey containers used across the code paths and
+    returns a JourneyBatch: a JourneyBatch itself, a DataFrame with a
+    Journey_List column, or an iterable of Journey objects / channel lists.
+    """
+    if isinstance(data, JourneyBatch):
+        return data
+    if isinstance(data, pd.DataFrame):
+        return JourneyBatch.from_dataframe(data, revenue_col=revenue_col, columns=columns)
+    return JourneyBatch.from_journeys(data)
+
+
+def u_shape_basis(batch):
+    """
+    U-Shape credit basis for every journey in the batch, summed per channel.
+    Same rules as `calculate_u_shape` (expects an already deduplicated batch):
+    - 1 touch: 100%                                  -> fixed
+    - 2 touches: 50/50                               -> fixed
+    - 3+ touches: first / last touch                 -> first, last
+      middle share split among the unique middle channels -> middle
+
+    Returns (basis, present): a (4, n_channels) array in BASIS order and a
+    mask of channels that receive credit.
+    """
+    n_ch = batch.n_channels
+    lengths = batch.lengths
+    starts = batch.offsets[:-1]
+    rev = batch.revenue.astype(np.float64)
+    basis = np.zeros((4, n_ch))
+
+    # Short journeys: weights do not depend on the sliders
+    single = lengths == 1
+    two = lengths == 2
+    basis[0] += np.bincount(batch.codes[starts[single]], weights=rev[single], minlength=n_ch)
+    basis[0] += np.bincount(batch.codes[starts[two]], weights=0.5 * rev[two], minlength=n_ch)
+    basis[0] += np.bincount(batch.codes[starts[two] + 1], weights=0.5 * rev[two], minlength=n_ch)
+
+    # First / last touch of 3+ journeys
+    many = lengths >= 3
+    basis[1] = np.bincount(batch.codes[starts[many]], weights=rev[many], minlength=n_ch)
+    basis[2] = np.bincount(batch.codes[batch.offsets[1:][many] - 1], weights=rev[many], minlength=n_ch)
+
+    # Middle: split among unique middle channels of each journey
+    seg = batch.segment_ids()
+    pos = batch.positions()
+    is_middle = (pos > 0) & (pos < lengths[seg] - 1)
+    keys = np.unique(seg[is_middle].astype(np.int64) * n_ch + batch.codes[is_middle])
+    key_seg = keys // n_ch
+    key_ch = keys % n_ch
+    n_unique = np.bincount(key_seg, minlength=batch.n_journeys)
+    basis[3] = np.bincount(key_ch, weights=rev[key_seg] / n_unique[key_seg], minlength=n_ch)
+
+    present = np.bincount(batch.codes, minlength=n_ch) > 0
+    return basis, present
+
+
+def u_shape_credit(batch, first_weight=0.4, last_weight=0.4, middle_weight=0.2):
+    """
+    U-Shape credit for every journey in the batch, summed per channel
+    (defaults are the 40/40/20 of `calculate_u_shape`).
+
+    Returns (totals, present) arrays indexed by channel code.
+    """
+    basis, present = u_shape_basis(batch)
+    return combine_basis(basis, first_weight, last_weight, middle_weight), present
+
+
+def weighted_score_credit(batch, channel_scores):
+    """
+    Weighted Score credit for every journey in the batch, summed per channel.
+    Same rules as `calculate_weighted_score`: each unique channel of a journey
+    gets score / total unique score; journeys whose total score is 0 get nothing.
+
+    Returns (totals, present) arrays indexed by channel code.
+    """
+    n_ch = batch.n_channels
+    scores = np.array([channel_scores.get(ch, 0) for ch in batch.channels], dtype=np.float64)
+
+    keys = np.unique(batch.segment_ids().astype(np.int64) * n_ch + batch.codes)
+    key_seg = keys // n_ch
+    key_ch = keys % n_ch
+
+    key_scores = scores[key_ch]
+    total_score = np.bincount(key_seg, weights=key_scores, minlength=batch.n_journeys)
+    valid = total_score[key_seg] > 0
+
+    credit = batch.revenue[key_seg[valid]] * key_scores[valid] / total_score[key_seg[valid]]
+    totals = np.bincount(key_ch[valid], weights=credit, minlength=n_ch)
+    present = np.bincount(key_ch[valid], minlength=n_ch) > 0
+    return totals, present
+
+
+class ConversionTouches:
+    """
+    Columnar view of an interaction log (one row per event) built in a single
+    grouped pass: one sort by (User_ID, Interaction_Time), then every converted
+    user's conversion event and touches are located with array ops.
+
+    Expects the columns used by app.py:
+    User_ID, Channel, Interaction_Time, Converted, Conversion_Value.
+
+    Per converted user (journey j, ordered by User_ID):
+        user_ids[j], conversion_channel[j], conversion_value[j], conversion_time[j]
+    Per touch (all non-conversion events of converted users, time ordered):
+        touch_journey, touch_channel, touch_time, time_to_conversion (seconds),
+        touch_columns ({name: array} of the extra event `columns` asked for)
+    """
+
+    @TRACER.traced('engine.journey_extraction')
+    def __init__(self, df, registry=CHANNELS, columns=()):
+        TRACER.count('engine.rows_processed', len(df))
+        events = df.sort_values(['User_ID', 'Interaction_Time'], kind='mergesort')
+
+        user_codes, _ = pd.factorize(events['User_ID'])
+        channel_codes = registry.encode(events['Channel']).astype(code_dtype(len(registry)))
+        self.channels = registry
+
+        converted = (events['Converted'] == True).to_numpy()
+        times = events['Interaction_Time'].to_numpy(dtype='datetime64[ns]')
+
+        # Conversion event = first converted row of each user in time order
+        conv_rows = np.flatnonzero(converted)
+        conv_users = user_codes[conv_rows]
+        first_conv = np.ones(len(conv_rows), dtype=bool)
+        first_conv[1:] = conv_users[1:] != conv_users[:-1]
+        conv_rows = conv_rows[first_conv]
+
+        self.user_ids = events['User_ID'].to_numpy()[conv_rows]
+        self.conversion_channel = channel_codes[conv_rows]
+        self.conversion_value = events['Conversion_Value'].to_numpy()[conv_rows]
+        self.conversion_time = times[conv_rows]
+
+        # Map every user to its journey index (-1 = never converted)
+        journey_of_user = np.full(user_codes.max() + 1 if len(user_codes) else 0, -1, dtype=np.int64)
+        journey_of_user[user_codes[conv_rows]] = np.arange(len(conv_rows))
+        event_journey = journey_of_user[user_codes]
+
+        touch = ~converted & (event_journey >= 0)
+        self.touch_journey = event_journey[touch]
+        self.touch_channel = channel_codes[touch]
+        self.touch_time = times[touch]
+        self.time_to_conversion = (
+            (self.conversion_time[self.touch_journey] - self.touch_time) / np.timedelta64(1, 's')
+        )
+        self.touch_columns = {name: events[name].to_numpy()[touch] for name in columns}
+
+    @property
+    def n_journeys(self):
+        return len(self.conversion_channel)
+
+    @property
+    def n_channels(self):
+        return len(self.channels)
+
+    def channel_code(self, channel):
+        """Code of a channel name, or -1 if it is not registered."""
+        return self.channels.get(channel)
+
+    def journey_batch(self):
+        """
+        Touch paths of all converted users as a JourneyBatch
+        (conversion value as revenue), e.g. for path analysis.
+        """
+        lengths = np.bincount(self.touch_journey, minlength=self.n_journeys)
+        offsets = np.zeros(self.n_journeys + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return JourneyBatch(self.touch_channel, offsets, self.conversion_value, self.channels)
+
+    def navigation_mask(self, navigation_threshold_seconds, channel='Stories'):
+        """
+        Boolean mask of touches that survive the Navigation Filter:
+        drops `channel` touches within the threshold of conversion.
+        """
+        return ~((self.touch_channel == self.channel_code(channel)) &
+                 (self.time_to_conversion <= navigation_threshold_seconds))
+
+    def to_frame(self, totals, present, value_name='Revenue'):
+        """Per-channel arrays -> DataFrame[Channel, value_name] sorted by channel, like a groupby."""
+        codes = np.flatnonzero(present)
+        frame = pd.DataFrame({
+            'Channel': [self.channels[c] for c in codes],
+            value_name: totals[codes]
+        })
+        return frame.sort_values('Channel').reset_index(drop=True)
+
+
+# Components of a U-Shaped credit vector. For fixed filtered journeys the
+# attributed revenue is linear in the three weights:
+#   credit = fixed + first_weight * first + last_weight * last + middle_weight * middle
+# where `fixed` holds the weight-independent shares (single-touch journeys,
+# 50/50 two-touch splits, fallbacks).
+BASIS = ('fixed', 'first', 'last', 'middle')
+
+
+def combine_basis(basis, first_weight, last_weight, middle_weight):
+    """Collapses a (4, ...) basis array into credit for one weight combination."""
+    return basis[0] + first_weight * basis[1] + last_weight * basis[2] + middle_weight * basis[3]
+
+
+def position_basis(journey_ids, n_journeys, two_touch_weights=None):
+    """
+    U-Shaped position basis for touches grouped by journey (journey_ids sorted).
+    Returns a (4, n_touches) array in BASIS order; `combine_basis` of it gives
+    the same weights as app.apply_smart_attribution:
+    - 1 touch: 1.0
+    - 2 touches: first_weight / last_weight (or `two_touch_weights` if given)
+    - 3+ touches: first_weight, last_weight, middle_weight split equally among the n - 2 middle touches
+
+    marketing_dashboard.calculate_attribution splits 2-touch journeys 50/50,
+    which is `two_touch_weights=(0.5, 0.5)`.
+    """
+    lengths = np.bincount(journey_ids, minlength=n_journeys)
+    starts = np.cumsum(lengths) - lengths
+    pos = np.arange(len(journey_ids)) - starts[journey_ids]
+    n = lengths[journey_ids]
+
+    is_first = pos == 0
+    is_last = (pos == n - 1) & ~is_first
+    is_middle = ~is_first & ~is_last
+
+    basis = np.zeros((4, len(journey_ids)))
+    basis[0] = n == 1
+    basis[1] = is_first & (n > 1)
+    basis[2] = is_last
+    basis[3] = np.where(is_middle, 1.0 / np.maximum(n - 2, 1), 0.0)
+
+    if two_touch_weights is not None:
+        two = n == 2
+        basis[0] = np.where(two, np.where(is_first, two_touch_weights[0], two_touch_weights[1]), basis[0])
+        basis[1:3, two] = 0.0
+    return basis
+
+
+def position_weights(journey_ids, n_journeys, first_weight, last_weight, middle_weight, two_touch_weights=None):
+    """Per-touch U-Shaped weights, see `position_basis` for the rules."""
+    return combine_basis(position_basis(journey_ids, n_journeys, two_touch_weights),
+                         first_weight, last_weight, middle_weight)
+
+
+def channel_basis(journey_ids, n_journeys, channels, values, n_ch, two_touch_weights=None):
+    """
+    Per-channel U-Shaped basis: (4, n_ch) array of first-touch, last-touch,
+    middle-share (and fixed) revenue, plus per-channel touch counts.
+    `values` is the revenue of every journey.
+    """
+    touch_basis = position_basis(journey_ids, n_journeys, two_touch_weights) * values[journey_ids]
+    basis = np.stack([np.bincount(channels, weights=b, minlength=n_ch) for b in touch_basis])
+    return basis, np.bincount(channels, minlength=n_ch)
+
+
+def smart_attribution_basis(touches, navigation_threshold_seconds, keep=None):
+    """
+    Navigation Filter + U-Shape basis for every converted user at once.
+    Users whose touches were all filtered (or who had none) credit the
+    conversion event channel with the full value (a `fixed` term).
+    `keep` is an optional touch mask replacing the navigation filter
+    (e.g. from touch_filters.RuleEvaluator).
+
+    Returns (basis, present): a (4, n_channels) array in BASIS order and a
+    mask of channels that receive credit.
+    """
+    n_ch = touches.n_channels
+    with TRACER.span('engine.navigation_filter'):
+        if keep is None:
+            keep = touches.navigation_mask(navigation_threshold_seconds)
+        journey = touches.touch_journey[keep]
+        channel = touches.touch_channel[keep]
+    value = touches.conversion_value.astype(np.float64)
+
+    with TRACER.span('engine.u_shape_weighting'):
+        basis, count = channel_basis(journey, touches.n_journeys, channel, value, n_ch)
+
+        # Fallback: nothing left to credit -> conversion channel takes it all
+        empty = np.bincount(journey, minlength=touches.n_journeys) == 0
+        fallback = touches.conversion_channel[empty]
+        basis[0] += np.bincount(fallback, weights=value[empty], minlength=n_ch)
+        count += np.bincount(fallback, minlength=n_ch)
+
+    if TRACER.enabled:
+        TRACER.count('engine.journeys_processed', touches.n_journeys)
+        TRACER.count('engine.stories_touches_dropped', int(len(keep) - keep.sum()))
+        TRACER.count('engine.journeys_fallback', int(empty.sum()))
+
+    return basis, count > 0
+
+
+def smart_attribution_totals(touches, navigation_threshold_seconds, first_weight, last_weight, middle_weight,
+                             keep=None):
+    """
+    Navigation Filter + U-Shape for every converted user at once
+    (`keep`: optional touch mask replacing the navigation filter).
+    Returns (totals, present) arrays indexed by channel code.
+    """
+    basis, present = smart_attribution_basis(touches, navigation_threshold_seconds, keep)
+    return combine_basis(basis, first_weight, last_weight, middle_weight), present
+
+
+def time_decay_weights(touches, half_life_seconds):
+    """
+    Per-touch Time-Decay shares: 2 ** (-time_to_conversion / half_life_seconds)
+    normalized per journey (each journey with a touch before conversion sums
+    to 1). Touches after the conversion (negative time to conversion) weigh 0.
+    """
+    journey = touches.touch_journey
+    age = touches.time_to_conversion
+    before = age >= 0
+    lengths = np.bincount(journey, minlength=touches.n_journeys)
+    has = lengths > 0
+    # Relative to each journey's most recent touch before conversion, so distant journeys do not underflow to 0
+    newest = np.full(touches.n_journeys, np.inf)
+    if has.any():
+        newest[has] = np.minimum.reduceat(np.where(before, age, np.inf), (np.cumsum(lengths) - lengths)[has])
+    decay = np.zeros(len(journey))
+    decay[before] = np.exp2(-(age[before] - newest[journey[before]]) / half_life_seconds)
+    norm = np.bincount(journey, weights=decay, minlength=touches.n_journeys)[journey]
+    return np.divide(decay, norm, out=np.zeros(len(journey)), where=norm > 0)
+
+
+def time_decay_credit(touches, half_life_seconds):
+    """
+    Time-Decay for every converted user at once: each touch before the
+    conversion weighs 2 ** (-time_to_conversion / half_life_seconds), the
+    weights are normalized per journey and split the conversion value. Touches
+    after the conversion get nothing; users without a touch before it credit
+    the conversion event channel with the full value, as in the Smart model.
+
+    Returns (totals, present) arrays indexed by channel code.
+    """
+    n_ch = touches.n_channels
+    before = touches.time_to_conversion >= 0
+    journey = touches.touch_journey[before]
+    channel = touches.touch_channel[before]
+    value = touches.conversion_value.astype(np.float64)
+    has = np.bincount(journey, minlength=touches.n_journeys) > 0
+
+    with TRACER.span('engine.time_decay_weighting'):
+        weights = time_decay_weights(touches, half_life_seconds)[before]
+        totals = np.bincount(channel, weights=value[journey] * weights, minlength=n_ch)
+
+        # Fallback: no touches before conversion -> conversion channel takes it all
+        fallback = touches.conversion_channel[~has]
+        totals += np.bincount(fallback, weights=value[~has], minlength=n_ch)
+    present = (np.bincount(channel, minlength=n_ch) + np.bincount(fallback, minlength=n_ch)) > 0
+
+    if TRACER.enabled:
+        TRACER.count('engine.journeys_processed', touches.n_journeys)
+        TRACER.count('engine.journeys_fallback', int((~has).sum()))
+    return totals, present
+
+
+def last_touch_credit(batch):
+    """
+    Legacy Last Touch for every journey of the batch: the last channel takes
+    the full revenue, empty journeys are skipped.
+    Returns (totals, present) arrays indexed by channel code.
+    """
+    n_ch = batch.n_channels
+    has = batch.lengths > 0
+    winners = batch.codes[batch.offsets[1:][has] - 1]
+    totals = np.bincount(winners, weights=batch.revenue[has].astype(np.float64), minlength=n_ch)
+    return totals, np.bincount(winners, minlength=n_ch) > 0
+
+
+def last_touch_navigation_credit(batch, seconds, navigation_threshold, first_weight, last_weight, middle_weight,
+                                 channel='Stories'):
+    """
+    Smart Model of marketing_dashboard for every journey of the batch: a last
+    touch `channel` less than navigation_threshold seconds (`seconds` per
+    journey) before conversion is dropped, then U-Shape with a 50/50 split for
+    two touches; journeys left empty are skipped.
+    Returns (totals, present) arrays indexed by channel code.
+    """
+    n_ch = batch.n_channels
+    with TRACER.span('engine.navigation_filter'):
+        seg = batch.segment_ids()
+        is_last = batch.positions() == batch.lengths[seg] - 1
+        navigation = (batch.codes == batch.channels.get(channel)) & is_last & (seconds[seg] < navigation_threshold)
+        keep = ~navigation
+
+    with TRACER.span('engine.u_shape_weighting'):
+        weights = position_weights(seg[keep], batch.n_journeys, first_weight, last_weight, middle_weight,
+                                   two_touch_weights=(0.5, 0.5))
+        codes = batch.codes[keep]
+        totals = np.bincount(codes, weights=batch.revenue.astype(np.float64)[seg[keep]] * weights, minlength=n_ch)
+
+    if TRACER.enabled:
+        dropped = int(navigation.sum())
+        TRACER.count('engine.journeys_processed', batch.n_journeys)
+        TRACER.count('engine.stories_touches_dropped', dropped)
+        TRACER.count('engine.journeys_filtered', int((batch.lengths == 1)[seg[navigation]].sum()))
+    return totals, np.bincount(codes, minlength=n_ch) > 0
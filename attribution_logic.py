@@ -1,9 +1,24 @@
+import numpy as np
+
+from attribution_engine import as_journey_batch, u_shape_credit, weighted_score_credit
+from channels import Journey
+from instrumentation import TRACER
+from markov_attribution import removal_effects, transition_counts
+from shapley_attribution import shapley_credit
+
+
 def deduplicate_consecutive(journey):
     """
     1. Sequential Deduplication (Base Filter)
     Collapses consecutive identical channels in the user journey into a single touchpoint.
     Example: ['Push', 'Push', 'Banner', 'Push'] -> ['Push', 'Banner', 'Push']
+    A compact Journey is deduplicated on its codes and returned as a Journey.
     """
+    if isinstance(journey, Journey):
+        keep = np.ones(len(journey.codes), dtype=bool)
+        keep[1:] = journey.codes[1:] != journey.codes[:-1]
+        return Journey(journey.codes[keep], journey.revenue, journey.registry)
+
     if not journey:
         return []
     
@@ -14,14 +29,18 @@ def deduplicate_consecutive(journey):
             
     return deduplicated
 
-def calculate_u_shape(journey):
+def calculate_u_shape(journey, first_weight=0.4, last_weight=0.4, middle_weight=0.2):
     """
     2. U-Shape (Position Based) Logic
     - 40% First touch
     - 40% Last touch
     - 20% distributed evenly *only among the unique channels* in the middle.
+    The 40/40/20 split can be changed through the weight arguments.
     Returns a dictionary of {channel: weight_assigned} for the given journey.
     """
+    if isinstance(journey, Journey):
+        return _u_shape_codes(journey, first_weight, last_weight, middle_weight)
+
     weights = {}
     n = len(journey)
     
@@ -45,13 +64,13 @@ def calculate_u_shape(journey):
     middle_touches = journey[1:-1]
     
     # 40% First, 40% Last
-    weights[first] = weights.get(first, 0) + 0.4
-    weights[last] = weights.get(last, 0) + 0.4
+    weights[first] = weights.get(first, 0) + first_weight
+    weights[last] = weights.get(last, 0) + last_weight
     
     # Process Middle: distribute 20% only among unique channels
     unique_middle = list(set(middle_touches))
     if unique_middle:
-        middle_share = 0.2 / len(unique_middle)
+        middle_share = middle_weight / len(unique_middle)
         for ch in unique_middle:
             weights[ch] = weights.get(ch, 0) + middle_share
             
@@ -69,6 +88,9 @@ def calculate_weighted_score(journey, channel_scores):
         channel_scores: dict mapping channel name to its configured score 
                         (e.g. {'Push': 5, 'Banner': 3, 'SMS': 1})
     """
+    if isinstance(journey, Journey):
+        return _weighted_score_codes(journey, channel_scores)
+
     weights = {}
     # Get unique channels in the entire journey
     unique_channels = list(set(journey))
@@ -86,32 +108,99 @@ def calculate_weighted_score(journey, channel_scores):
             
     return weights
 
-def process_all_journeys(df, channel_scores):
+def calculate_markov(journeys, converted=None):
+    """
+    4. Markov Chain (Removal Effect) Logic
+    - Deduplicated journeys are walks (start) -> channels -> (conversion) / (null)
+    - A channel's removal effect is the drop in conversion probability without it
+    - Share = Channel Removal Effect / Total Removal Effect
+    Unlike the functions above this is fitted on all journeys at once (a
+    DataFrame with Journey_List, a JourneyBatch or a list of journeys);
+    `converted` flags non-converting journeys (default: all converted).
+    Returns a dictionary of {channel: share_assigned}.
+    """
+    batch = as_journey_batch(journeys)
+    _, effects = removal_effects(transition_counts(batch, converted))
+    total_effect = effects.sum()
+    if total_effect <= 0:
+        return {}
+    return batch.to_channel_dict(effects / total_effect, effects > 0)
+
+def calculate_shapley(journeys):
+    """
+    5. Shapley Value Logic
+    - Coalition value v(S) = conversions whose unique channels are a subset of S
+    - Each journey splits its revenue by the Shapley values of its channel set
+    - Share = Channel Credit / Total Revenue
+    Fitted on all journeys at once (a DataFrame with Journey_List, a
+    JourneyBatch or a list of journeys), like calculate_markov.
+    Returns a dictionary of {channel: share_assigned}.
+    """
+    batch = as_journey_batch(journeys)
+    totals, present = shapley_credit(batch)
+    total = totals.sum()
+    if total <= 0:
+        return {}
+    return batch.to_channel_dict(totals / total, present)
+
+def _u_shape_codes(journey, first_weight, last_weight, middle_weight):
+    """calculate_u_shape for a compact Journey, accumulating into a per-code array."""
+    codes = journey.codes
+    n = len(codes)
+    if n == 0:
+        return {}
+
+    credit = np.zeros(len(journey.registry))
+    if n == 1:
+        credit[codes[0]] += 1.0
+    elif n == 2:
+        credit[codes[0]] += 0.5
+        credit[codes[-1]] += 0.5
+    else:
+        credit[codes[0]] += first_weight
+        credit[codes[-1]] += last_weight
+        unique_middle = np.unique(codes[1:-1])
+        credit[unique_middle] += middle_weight / len(unique_middle)
+
+    return {journey.registry[c]: float(credit[c]) for c in np.unique(codes)}
+
+def _weighted_score_codes(journey, channel_scores):
+    """calculate_weighted_score for a compact Journey, on its unique codes."""
+    unique_codes = np.unique(journey.codes)
+    scores = np.array([channel_scores.get(journey.registry[c], 0) for c in unique_codes], dtype=np.float64)
+    total_score = scores.sum()
+    if len(unique_codes) == 0 or total_score <= 0:
+        return {}
+    return {journey.registry[c]: float(score / total_score) for c, score in zip(unique_codes, scores)}
+
+def process_all_journeys(df, channel_scores, u_shape_weights=(0.4, 0.4, 0.2)):
     """
     Example runner function mimicking how you'd process a DataFrame of journeys.
     Assumes `df` has a column 'Journey_List' and 'Revenue' (or similar base value).
+
+    The whole DataFrame is encoded once into a columnar `JourneyBatch` and the
+    dedup / U-Shape / Weighted Score steps run as batch segment operations;
+    per-channel totals match applying the functions above journey by journey.
+    `u_shape_weights` is the (first, last, middle) split passed to the U-Shape step.
+    `df` may also be a JourneyBatch or a list of compact Journey objects.
     """
-    u_shape_results = {}
-    weighted_results = {}
-    
-    for _, row in df.iterrows():
-        raw_journey = row['Journey_List']
-        revenue = row.get('Revenue', 1) # Assuming 1 conversion or actual revenue amount
-        
-        # 1. Base Filter
-        dedup_journey = deduplicate_consecutive(raw_journey)
-        
-        if not dedup_journey:
-            continue
-            
-        # 2. U-Shape Distribution
-        u_shape_weights = calculate_u_shape(dedup_journey)
-        for ch, weight in u_shape_weights.items():
-            u_shape_results[ch] = u_shape_results.get(ch, 0) + (revenue * weight)
-            
-        # 3. Weighted Score Distribution
-        weighted_scores = calculate_weighted_score(dedup_journey, channel_scores)
-        for ch, weight in weighted_scores.items():
-            weighted_results[ch] = weighted_results.get(ch, 0) + (revenue * weight)
-            
+    with TRACER.span('logic.encode'):
+        batch = as_journey_batch(df)
+    if batch.n_journeys == 0:
+        return {}, {}
+    TRACER.count('logic.journeys_processed', batch.n_journeys)
+
+    # 1. Base Filter
+    with TRACER.span('logic.deduplicate'):
+        dedup_batch = batch.deduplicate()
+    TRACER.count('logic.duplicate_touches_removed', len(batch.codes) - len(dedup_batch.codes))
+
+    # 2. U-Shape Distribution
+    with TRACER.span('logic.u_shape'):
+        u_shape_results = dedup_batch.to_channel_dict(*u_shape_credit(dedup_batch, *u_shape_weights))
+
+    # 3. Weighted Score Distribution
+    with TRACER.span('logic.weighted_score'):
+        weighted_results = dedup_batch.to_channel_dict(*weighted_score_credit(dedup_batch, channel_scores))
+
     return u_shape_results, weighted_results
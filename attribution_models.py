@@ -0,0 +1,153 @@
+"""
+Attribution Models
+Headless entry points of the attribution models, shared by the Streamlit
+dashboards, the batch CLI (attribution_cli.py) and the benchmarks. Imports
+only the NumPy / pandas core, never the UI libraries.
+
+- app.py: generate_synthetic_data, apply_last_touch_attribution,
+  apply_smart_attribution, apply_time_decay_attribution, get_top_conversion_paths
+- marketing_dashboard.py: calculate_attribution
+"""
+
+import numpy as np
+
+import synthetic_data
+from attribution_engine import (ConversionTouches, as_journey_batch, last_touch_credit,
+                                last_touch_navigation_credit, smart_attribution_totals, time_decay_credit)
+from instrumentation import TRACER
+from path_trie import PathTrie
+from touch_filters import RuleEvaluator, app_navigation_rule
+
+
+def generate_synthetic_data(num_users=500, seed=None, reference_time=None):
+    """
+    Generate synthetic user journey data with realistic scenarios.
+    
+    Scenario A: Digital -> Push -> TM -> Conversion (Strong TM influence)
+    Scenario B: Digital -> Stories (clicked 30 sec before conversion) -> Conversion (Navigation problem)
+    
+    Delegates to the vectorized generator in synthetic_data.py, which also
+    supports custom scenario mixes, chunked output and writing to disk.
+    """
+    with TRACER.span('app.generate_data'):
+        return synthetic_data.generate_synthetic_data(num_users=num_users, seed=seed, reference_time=reference_time)
+
+
+def apply_last_touch_attribution(df, touches=None):
+    """
+    Simple Last Touch Attribution: Credit goes to the last channel before conversion.
+    No filtering applied.
+
+    `df` is the interaction log or an already built ConversionTouches view;
+    `touches` is an optional prebuilt view of `df`.
+    """
+    if touches is None:
+        touches = df if isinstance(df, ConversionTouches) else ConversionTouches(df)
+    
+    # Last touch channel = the channel of each user's conversion event itself
+    with TRACER.span('app.groupby'):
+        n_ch = touches.n_channels
+        totals = np.bincount(touches.conversion_channel, weights=touches.conversion_value, minlength=n_ch)
+        present = np.bincount(touches.conversion_channel, minlength=n_ch) > 0
+    return touches.to_frame(totals, present, value_name='Revenue')
+
+
+def apply_smart_attribution(df, navigation_threshold_seconds, first_weight, last_weight, middle_weight, touches=None,
+                            rules=(), evaluator=None):
+    """
+    Smart Attribution: U-Shaped model with Navigation Filter
+    
+    1. First, filter out "Stories" clicks that happened within navigation_threshold_seconds of conversion
+    2. Then apply U-Shaped attribution to remaining touchpoints
+    
+    U-Shaped weights:
+    - First Touch: first_weight (default 0.4)
+    - Last Touch: last_weight (default 0.4)
+    - Middle Touches: middle_weight divided equally (default 0.2 total)
+    
+    Runs as one grouped pass over all converted users (see ConversionTouches);
+    `df` may be the interaction log or an already built ConversionTouches view,
+    and `touches` is an optional prebuilt view of `df` so slider moves skip the sort.
+    
+    `rules` are extra touch_filters.TouchRule drops on top of the Stories rule;
+    `evaluator` is an optional RuleEvaluator on `touches` whose per-rule masks
+    are reused across calls.
+    """
+    if touches is None:
+        touches = df if isinstance(df, ConversionTouches) else ConversionTouches(df)
+    
+    keep = None
+    if rules or evaluator is not None:
+        evaluator = evaluator or RuleEvaluator(touches)
+        keep = evaluator.keep_mask([app_navigation_rule(navigation_threshold_seconds)] + list(rules))
+    
+    totals, present = smart_attribution_totals(
+        touches,
+        navigation_threshold_seconds,
+        first_weight,
+        last_weight,
+        middle_weight,
+        keep
+    )
+    
+    return touches.to_frame(totals, present, value_name='Revenue')
+
+
+def apply_time_decay_attribution(df, half_life_seconds, touches=None):
+    """
+    Time-Decay Attribution: every touch gets credit 2 ** (-t / half_life),
+    t = seconds from the touch to the conversion, normalized per user.
+    A touch one half-life earlier than another gets half its credit; touches
+    after the conversion get none.
+    
+    Uses the same grouped pass as apply_smart_attribution (see
+    attribution_engine.time_decay_credit); `touches` is an optional prebuilt view.
+    """
+    if touches is None:
+        touches = df if isinstance(df, ConversionTouches) else ConversionTouches(df)
+    
+    totals, present = time_decay_credit(touches, half_life_seconds)
+    return touches.to_frame(totals, present, value_name='Revenue')
+
+
+def get_top_conversion_paths(df, top_n=5, trie=None):
+    """
+    Get the most common conversion paths.
+    
+    Paths are counted in a prefix trie (see path_trie.py) built in one pass over
+    all converted users; `df` may be the interaction log or a ConversionTouches
+    view, and `trie` an already built PathTrie.
+    """
+    if trie is None:
+        touches = df if isinstance(df, ConversionTouches) else ConversionTouches(df)
+        trie = PathTrie(touches.journey_batch())
+    
+    return trie.top_paths(top_n)[['Conversion Path', 'Count']]
+
+
+def calculate_attribution(df, model_type, navigation_threshold=60, u_shape_weights=(0.4, 0.4, 0.2)):
+    """
+    Calculates attributed sales volume based on the selected model.
+    
+    `df` is a JourneyBatch from marketing_dashboard.generate_synthetic_data (a DataFrame with
+    Journey_List / Time_To_Convert_Seconds / Loan_Amount columns also works).
+    Every journey is processed at once with segment operations.
+    """
+    batch = as_journey_batch(df, revenue_col='Loan_Amount', columns=['Time_To_Convert_Seconds'])
+    
+    if model_type == 'Legacy Last Touch':
+        # Simple Last Touch
+        return batch.to_channel_dict(*last_touch_credit(batch))
+    
+    if model_type != 'Smart Model':
+        return {}
+    
+    # --- SMART MODEL ---
+    # Check for "Navigation Click" bias: drop a last touch 'Stories' that happened
+    # less than navigation_threshold seconds before conversion (journeys that
+    # become empty are skipped), then U-Shape on the *cleaned* journey:
+    # 1 touch: 100%, 2 touches: 50/50, 3+: first / last / middle split among n-2
+    totals, present = last_touch_navigation_credit(
+        batch, batch.columns['Time_To_Convert_Seconds'], navigation_threshold, *u_shape_weights
+    )
+    return batch.to_channel_dict(totals, present)
@@ -0,0 +1,281 @@
+"""
+Background Attribution Jobs
+Runs parameter-keyed attribution jobs on a shared worker pool so Streamlit
+reruns never block on a recompute:
+
+- one "slot" per result on screen (e.g. 'attribution'); submitting new
+  parameters to a slot supersedes its previous job, which is cancelled
+  (dropped if not started, stopped at its next checkpoint if running)
+- a job that supersedes another waits `debounce_seconds` on a timer before
+  it is handed to the pool, so a burst of slider changes only queues the
+  last one and never holds a worker while waiting
+- jobs report progress; the slot keeps its last finished result, which the
+  page shows until the new one is ready
+- finished results are kept per parameter key, so going back to earlier
+  settings is instant
+
+    runner = JobRunner()
+    job = runner.submit('attribution', params, compute, touches)   # compute(token, touches)
+    shown, fresh = runner.display_result(job)   # last finished result until fresh
+
+Job functions take a CancelToken first and call token.report(fraction, message)
+between stages, which also raises JobCancelled once the job is superseded.
+Each job records its instrumentation spans into its own Tracer (job.tracer,
+enabled while the runner's `tracing` is on), not into the page's.
+Workers are threads: the NumPy stages release the GIL and the inputs are
+shared without copying. The shared pool has one worker per CPU, so sessions
+only queue behind each other once every core is busy. This module does not
+import Streamlit.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Tracer, use_tracer
+
+DEFAULT_WORKERS = max(2, os.cpu_count() or 1)
+DEFAULT_DEBOUNCE_SECONDS = 0.15
+DEFAULT_MAX_CACHED_RESULTS = 16
+# How often a waiting page reruns to pick up progress / results
+POLL_SECONDS = 0.25
+
+PENDING, RUNNING, DONE, CANCELLED, FAILED = 'pending', 'running', 'done', 'cancelled', 'failed'
+
+_shared_lock = threading.Lock()
+_shared_executor = None
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job has been superseded."""
+
+
+def job_key(params):
+    """Stable key of a parameter dict (JSON with sorted keys)."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def shared_executor(max_workers=DEFAULT_WORKERS):
+    """Process-wide worker pool shared by every session's JobRunner."""
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='attribution-job')
+        return _shared_executor
+
+
+class CancelToken:
+    """Handed to a job function: cancellation flag and progress reporting."""
+
+    def __init__(self, job):
+        self._job = job
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Raises JobCancelled if the job was superseded."""
+        if self._cancelled.is_set():
+            raise JobCancelled(self._job.key)
+
+    def report(self, fraction, message=''):
+        """Progress checkpoint: records progress (0..1) and stops a superseded job."""
+        self.check()
+        self._job.progress = min(max(float(fraction), 0.0), 1.0)
+        self._job.message = message
+
+
+class Job:
+    """One submitted computation: status, progress, result or error."""
+
+    def __init__(self, slot, key, params, tracing=False):
+        self.slot = slot
+        self.key = key
+        self.params = params
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = 'Queued'
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.finished = None
+        self.token = CancelToken(self)
+        self.tracer = Tracer(enabled=tracing)
+        self.timer = None
+        self.future = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self.status == DONE
+
+    @property
+    def finished_or_failed(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self.token.cancel()
+            if self.timer is not None:
+                self.timer.cancel()
+            # Still debouncing (never queued) or queued but not started
+            if self.future is None or self.future.cancel():
+                self._finish(CANCELLED)
+
+    def wait(self, timeout=None):
+        """Blocks until the job finished, failed or was cancelled; returns its status."""
+        self._done.wait(timeout)
+        return self.status
+
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.monotonic()
+        if status == DONE:
+            self.progress = 1.0
+        self._done.set()
+
+    def __repr__(self):
+        return f"Job({self.slot!r}, {self.status}, {self.progress:.0%})"
+
+
+class JobRunner:
+    """
+    Per-session job slots on a (shared) executor. Keep one per Streamlit
+    session, e.g. in st.session_state, with the process-wide shared_executor().
+    """
+
+    def __init__(self, executor=None, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                 max_cached_results=DEFAULT_MAX_CACHED_RESULTS, tracing=False):
+        self.executor = executor or shared_executor()
+        self.debounce_seconds = debounce_seconds
+        # New jobs trace their stages (see instrumentation.py)
+        self.tracing = tracing
+        self.max_cached_results = max_cached_results
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._last_finished = {}
+        self._results = OrderedDict()
+
+    def submit(self, slot, params, fn, *args, **kwargs):
+        """
+        Job computing fn(token, *args, **kwargs) for `params` in `slot`.
+        Returns the slot's current job if it already has these parameters, and a
+        finished job straight away if the result is cached; otherwise cancels the
+        slot's previous job and queues a new one (after `debounce_seconds` if
+        there was a previous job).
+        """
+        key = job_key(params)
+        with self._lock:
+            current = self._latest.get(slot)
+            if current is not None and current.key == key and current.status not in (CANCELLED, FAILED):
+                return current
+
+            job = Job(slot, key, params, self.tracing)
+            self._latest[slot] = job
+            cached = self._results.get((slot, key))
+            if cached is not None:
+                self._results.move_to_end((slot, key))
+                job._finish(DONE, cached)
+                self._last_finished[slot] = job
+            if current is not None and not current.finished_or_failed:
+                current.cancel()
+        if job.finished_or_failed:
+            return job
+        if current is not None and self.debounce_seconds > 0:
+            # Debounce on a timer: a job superseded while waiting is never queued
+            job.timer = threading.Timer(self.debounce_seconds, self._queue, (job, fn, args, kwargs))
+            job.timer.daemon = True
+            job.timer.start()
+        else:
+            self._queue(job, fn, args, kwargs)
+        return job
+
+    def _queue(self, job, fn, args, kwargs):
+        with job._lock:
+            if not job.token.cancelled:
+                job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+
+    def _run(self, job, fn, args, kwargs):
+        if job.token.cancelled:
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        job.message = 'Running'
+        try:
+            with use_tracer(job.tracer):
+                result = fn(job.token, *args, **kwargs)
+        except JobCancelled:
+            job._finish(CANCELLED)
+            return
+        except Exception as exc:
+            job._finish(FAILED, error=exc)
+            return
+
+        with self._lock:
+            self._results[(job.slot, job.key)] = result
+            while len(self._results) > self.max_cached_results:
+                self._results.popitem(last=False)
+            # A superseded job that finished anyway still beats an older result
+            previous = self._last_finished.get(job.slot)
+            if previous is None or previous.submitted < job.submitted:
+                self._last_finished[job.slot] = job
+        job._finish(DONE, result)
+
+    def latest(self, slot):
+        """Most recently submitted job of a slot (None if none)."""
+        with self._lock:
+            return self._latest.get(slot)
+
+    def last_finished(self, slot):
+        """Most recent finished job of a slot, whose result stays on screen (None if none)."""
+        with self._lock:
+            return self._last_finished.get(slot)
+
+    def last_result(self, slot, default=None):
+        job = self.last_finished(slot)
+        return default if job is None else job.result
+
+    def display_result(self, job):
+        """
+        (result, fresh) to show for a job: its own result once done, otherwise
+        (still running or failed) the slot's last finished result (None if
+        there is none yet). A failure is shown by render_job_status.
+        """
+        if job.done:
+            return job.result, True
+        return self.last_result(job.slot), False
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._latest.values())
+        for job in jobs:
+            if not job.finished_or_failed:
+                job.cancel()
+
+
+def render_job_status(container, job, showing_previous):
+    """
+    Progress of a slot's job for a Streamlit container (e.g. st.sidebar);
+    takes the container so this module does not import Streamlit.
+    """
+    if job.status == FAILED:
+        text = f"Attribution failed: {job.error!r}"
+        if showing_previous:
+            text += ' · showing the previous result'
+        container.error(text)
+    elif not job.done:
+        text = job.message or 'Recomputing'
+        if showing_previous:
+            text += ' · showing the previous result until the new one is ready'
+        container.progress(job.progress, text=f"⏳ {text}")
@@ -0,0 +1,234 @@
+"""
+Attribution Benchmark Suite
+Times every attribution path on seeded synthetic datasets of increasing size
+and writes machine-readable results, so runs can be compared and
+regressions caught before deploying.
+
+    python benchmark.py                                   # 10K, 100K, 1M, 10M journeys
+    python benchmark.py --sizes 10000 100000 --repeat 3 --output bench.json
+    python benchmark.py --sizes 100000 --compare bench.json --tolerance 0.2
+
+Per function and size: minimum and median latency over the repeats (a
+handful of runs supports no tail percentiles), throughput (journeys per
+second at the median latency) and peak traced memory of one extra run. Exits with status 1 if --compare finds a regression.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from attribution_cube import daily_credit
+from attribution_engine import ConversionTouches, JourneyBatch, code_dtype
+from attribution_logic import process_all_journeys
+from attribution_models import (apply_last_touch_attribution, apply_smart_attribution, apply_time_decay_attribution,
+                                calculate_attribution, get_top_conversion_paths)
+from channels import CHANNELS
+from data_export import csv_bytes
+from markov_attribution import markov_credit
+from shapley_attribution import shapley_credit
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 42
+REFERENCE_TIME = '2024-01-01'
+
+# Journey length distributions of the journey-list datasets
+LENGTH_DISTRIBUTIONS = {
+    'short': lambda rng, n: rng.integers(1, 4, size=n),                            # 1-3 touches
+    'default': lambda rng, n: rng.integers(2, 7, size=n),                          # 2-6, like marketing_dashboard
+    'long': lambda rng, n: np.minimum(rng.geometric(1 / 12, size=n), 50),          # mean ~12, capped at 50
+}
+
+CHANNEL_SCORES = {'Digital Ads': 3, 'Stories': 1, 'Push': 2, 'SMS': 2, 'Telemarketing': 4, 'Direct': 1, 'Banner': 1}
+
+
+# ---- Datasets ----
+
+def journey_dataset(n_journeys, distribution='default', seed=DEFAULT_SEED):
+    """Seeded JourneyBatch with Loan_Amount revenue and Time_To_Convert_Seconds."""
+    rng = np.random.default_rng(seed)
+    lengths = LENGTH_DISTRIBUTIONS[distribution](rng, n_journeys)
+    offsets = np.zeros(n_journeys + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    codes = rng.integers(0, len(CHANNELS), size=offsets[-1]).astype(code_dtype(len(CHANNELS)))
+    revenue = rng.integers(1000, 50001, size=n_journeys).astype(np.int32)
+    seconds = rng.integers(5, 86401, size=n_journeys).astype(np.int32)
+    return JourneyBatch(codes, offsets, revenue, CHANNELS, {'Time_To_Convert_Seconds': seconds})
+
+
+def interaction_dataset(n_journeys, seed=DEFAULT_SEED):
+    """
+    Seeded interaction log (app.py format) with about n_journeys converted
+    users: half of the default scenario mix converts.
+    """
+    return synthetic_data.generate_synthetic_data(num_users=2 * n_journeys, seed=seed,
+                                                  reference_time=REFERENCE_TIME)
+
+
+# ---- Benchmarked paths ----
+# Each case takes the prepared dataset and runs one public entry point end to end.
+
+CASES = {
+    # name: (dataset kind, function)
+    'process_all_journeys': ('journeys', lambda batch: process_all_journeys(batch, CHANNEL_SCORES)),
+    'markov_credit': ('journeys', markov_credit),
+    'shapley_credit': ('journeys', shapley_credit),
+    'calculate_attribution[Smart Model]': ('journeys', lambda batch: calculate_attribution(batch, 'Smart Model')),
+    'calculate_attribution[Legacy Last Touch]': ('journeys',
+                                                 lambda batch: calculate_attribution(batch, 'Legacy Last Touch')),
+    'apply_smart_attribution': ('interactions', lambda df: apply_smart_attribution(df, 60, 0.4, 0.4, 0.2)),
+    'apply_last_touch_attribution': ('interactions', apply_last_touch_attribution),
+    'apply_time_decay_attribution': ('interactions', lambda df: apply_time_decay_attribution(df, 86400)),
+    'get_top_conversion_paths': ('interactions', get_top_conversion_paths),
+    'daily_credit[smart]': ('interactions', lambda df: daily_credit(ConversionTouches(df), 'smart')),
+    'csv_bytes': ('interactions', csv_bytes),
+}
+
+
+# ---- Measurement ----
+
+def measure(fn, data, repeat):
+    """Latency of `repeat` runs (after one warm-up) and peak traced memory of one more run."""
+    fn(data)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'latency_s': {'min': float(np.min(latencies)), 'median': float(np.median(latencies))},
+        'peak_memory_bytes': int(peak),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, distributions=('default',), cases=None, repeat=DEFAULT_REPEAT,
+                   seed=DEFAULT_SEED, log=print):
+    """Runs the selected cases; returns the result document written by --output."""
+    cases = list(cases or CASES)
+    results = []
+    for size in sizes:
+        datasets = {}
+        if any(CASES[name][0] == 'interactions' for name in cases):
+            datasets['interactions'] = interaction_dataset(size, seed)
+
+        for distribution in distributions:
+            if any(CASES[name][0] == 'journeys' for name in cases):
+                datasets['journeys'] = journey_dataset(size, distribution, seed)
+
+            for name in cases:
+                kind, fn = CASES[name]
+                # The interaction log has one (scenario-driven) length distribution
+                if kind == 'interactions' and distribution != distributions[0]:
+                    continue
+                data = datasets[kind]
+                n_journeys = (data.n_journeys if kind == 'journeys'
+                              else int(data.loc[data['Converted'], 'User_ID'].nunique()))
+                stats = measure(fn, data, repeat)
+                stats.update({
+                    'function': name,
+                    'size': size,
+                    'distribution': distribution if kind == 'journeys' else 'scenarios',
+                    'journeys': n_journeys,
+                    'rows': len(data) if kind == 'interactions' else int(data.offsets[-1]),
+                    'repeat': repeat,
+                    'throughput_journeys_per_s': n_journeys / max(stats['latency_s']['median'], 1e-12),
+                })
+                results.append(stats)
+                log(f"{name:42s} {size:>10,} {stats['distribution']:>9s}  "
+                    f"min {stats['latency_s']['min'] * 1000:10.2f} ms  "
+                    f"median {stats['latency_s']['median'] * 1000:10.2f} ms  "
+                    f"{stats['throughput_journeys_per_s']:14,.0f} journeys/s  "
+                    f"peak {stats['peak_memory_bytes'] / 2**20:9.1f} MB")
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def _median(result):
+    # Baselines written before the median key stored it as 'p50'
+    latency = result['latency_s']
+    return latency['median'] if 'median' in latency else latency['p50']
+
+
+def compare(current, baseline, tolerance):
+    """Cases whose median latency grew by more than `tolerance` (a fraction) over the baseline."""
+    key = lambda r: (r['function'], r['size'], r['distribution'])
+    previous = {key(r): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        ratio = _median(result) / max(_median(old), 1e-12)
+        if ratio > 1 + tolerance:
+            regressions.append({'function': result['function'], 'size': result['size'],
+                                'distribution': result['distribution'], 'slowdown': ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='journeys per dataset')
+    parser.add_argument('--distributions', nargs='+', default=['default'], choices=list(LENGTH_DISTRIBUTIONS),
+                        help='journey length distributions of the journey-list datasets')
+    parser.add_argument('--functions', nargs='+', choices=list(CASES), help='subset of functions to run')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed runs per case')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON results file')
+    parser.add_argument('--compare', help='baseline JSON results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed median slowdown vs the baseline')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.distributions, args.functions, args.repeat, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['function']} size={r['size']} ({r['distribution']}): {r['slowdown']:.2f}x slower")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
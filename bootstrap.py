@@ -0,0 +1,299 @@
+"""
+Bootstrap Confidence Intervals
+Percentile bootstrap intervals for per-channel attributed revenue, for every
+model at once and without re-running the models.
+
+All supported models are additive over journeys and linear in each journey's
+value: a journey's credit is its value times a share vector that only depends
+on its path (and, for the filters, touch timing). The share vectors are
+computed once, on unit values, and journeys with identical share vectors
+under every model collapse into path groups. A bootstrap resample of the
+journeys is then a multinomial draw of group counts c, and a group's
+resampled credit is its share vector times the sum of c of its values drawn
+with replacement. Every replicate for every model comes from matrix products
+
+    replicates = (W * mean) @ S + (sqrt(W) * std * Z) @ S
+
+(W: replicates x groups counts, S: groups x (models x channels) shares,
+Z: standard normal). For a group of at least MIN_SPREAD_JOURNEYS journeys
+the value sum of its c draws is taken as normal with the exact conditional
+mean c * mean and variance c * std^2 (central limit theorem). Smaller groups
+are split further by value, so they are resampled exactly (std 0).
+
+Cost grows with the number of distinct paths, not journeys, also for
+continuous values such as app.py's Conversion_Value. Time Decay shares depend
+on exact touch times, so that model does not collapse and its groups are
+per journey.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from attribution_engine import ConversionTouches, JourneyBatch, position_weights, time_decay_weights
+
+DEFAULT_REPLICATES = 1000
+DEFAULT_CONFIDENCE = 0.95
+# Upper bound on replicate x group weight cells drawn per chunk (bounds memory)
+MAX_WEIGHT_CELLS = 1 << 24
+# Replicates per chunk at most (cancellation checkpoints)
+REPLICATE_CHUNK = 100
+# Path groups at least this large resample their value sums by the CLT; smaller ones exactly
+MIN_SPREAD_JOURNEYS = 50
+
+
+# ---- Per-journey credit as (journey, channel, credit) triplets ----
+
+def _unique_keys(keys, return_inverse=False):
+    """
+    np.unique for (journey * n_channels + channel) keys, which are already
+    grouped by journey: a stable sort of nearly sorted data is much cheaper
+    than the generic unique.
+    """
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    first = np.ones(len(ordered), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    if not return_inverse:
+        return ordered[first]
+    inverse = np.empty(len(keys), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return ordered[first], inverse
+
+
+def _canonical(journey, channel, credit, n_ch):
+    """Sums duplicate (journey, channel) pairs; triplets come out sorted by journey."""
+    keys, inverse = _unique_keys(journey.astype(np.int64) * n_ch + channel, return_inverse=True)
+    return keys // n_ch, keys % n_ch, np.bincount(inverse, weights=credit, minlength=len(keys))
+
+
+def _last_touch(batch):
+    has = batch.lengths > 0
+    return np.flatnonzero(has), batch.codes[batch.offsets[1:][has] - 1], batch.revenue[has].astype(np.float64)
+
+
+def _u_shape(batch, u_shape_weights=(0.4, 0.4, 0.2)):
+    first_weight, last_weight, middle_weight = u_shape_weights
+    batch = batch.deduplicate()
+    n_ch = batch.n_channels
+    seg = batch.segment_ids()
+    pos = batch.positions()
+    n = batch.lengths[seg]
+    rev = batch.revenue.astype(np.float64)
+
+    # First / last touches (and 1 / 2 touch journeys)
+    is_middle = (pos > 0) & (pos < n - 1)
+    edge = ~is_middle
+    weight = np.where(n == 1, 1.0, np.where(n == 2, 0.5, np.where(pos == 0, first_weight, last_weight)))
+
+    # Middle share split among the unique middle channels
+    keys = _unique_keys(seg[is_middle].astype(np.int64) * n_ch + batch.codes[is_middle])
+    key_seg = keys // n_ch
+    n_unique = np.bincount(key_seg, minlength=batch.n_journeys)
+
+    return (np.concatenate([seg[edge], key_seg]),
+            np.concatenate([batch.codes[edge], keys % n_ch]),
+            np.concatenate([weight[edge] * rev[seg[edge]], middle_weight * rev[key_seg] / n_unique[key_seg]]))
+
+
+def _weighted_score(batch, channel_scores):
+    batch = batch.deduplicate()
+    n_ch = batch.n_channels
+    scores = np.array([channel_scores.get(ch, 0) for ch in batch.channels], dtype=np.float64)
+    keys = _unique_keys(batch.segment_ids().astype(np.int64) * n_ch + batch.codes)
+    key_seg = keys // n_ch
+    key_scores = scores[keys % n_ch]
+    total_score = np.bincount(key_seg, weights=key_scores, minlength=batch.n_journeys)
+    valid = total_score[key_seg] > 0
+    return (key_seg[valid], (keys % n_ch)[valid],
+            batch.revenue[key_seg[valid]] * key_scores[valid] / total_score[key_seg[valid]])
+
+
+def _navigation_u_shape(batch, navigation_threshold=60, u_shape_weights=(0.4, 0.4, 0.2),
+                        seconds_col='Time_To_Convert_Seconds', channel='Stories'):
+    seg = batch.segment_ids()
+    is_last = batch.positions() == batch.lengths[seg] - 1
+    seconds = batch.columns[seconds_col]
+    keep = ~((batch.codes == batch.channels.get(channel)) & is_last & (seconds[seg] < navigation_threshold))
+    journey = seg[keep]
+    weights = position_weights(journey, batch.n_journeys, *u_shape_weights, two_touch_weights=(0.5, 0.5))
+    return journey, batch.codes[keep], batch.revenue.astype(np.float64)[journey] * weights
+
+
+def _smart(touches, navigation_threshold_seconds=60, first_weight=0.4, last_weight=0.4, middle_weight=0.2,
+           keep=None):
+    if keep is None:
+        keep = touches.navigation_mask(navigation_threshold_seconds)
+    journey = touches.touch_journey[keep]
+    value = touches.conversion_value.astype(np.float64)
+    weights = position_weights(journey, touches.n_journeys, first_weight, last_weight, middle_weight)
+
+    # Fallback: nothing left to credit -> conversion channel takes it all
+    empty = np.flatnonzero(np.bincount(journey, minlength=touches.n_journeys) == 0)
+    return (np.concatenate([journey, empty]),
+            np.concatenate([touches.touch_channel[keep], touches.conversion_channel[empty]]),
+            np.concatenate([value[journey] * weights, value[empty]]))
+
+
+def _time_decay(touches, half_life_seconds=86400):
+    before = touches.time_to_conversion >= 0
+    journey = touches.touch_journey[before]
+    value = touches.conversion_value.astype(np.float64)
+    weights = time_decay_weights(touches, half_life_seconds)[before]
+
+    # Fallback: no touch before conversion -> conversion channel takes it all
+    empty = np.flatnonzero(np.bincount(journey, minlength=touches.n_journeys) == 0)
+    return (np.concatenate([journey, empty]),
+            np.concatenate([touches.touch_channel[before], touches.conversion_channel[empty]]),
+            np.concatenate([value[journey] * weights, value[empty]]))
+
+
+JOURNEY_MODELS = {
+    'last_touch': _last_touch,
+    'u_shape': _u_shape,
+    'weighted_score': _weighted_score,
+    'navigation_u_shape': _navigation_u_shape,
+}
+
+
+def journey_credit(data, model, **params):
+    """
+    Per-journey credit of one model as sorted (journey, channel, credit)
+    triplets. `data` is a JourneyBatch, an interaction log DataFrame or a
+    ConversionTouches view (journey = converted user, in ConversionTouches order).
+    """
+    if isinstance(data, pd.DataFrame):
+        data = ConversionTouches(data)
+    if isinstance(data, ConversionTouches):
+        n_ch = data.n_channels
+        if model == 'smart':
+            triplets = _smart(data, **params)
+        elif model == 'time_decay':
+            triplets = _time_decay(data, **params)
+        elif model == 'last_touch':
+            triplets = (np.arange(data.n_journeys), data.conversion_channel,
+                        data.conversion_value.astype(np.float64))
+        else:
+            triplets = JOURNEY_MODELS[model](data.journey_batch(), **params)
+    else:
+        if model in ('smart', 'time_decay'):
+            raise ValueError(f"model {model!r} needs an interaction log (use 'navigation_u_shape' for journey batches)")
+        n_ch = data.n_channels
+        triplets = JOURNEY_MODELS[model](data, **params)
+    return _canonical(*triplets, n_ch)
+
+
+# ---- Grouping and resampling ----
+
+def _journey_hashes(journey, channel, credit, n_journeys):
+    """Order-independent 64-bit hash of every journey's credit vector (0 = no credit)."""
+    touch_hash = pd.util.hash_array(credit) * np.uint64(31) + pd.util.hash_array(channel.astype(np.int64))
+    hashes = np.zeros(n_journeys, dtype=np.uint64)
+    if len(journey):
+        starts = np.flatnonzero(np.r_[True, journey[1:] != journey[:-1]])
+        hashes[journey[starts]] = np.add.reduceat(touch_hash, starts)
+    return hashes
+
+
+def _unit_values(data):
+    """The same journeys with every value set to 1, as (data, values)."""
+    if isinstance(data, ConversionTouches):
+        values = data.conversion_value.astype(np.float64)
+        unit = copy.copy(data)
+        unit.conversion_value = np.ones(data.n_journeys)
+        return unit, values
+    values = data.revenue.astype(np.float64)
+    return JourneyBatch(data.codes, data.offsets, np.ones(data.n_journeys), data.channels, data.columns), values
+
+
+def credit_groups(data, models, min_spread_journeys=MIN_SPREAD_JOURNEYS, token=None):
+    """
+    Groups journeys with identical share vectors under all `models`
+    ({name: params}); groups smaller than `min_spread_journeys` are split
+    further by value. Returns (counts, mean, std, shares, channels):
+    journeys, mean value and value standard deviation (0 for exact groups)
+    per group, {model: (groups x n_channels) shares per unit of value} and
+    the registry. `token` (e.g. a background_jobs.CancelToken) is checked
+    after every model.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = ConversionTouches(data)
+    n_journeys = data.n_journeys
+    n_ch = data.n_channels
+    unit, values = _unit_values(data)
+    triplets = {}
+    for name, params in models.items():
+        triplets[name] = journey_credit(unit, name, **params)
+        if token is not None:
+            token.check()
+
+    key = np.zeros(n_journeys, dtype=np.uint64)
+    for journey, channel, share in triplets.values():
+        key = key * np.uint64(1_000_003) + _journey_hashes(journey, channel, share, n_journeys)
+    path_group, _ = pd.factorize(key)
+    small = np.bincount(path_group)[path_group] < min_spread_journeys
+    if small.any():
+        # Small path groups: one group per (path, value), resampled exactly
+        key[small] = key[small] * np.uint64(1_000_003) + pd.util.hash_array(values[small])
+    group, _ = pd.factorize(key)
+    counts = np.bincount(group)
+    mean = np.bincount(group, weights=values) / counts
+    std = np.sqrt(np.maximum(np.bincount(group, weights=values ** 2) / counts - mean ** 2, 0.0))
+    std[np.bincount(group, weights=small, minlength=len(counts)) > 0] = 0.0
+
+    shares = {}
+    for name, (journey, channel, share) in triplets.items():
+        sums = np.bincount(group[journey] * n_ch + channel, weights=share, minlength=len(counts) * n_ch)
+        shares[name] = sums.reshape(len(counts), n_ch) / counts[:, None]
+    return counts, mean, std, shares, data.channels
+
+
+def bootstrap_credit(data, models, n_replicates=DEFAULT_REPLICATES, confidence=DEFAULT_CONFIDENCE, seed=None,
+                     token=None):
+    """
+    Per-channel bootstrap intervals for several models on the same resamples.
+
+    `models` is {name: params} (or a list of names with default parameters).
+    Returns a DataFrame [Model, Channel, Estimate, Lower, Upper, Std Error],
+    one row per model and credited channel; Estimate is the full-data total.
+    `token` (e.g. a background_jobs.CancelToken) is checked between the
+    models and between replicate chunks, so a superseded job stops early.
+    """
+    if not isinstance(models, dict):
+        models = {name: {} for name in models}
+    counts, mean, std, shares, channels = credit_groups(data, models, token=token)
+    n_ch = len(channels)
+    n_journeys = int(counts.sum())
+    stacked = np.hstack([shares[name] for name in models])
+    spread = np.flatnonzero(std > 0)
+
+    rng = np.random.default_rng(seed)
+    probabilities = counts / max(n_journeys, 1)
+    chunk = max(1, min(n_replicates, REPLICATE_CHUNK, MAX_WEIGHT_CELLS // max(len(counts), 1)))
+    replicates = np.empty((n_replicates, stacked.shape[1]))
+    for start in range(0, n_replicates, chunk):
+        if token is not None:
+            token.check()
+        size = min(chunk, n_replicates - start)
+        weights = rng.multinomial(n_journeys, probabilities, size=size)
+        replicates[start:start + size] = (weights * mean) @ stacked
+        if len(spread):
+            noise = np.sqrt(weights[:, spread]) * std[spread] * rng.standard_normal((size, len(spread)))
+            replicates[start:start + size] += noise @ stacked[spread]
+
+    alpha = (1 - confidence) / 2
+    estimate = (counts * mean) @ stacked
+    lower, upper = np.quantile(replicates, [alpha, 1 - alpha], axis=0)
+    std_error = replicates.std(axis=0, ddof=1) if n_replicates > 1 else np.zeros(stacked.shape[1])
+
+    rows = []
+    for m, name in enumerate(models):
+        present = np.flatnonzero((shares[name] != 0).any(axis=0))
+        for c in present:
+            i = m * n_ch + c
+            rows.append((name, channels[c], estimate[i], lower[i], upper[i], std_error[i]))
+    frame = pd.DataFrame(rows, columns=['Model', 'Channel', 'Estimate', 'Lower', 'Upper', 'Std Error'])
+    frame.attrs.update({'groups': len(counts), 'journeys': n_journeys, 'replicates': n_replicates,
+                        'confidence': confidence})
+    return frame
@@ -0,0 +1,163 @@
+"""
+Channel Registry & Compact Journey
+Interns channel names ('Digital Ads', 'Stories', 'Telemarketing', ...) into
+small integer codes shared by attribution_logic, app and marketing_dashboard,
+so journeys are compared and accumulated as integers instead of strings.
+
+The shared CHANNELS registry interns every name it is given for the life of
+the process, so it is capped at MAX_SHARED_CHANNELS names (uint8 codes).
+Data with open-ended channel names (e.g. arbitrary uploads in a long-running
+process) should be encoded through its own ChannelRegistry(): every entry
+point takes a `registry` argument. Missing channel names (None / NaN) are
+rejected instead of being given a code.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+_intern_lock = threading.Lock()
+
+# Cap of the process-wide CHANNELS registry
+MAX_SHARED_CHANNELS = 256
+
+
+def _is_missing(name):
+    return name is None or name != name  # NaN != NaN
+
+
+class ChannelRegistry:
+    """
+    Bidirectional channel name <-> code mapping. Codes are dense (0..n-1) and
+    never change once assigned, so arrays indexed by code can be shared.
+    Supports the list-like reads used on `channels` attributes:
+    registry[code], len(registry), iteration and `name in registry`.
+    """
+
+    __slots__ = ('_names', '_codes', '_max_size')
+
+    def __init__(self, names=(), max_size=None):
+        self._names = []
+        self._codes = {}
+        self._max_size = max_size
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        """
+        Code of a channel, interning it if it has not been seen yet.
+        Raises ValueError for a missing name or when the registry is full.
+        """
+        code = self._codes.get(name)
+        if code is None:
+            if _is_missing(name):
+                raise ValueError("missing channel name (None / NaN) cannot be encoded")
+            with _intern_lock:
+                code = self._codes.get(name)
+                if code is None:
+                    if self._max_size is not None and len(self._names) >= self._max_size:
+                        raise ValueError(
+                            f"channel registry is full ({self._max_size} names, cannot add {name!r}); "
+                            "encode this data with its own ChannelRegistry()"
+                        )
+                    code = len(self._names)
+                    self._names.append(name)
+                    self._codes[name] = code
+        return code
+
+    def get(self, name, default=-1):
+        """Code of a channel without interning it (default if unknown)."""
+        return self._codes.get(name, default)
+
+    def encode(self, names):
+        """Vectorized `code` for an array/Series of channel names (ValueError on missing names)."""
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object) if not isinstance(names, pd.Series) else names)
+        if len(codes) and codes.min() < 0:
+            raise ValueError(f"{int((codes < 0).sum())} missing channel names (None / NaN) cannot be encoded")
+        lookup = np.array([self.code(name) for name in uniques], dtype=np.int64)
+        return lookup[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+
+    def decode(self, codes):
+        """Channel names for an iterable of codes."""
+        return [self._names[c] for c in codes]
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    def __getitem__(self, code):
+        return self._names[code]
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __contains__(self, name):
+        return name in self._codes
+
+    def __getstate__(self):
+        return (self._names, self._max_size)
+
+    def __setstate__(self, state):
+        self._names = list(state[0])
+        self._codes = {name: code for code, name in enumerate(self._names)}
+        self._max_size = state[1] if len(state) > 1 else None
+
+    def __repr__(self):
+        return f"ChannelRegistry({self._names!r})"
+
+
+# Shared default registry: every code path encodes through it, so a channel has
+# the same code in app.py, marketing_dashboard.py and attribution_logic.py.
+# Names are never removed, hence the cap (see the module docstring).
+CHANNELS = ChannelRegistry([
+    'Digital Ads', 'Stories', 'Push', 'SMS', 'Telemarketing', 'Direct', 'Banner'
+], max_size=MAX_SHARED_CHANNELS)
+
+STORIES = CHANNELS.code('Stories')
+
+
+class Journey:
+    """
+    Compact single journey: an array of channel codes plus its revenue.
+    Iterating yields channel names, so it also works wherever a plain
+    list of channels is expected.
+    """
+
+    __slots__ = ('codes', 'revenue', 'registry')
+
+    def __init__(self, codes, revenue=1, registry=CHANNELS):
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.revenue = revenue
+        self.registry = registry
+
+    @classmethod
+    def from_names(cls, names, revenue=1, registry=CHANNELS):
+        return cls(np.fromiter((registry.code(n) for n in names), dtype=np.int64), revenue, registry)
+
+    def names(self):
+        return self.registry.decode(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return Journey(self.codes[item], self.revenue, self.registry)
+        return self.registry[self.codes[item]]
+
+    def __eq__(self, other):
+        return self.names() == list(other)
+
+    def __hash__(self):
+        # Equal journeys (and the equal tuple of names) hash alike
+        return hash(tuple(self.names()))
+
+    def __repr__(self):
+        return f"Journey({self.names()!r}, revenue={self.revenue!r})"
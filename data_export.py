@@ -0,0 +1,283 @@
+"""
+Data Export
+Exports of raw events, per-journey credits and per-channel results without
+holding a full CSV string (and its encoded copy) in memory:
+
+- chunked CSV: `iter_csv` formats and encodes `chunk_rows` rows at a time,
+  so `write_csv` streams to a file and `csv_bytes` only ever holds the
+  output plus one chunk
+- compressed columnar: Parquet (zstd) when pyarrow is installed, otherwise
+  a compressed NumPy archive (.npz) with strings dictionary-encoded; both
+  read back with `read_columnar`
+
+    data, file_name, mime = export_bytes(df, 'columnar', 'attribution_data')
+
+Per-journey credit and per-channel result frames come from
+bootstrap.journey_credit (same models and parameters).
+"""
+
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import journey_credit
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+    PARQUET = True
+except ImportError:  # pyarrow is optional: compressed .npz fallback below
+    PARQUET = False
+
+# Rows formatted per CSV chunk (bounds the per-chunk string lists)
+DEFAULT_CHUNK_ROWS = 20_000
+FORMATS = ('csv', 'columnar')
+META_KEY = '__meta__'
+
+
+# ---- Chunked CSV ----
+
+def _quote(text):
+    """CSV field as pandas writes it (minimal quoting)."""
+    if any(ch in text for ch in ',"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _lookup_text(codes, values):
+    """Per-row text from dictionary codes (-1 = missing -> empty field)."""
+    table = np.array([_quote(str(value)) for value in values] + [''], dtype=object)
+    return table[np.where(codes < 0, len(values), codes)].tolist()
+
+
+def _column_formatter(series):
+    """
+    Function formatting a slice of the column to a list of CSV fields
+    byte-identical to DataFrame.to_csv, or None if the dtype has no fast path.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return lambda s: _lookup_text(s.cat.codes.to_numpy(), list(s.cat.categories))
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        return lambda s: _lookup_text(*pd.factorize(s))
+    if not isinstance(dtype, np.dtype):
+        # Extension dtypes (nullable Int64, boolean, Float64, ...) write <NA> as an empty field
+        return None
+    if dtype == bool:
+        return lambda s: np.array(['False', 'True'], dtype=object)[s.to_numpy().astype(np.int8)].tolist()
+    if dtype.kind in 'iu':
+        return lambda s: list(map(str, s.to_numpy().tolist()))
+    if dtype == np.float64:
+        def floats(s):
+            values = s.to_numpy()
+            text = values.astype(str)
+            text[np.isnan(values)] = ''
+            return text.tolist()
+        return floats
+    if pd.api.types.is_datetime64_dtype(dtype):
+        values = series.to_numpy()
+        seconds = values.astype('datetime64[s]')
+        if not np.isnat(values).any() and (seconds == values).all():
+            if (seconds == seconds.astype('datetime64[D]')).all():
+                # Every value at midnight: pandas writes the date only
+                return lambda s: np.datetime_as_string(s.to_numpy().astype('datetime64[D]')).tolist()
+            # Whole seconds: pandas writes 'YYYY-MM-DD HH:MM:SS'
+            return lambda s: _format_seconds(s.to_numpy()).tolist()
+    return None
+
+
+def _column_text(series):
+    """
+    to_csv fields of a whole datetime-like column. pandas picks the format of
+    these dtypes from every value (date only, sub-second digits), so they are
+    formatted before chunking, not per chunk.
+    """
+    lines = series.to_frame().to_csv(index=False, header=False, lineterminator='\n').split('\n')[:-1]
+    # A single-column row with a missing value is written as ""
+    return pd.Series(['' if line == '""' else line for line in lines], index=series.index, dtype=object)
+
+
+def _format_seconds(values):
+    text = np.datetime_as_string(values.astype('datetime64[s]'), unit='s')
+    # 'YYYY-MM-DDTHH:MM:SS' -> pandas' space separator, in place on the UCS-4 buffer
+    text.view(np.uint32).reshape(len(text), -1)[:, 10] = ord(' ')
+    return text
+
+
+def iter_csv(frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    UTF-8 CSV of a DataFrame (no index) as byte chunks: header, then
+    chunk_rows rows at a time. Columns are formatted as whole arrays when
+    every dtype allows it (same bytes as to_csv), chunk.to_csv otherwise.
+    """
+    yield frame.iloc[:0].to_csv(index=False).encode('utf-8')
+    formatters = [_column_formatter(frame[name]) for name in frame.columns] if len(frame.columns) > 1 else [None]
+    fast = all(formatter is not None for formatter in formatters)
+    if not fast:
+        frame = frame.assign(**{
+            name: _column_text(frame[name]) for name in frame.columns
+            if pd.api.types.is_datetime64_any_dtype(frame[name].dtype)
+            or pd.api.types.is_timedelta64_dtype(frame[name].dtype)
+        })
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        if fast:
+            fields = [formatter(chunk.iloc[:, i]) for i, formatter in enumerate(formatters)]
+            yield (os.linesep.join(map(','.join, zip(*fields))) + os.linesep).encode('utf-8')
+        else:
+            yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+
+def write_csv(frame, fileobj, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Streams the CSV of a DataFrame into a binary file object; returns the bytes written."""
+    written = 0
+    for chunk in iter_csv(frame, chunk_rows):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def csv_bytes(frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+    buffer = io.BytesIO()
+    write_csv(frame, buffer, chunk_rows)
+    return buffer.getvalue()
+
+
+# ---- Compressed columnar ----
+
+def _encode_column(series):
+    """(kind, arrays, extra meta) of one column for the .npz archive."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category', {'codes': series.cat.codes.to_numpy().astype(np.int32),
+                            'values': np.asarray(series.cat.categories, dtype=str)}, {}
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        codes, uniques = pd.factorize(series)
+        return 'category', {'codes': codes.astype(np.int32), 'values': np.asarray(uniques, dtype=str)}, {}
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        tz = getattr(dtype, 'tz', None)
+        values = series.dt.tz_convert('UTC').dt.tz_localize(None) if tz is not None else series
+        return 'datetime', {'values': values.to_numpy(dtype='datetime64[ns]').view(np.int64)}, \
+            {'tz': None if tz is None else str(tz)}
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return 'timedelta', {'values': series.to_numpy(dtype='timedelta64[ns]').view(np.int64)}, {}
+    return 'values', {'values': series.to_numpy()}, {}
+
+
+def _npz_bytes(frame):
+    arrays, columns = {}, []
+    for i, name in enumerate(frame.columns):
+        kind, parts, extra = _encode_column(frame[name])
+        for part, array in parts.items():
+            arrays[f'c{i}_{part}'] = array
+        columns.append({'name': str(name), 'kind': kind, **extra})
+    arrays[META_KEY] = np.array(json.dumps({'rows': len(frame), 'columns': columns}))
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _read_npz(source):
+    with np.load(source, allow_pickle=False) as archive:
+        meta = json.loads(str(archive[META_KEY]))
+        data = {}
+        for i, column in enumerate(meta['columns']):
+            kind = column['kind']
+            if kind == 'category':
+                codes, values = archive[f'c{i}_codes'], archive[f'c{i}_values']
+                data[column['name']] = pd.Categorical.from_codes(codes, values.astype(object))
+            elif kind == 'datetime':
+                values = pd.Series(archive[f'c{i}_values'].view('datetime64[ns]'))
+                data[column['name']] = values.dt.tz_localize('UTC').dt.tz_convert(column['tz']) \
+                    if column['tz'] else values
+            elif kind == 'timedelta':
+                data[column['name']] = archive[f'c{i}_values'].view('timedelta64[ns]')
+            else:
+                data[column['name']] = archive[f'c{i}_values']
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']))
+
+
+def columnar_extension():
+    """File extension of the columnar export: '.parquet' with pyarrow, '.npz' otherwise."""
+    return '.parquet' if PARQUET else '.npz'
+
+
+def columnar_bytes(frame):
+    """Compressed columnar file of a DataFrame (no index): Parquet (zstd) or .npz."""
+    if PARQUET:
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False, compression='zstd')
+        return buffer.getvalue()
+    return _npz_bytes(frame)
+
+
+def read_columnar(source):
+    """DataFrame from a columnar export (path, bytes or binary file object); strings come back categorical."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if isinstance(source, str):
+        if source.lower().endswith('.parquet'):
+            return pd.read_parquet(source)
+        return _read_npz(source)
+    head = source.read(4)
+    source.seek(0)
+    return pd.read_parquet(source) if head == b'PAR1' else _read_npz(source)
+
+
+def write_columnar(frame, path):
+    """Writes a columnar export by extension: .parquet (needs pyarrow) or .npz."""
+    if path.lower().endswith('.parquet'):
+        frame.to_parquet(path, index=False, compression='zstd')
+    else:
+        with open(path, 'wb') as f:
+            f.write(_npz_bytes(frame))
+
+
+def export_bytes(frame, fmt='csv', name='export', chunk_rows=DEFAULT_CHUNK_ROWS):
+    """(data, file_name, mime) of a DataFrame export in 'csv' or 'columnar' format."""
+    if fmt == 'csv':
+        return csv_bytes(frame, chunk_rows), f'{name}.csv', 'text/csv'
+    if fmt == 'columnar':
+        mime = 'application/vnd.apache.parquet' if PARQUET else 'application/octet-stream'
+        return columnar_bytes(frame), f'{name}{columnar_extension()}', mime
+    raise ValueError(f"export format must be one of {FORMATS}, got {fmt!r}")
+
+
+# ---- Export tables ----
+
+def journey_credit_frame(touches, models):
+    """
+    Per-journey credit of several models ({label: (model, params)}) on a
+    ConversionTouches view as a long DataFrame [User_ID, Model, Channel, Credit].
+    """
+    parts = []
+    for label, (model, params) in models.items():
+        journey, channel, credit = journey_credit(touches, model, **params)
+        parts.append(pd.DataFrame({
+            'User_ID': touches.user_ids[journey],
+            'Model': pd.Categorical.from_codes(np.zeros(len(journey), dtype=np.int8), [label]),
+            'Channel': pd.Categorical.from_codes(channel.astype(np.int32), touches.channels.names),
+            'Credit': credit
+        }))
+    if not parts:
+        return pd.DataFrame(columns=['User_ID', 'Model', 'Channel', 'Credit'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def channel_credit_frame(touches, models, value_name='Revenue'):
+    """
+    Per-channel totals of several models ({label: (model, params)}) on a
+    ConversionTouches view as one DataFrame [Model, Channel, value_name],
+    summed from the same per-journey credits as journey_credit_frame.
+    """
+    parts = []
+    for label, (model, params) in models.items():
+        _, channel, credit = journey_credit(touches, model, **params)
+        totals = np.bincount(channel, weights=credit, minlength=touches.n_channels)
+        present = np.bincount(channel, minlength=touches.n_channels) > 0
+        parts.append(touches.to_frame(totals, present, value_name).assign(Model=label))
+    if not parts:
+        return pd.DataFrame(columns=['Model', 'Channel', value_name])
+    return pd.concat(parts, ignore_index=True)[['Model', 'Channel', value_name]]
@@ -0,0 +1,385 @@
+"""
+Workbook / CSV Ingestion
+Python port of the upload page parsing (parseCashLoan / parseChannelSheet in
+upload_script.js): a cash_loan sheet with loan issue dates plus one sheet per
+communication channel, keyed by client ID.
+
+Sheets are read in streaming mode (openpyxl read-only for .xlsx, chunked
+read_csv for CSV exports), one sheet per worker process, and every chunk is
+reduced to compact arrays right away, so peak memory stays bounded by the
+chunk size instead of the sheet size. The result is a columnar EventStore.
+"""
+
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from channels import CHANNELS
+
+LOAN_SHEET_NAMES = ('cash_loan', 'cashloan', 'loans')
+
+# Same keys and date columns as CHANNEL_CONFIG in upload_script.js;
+# `channel` is the registry name used by the Python dashboards.
+CHANNEL_CONFIG = {
+    'stories': {'date_col': 'EVENT_TIME', 'channel': 'Stories'},
+    'push': {'date_col': 'EVENT_TIME', 'channel': 'Push'},
+    'sms': {'date_col': 'EVENT_TIME', 'channel': 'SMS'},
+    'telemarket': {'date_col': 'CREATED', 'channel': 'Telemarketing'},
+    'banner': {'date_col': 'EVENT_TIME', 'channel': 'Banner'},
+    'digital': {'date_col': 'EVENT_TIME', 'channel': 'Digital Ads'},
+}
+
+# Header priority rules
+LOAN_CLIENT_COLUMNS = ('CLI_CODE', 'CLIENT_CD', 'CLI_ID')
+LOAN_DATE_COLUMNS = ('DT_OPEN',)
+EVENT_CLIENT_COLUMNS = ('CLIENT_CD', 'CLI_CODE', 'CLI_ID')
+EVENT_DATE_FALLBACKS = ('EVENT_TIME', 'CREATED', 'DATE')
+
+EXCEL_EPOCH = np.datetime64('1899-12-30T00:00:00', 'ns')
+# Excel serials inside the datetime64[ns] range (1677-09-22 .. 2262-04-11); others become NaT
+_EPOCH_NS, _DAY_NS = int(EXCEL_EPOCH.astype(np.int64)), 86_400_000_000_000
+SERIAL_MIN_DAYS = -((_EPOCH_NS - np.iinfo(np.int64).min - 1) // _DAY_NS)
+SERIAL_MAX_DAYS = (np.iinfo(np.int64).max - _EPOCH_NS) // _DAY_NS
+DEFAULT_CHUNK_ROWS = 200_000
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.zip', '.csv.bz2', '.csv.xz')
+
+
+class EventStore:
+    """
+    Columnar event store consumed by the journey builder / attribution code.
+
+    Loans:   loan_client (int32 client code), loan_open (datetime64[ns])
+    Events:  event_client (int32), event_time (datetime64[ns]), event_channel (registry code)
+    Clients: client_keys[code] is the 64-bit hash of the normalized client ID;
+             loan_client_ids holds the normalized ID string of every loan.
+    stats:   {channel name: number of valid rows}
+    """
+
+    def __init__(self, loan_client, loan_open, loan_client_ids, event_client, event_time, event_channel,
+                 client_keys, channels=CHANNELS, stats=None):
+        self.loan_client = loan_client
+        self.loan_open = loan_open
+        self.loan_client_ids = loan_client_ids
+        self.event_client = event_client
+        self.event_time = event_time
+        self.event_channel = event_channel
+        self.client_keys = client_keys
+        self.channels = channels
+        self.stats = dict(stats or {})
+
+    @property
+    def n_loans(self):
+        return len(self.loan_client)
+
+    @property
+    def n_events(self):
+        return len(self.event_client)
+
+    @property
+    def n_clients(self):
+        return len(self.client_keys)
+
+    def loans_frame(self):
+        return pd.DataFrame({
+            'CLI_CODE': self.loan_client_ids,
+            'Client': self.loan_client,
+            'DT_OPEN': self.loan_open
+        })
+
+    def events_frame(self):
+        return pd.DataFrame({
+            'Client': self.event_client,
+            'Channel': self.channels.decode(self.event_channel),
+            'Event_Time': self.event_time
+        })
+
+
+# ---- Normalization (normalizeId / toDate in upload_script.js) ----
+
+def _normalize_id(val):
+    if val is None or (isinstance(val, float) and np.isnan(val)) or val == '':
+        return ''
+    if isinstance(val, float) and val.is_integer():
+        val = int(val)  # JS String(123.0) -> '123'
+    return str(val).strip().lstrip('0') or '0'
+
+
+def normalize_ids(values):
+    """
+    Vectorized normalizeId: strip, drop leading zeros ('' for missing).
+    Only unique values are normalized in Python, then mapped back.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    normalized = np.array([_normalize_id(v) for v in uniques] + [''], dtype=object)
+    return normalized[codes]  # code -1 (missing) picks the trailing ''
+
+
+def serial_dates(serial):
+    """Excel serial day numbers -> datetime64[ns]; NaN and serials outside the ns range become NaT."""
+    serial = np.asarray(serial, dtype=np.float64)
+    valid = np.isfinite(serial) & (serial >= SERIAL_MIN_DAYS) & (serial <= SERIAL_MAX_DAYS)
+    result = np.full(len(serial), np.datetime64('NaT'), dtype='datetime64[ns]')
+    millis = np.round(serial[valid] * 86_400_000).astype(np.int64)
+    result[valid] = EXCEL_EPOCH + (millis * 1_000_000).astype('timedelta64[ns]')
+    return result
+
+
+def parse_dates(values):
+    """
+    Vectorized toDate: datetimes as is, numbers as Excel serial dates,
+    strings parsed; anything else (or unparseable) becomes NaT.
+    """
+    values = pd.Series(values)
+    if values.dtype.kind in 'iuf':
+        return serial_dates(values.to_numpy(dtype=np.float64, na_value=np.nan))
+    values = values.astype(object)
+
+    # Homogeneous columns (the common case) in one call
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ('datetime', 'datetime64', 'date'):
+        return pd.to_datetime(values, errors='coerce').to_numpy(dtype='datetime64[ns]')
+    if kind == 'string':
+        return pd.to_datetime(values, errors='coerce', format='mixed').to_numpy(dtype='datetime64[ns]')
+    if kind in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+        return serial_dates(pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64))
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if kind in ('empty', 'boolean'):
+        return result
+
+    # Mixed columns: classify by the type of each cell (one pass), then convert each class at once
+    type_codes, types = pd.factorize(values.map(type))
+    classes = np.array([
+        'number' if issubclass(t, (int, float, np.number)) and not issubclass(t, (bool, np.bool_))
+        else 'string' if issubclass(t, str) else 'other' for t in types
+    ] + ['other'])[type_codes]
+    is_number, is_string = classes == 'number', classes == 'string'
+    is_date = (classes == 'other') & values.notna().to_numpy()
+
+    if is_date.any():
+        result[is_date] = pd.to_datetime(values[is_date], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    if is_number.any():
+        result[is_number] = serial_dates(values[is_number].astype(np.float64).to_numpy())
+    if is_string.any():
+        result[is_string] = pd.to_datetime(
+            values[is_string], errors='coerce', format='mixed'
+        ).to_numpy(dtype='datetime64[ns]')
+
+    return result
+
+
+def hash_ids(ids):
+    """64-bit hashes of normalized ID strings; stable across worker processes."""
+    return pd.util.hash_array(np.asarray(ids, dtype=object))
+
+
+def find_column(headers, candidates):
+    """Index of the first candidate header present (priority order), or -1."""
+    for name in candidates:
+        if name in headers:
+            return headers.index(name)
+    return -1
+
+
+def classify_sheet(name):
+    """('loans', None), ('channel', config_key) or (None, None) for a sheet name."""
+    lower = name.lower().strip()
+    if lower in LOAN_SHEET_NAMES:
+        return 'loans', None
+    for key in CHANNEL_CONFIG:
+        if key in lower:
+            return 'channel', key
+    return None, None
+
+
+# ---- Streaming readers ----
+
+def _xlsx_sheet_names(path):
+    try:
+        import openpyxl
+    except ImportError as exc:
+        raise ImportError("Reading .xlsx workbooks requires openpyxl (pip install openpyxl)") from exc
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _iter_xlsx_chunks(path, sheet, candidates, chunk_rows):
+    """
+    Yields (headers, column_indexes, None) once, then (headers, column_indexes,
+    [client_values, date_values]) per chunk of a read-only worksheet.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return
+        headers = [str(h if h is not None else '').strip().upper() for h in header_row]
+        idx = [find_column(headers, group) for group in candidates]
+        yield headers, idx, None
+        if min(idx) < 0:
+            return
+
+        chunk = []
+        for row in rows:
+            chunk.append(tuple(row[i] if i < len(row) else None for i in idx))
+            if len(chunk) >= chunk_rows:
+                yield headers, idx, list(zip(*chunk))
+                chunk = []
+        if chunk:
+            yield headers, idx, list(zip(*chunk))
+    finally:
+        workbook.close()
+
+
+def _iter_csv_chunks(path, candidates, chunk_rows):
+    """Same protocol as _iter_xlsx_chunks, for a CSV export read with chunked read_csv."""
+    raw_headers = list(pd.read_csv(path, nrows=0).columns)
+    headers = [str(h).strip().upper() for h in raw_headers]
+    idx = [find_column(headers, group) for group in candidates]
+    yield headers, idx, None
+    if min(idx) < 0:
+        return
+
+    for chunk in pd.read_csv(path, usecols=[raw_headers[i] for i in idx], dtype=str,
+                             keep_default_na=False, chunksize=chunk_rows):
+        columns = [chunk[raw_headers[i]].to_numpy(dtype=object) for i in idx]
+        # CSV cells are text; numeric date cells are Excel serials like in the workbook
+        # (empty cells count as missing numbers, so an all-serial column stays numeric)
+        dates = columns[1]
+        numeric = pd.to_numeric(pd.Series(dates), errors='coerce').to_numpy()
+        if (np.isnan(numeric) <= (dates == '')).all():
+            columns[1] = numeric
+        else:
+            columns[1] = np.where(np.isnan(numeric) & (dates != ''), dates, numeric).astype(object)
+        yield headers, idx, columns
+
+
+def _parse_sheet(task):
+    """
+    Worker: streams one sheet and reduces it to (client hash, timestamp) arrays.
+    Rows without a client ID or a valid date are skipped, like the JS parser.
+    """
+    kind, source, sheet, role, key, chunk_rows = task
+
+    if role == 'loans':
+        candidates = (LOAN_CLIENT_COLUMNS, LOAN_DATE_COLUMNS)
+    else:
+        date_col = CHANNEL_CONFIG[key]['date_col'].upper()
+        candidates = (EVENT_CLIENT_COLUMNS, (date_col,) + EVENT_DATE_FALLBACKS)
+
+    if kind == 'xlsx':
+        chunks = _iter_xlsx_chunks(source, sheet, candidates, chunk_rows)
+    else:
+        chunks = _iter_csv_chunks(source, candidates, chunk_rows)
+
+    hashes, times, ids = [], [], []
+    found = True
+    for headers, idx, columns in chunks:
+        if columns is None:
+            found = min(idx) >= 0
+            continue
+        client = normalize_ids(columns[0])
+        when = parse_dates(columns[1])
+        valid = (client != '') & ~np.isnat(when)
+        hashes.append(hash_ids(client[valid]))
+        times.append(when[valid])
+        if role == 'loans':
+            ids.append(client[valid])
+
+    return {
+        'sheet': sheet,
+        'role': role,
+        'key': key,
+        'found_columns': found,
+        'hashes': np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint64),
+        'times': np.concatenate(times) if times else np.zeros(0, dtype='datetime64[ns]'),
+        'ids': np.concatenate(ids) if ids else np.zeros(0, dtype=object),
+    }
+
+
+def _sheet_tasks(path, chunk_rows):
+    """(kind, source, sheet, role, key, chunk_rows) for every recognized sheet."""
+    if os.path.isdir(path):
+        sources = [(os.path.join(path, f), f) for f in sorted(os.listdir(path)) if f.lower().endswith(CSV_SUFFIXES)]
+        sheets = [('csv', source, name.split('.')[0]) for source, name in sources]
+    elif str(path).lower().endswith(CSV_SUFFIXES):
+        raise ValueError("CSV exports are read from a directory with one file per sheet (cash_loan.csv, stories.csv, ...)")
+    else:
+        sheets = [('xlsx', path, name) for name in _xlsx_sheet_names(path)]
+
+    tasks = []
+    for kind, source, sheet in sheets:
+        role, key = classify_sheet(sheet)
+        # Only the first loan sheet is used; later ones are ignored like in the upload page
+        if role == 'loans' and any(task[3] == 'loans' for task in tasks):
+            continue
+        if role is not None:
+            tasks.append((kind, source, sheet, role, key, chunk_rows))
+    return tasks
+
+
+def load_event_store(path, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS, registry=CHANNELS):
+    """
+    Reads a multi-sheet workbook (.xlsx) or a directory of per-sheet CSV
+    exports into an EventStore.
+
+    Args:
+        path: .xlsx file, or directory with cash_loan.csv and channel CSVs
+        workers: worker processes (one sheet each); None = one per sheet up to
+                 the CPU count, 1 = parse in this process
+        chunk_rows: rows per streamed chunk (bounds memory per worker)
+    """
+    tasks = _sheet_tasks(path, chunk_rows)
+    if not any(task[3] == 'loans' for task in tasks):
+        raise ValueError('No "cash_loan" sheet with loan issues found.')
+
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_sheet, tasks))
+    else:
+        results = [_parse_sheet(task) for task in tasks]
+
+    loans = next(r for r in results if r['role'] == 'loans')
+    if not loans['found_columns']:
+        raise ValueError('Column CLI_CODE / CLIENT_CD or DT_OPEN not found in cash_loan.')
+
+    event_parts = []
+    stats = {}
+    for result in results:
+        if result['role'] != 'channel':
+            continue
+        if not result['found_columns']:
+            warnings.warn(f"{result['sheet']}: client or date column not found, sheet skipped")
+            continue
+        channel = CHANNEL_CONFIG[result['key']]['channel']
+        stats[channel] = stats.get(channel, 0) + len(result['hashes'])
+        event_parts.append((result['hashes'], result['times'], registry.code(channel)))
+
+    # Integer-encode clients across loans and events with one factorize
+    event_hashes = np.concatenate([p[0] for p in event_parts]) if event_parts else np.zeros(0, dtype=np.uint64)
+    codes, client_keys = pd.factorize(np.concatenate([loans['hashes'], event_hashes]))
+    codes = codes.astype(np.int32)
+    n_loans = len(loans['hashes'])
+
+    return EventStore(
+        loan_client=codes[:n_loans],
+        loan_open=loans['times'],
+        loan_client_ids=loans['ids'],
+        event_client=codes[n_loans:],
+        event_time=np.concatenate([p[1] for p in event_parts]) if event_parts else np.zeros(0, dtype='datetime64[ns]'),
+        event_channel=np.concatenate([np.full(len(p[0]), p[2], dtype=np.int16) for p in event_parts])
+        if event_parts else np.zeros(0, dtype=np.int16),
+        client_keys=np.asarray(client_keys, dtype=np.uint64),
+        channels=registry,
+        stats=stats
+    )
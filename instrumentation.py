@@ -0,0 +1,280 @@
+"""
+Stage Instrumentation
+Named timing spans and counters around the attribution stages (data
+generation, journey extraction, navigation filter, U-Shape weighting,
+groupby, chart rendering).
+
+Off by default: a span is then one attribute check returning a shared no-op
+context manager, and counters return immediately. When on, spans and
+counters are collected in memory, summarized per stage (dashboard sidebar)
+and exported as a Chrome trace-event JSON file, which chrome://tracing,
+Perfetto and speedscope can open.
+
+    from instrumentation import TRACER
+
+    with TRACER.span('engine.navigation_filter'):
+        ...
+    TRACER.count('stories_touches_dropped', n)
+
+TRACER records into the tracer bound to the calling thread, or else into
+the process-wide PROCESS_TRACER (CLI, benchmarks), which is enabled with
+TRACER.enable() or the ATTRIBUTION_TRACE=1 environment variable. A
+Streamlit session binds its own Tracer to its script thread, and each
+background job records into its own (see background_jobs.py), so sessions
+never see or reset each other's spans:
+
+    tracer = Tracer(enabled=True)
+    with use_tracer(tracer):
+        ...                        # TRACER.span / count land in `tracer`
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+DEFAULT_TRACE_PATH = os.environ.get('ATTRIBUTION_TRACE_FILE', 'attribution_trace.json')
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.tracer._record(self.name, self.start, end - self.start, self.args)
+        return False
+
+
+class Tracer:
+    """Collects spans (name, start, duration, thread) and named counters."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Drops all recorded spans and counters."""
+        with self._lock:
+            self.spans = []
+            self.counters = {}
+            self._counter_events = []
+            self._origin = time.perf_counter_ns()
+
+    def span(self, name, **args):
+        """Context manager timing a named stage (extra keyword args are stored with the span)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, value=1):
+        """Adds `value` to a named counter (rows processed, touches dropped, ...)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self._counter_events.append((name, time.perf_counter_ns(), total))
+
+    def traced(self, name):
+        """Decorator: runs the whole function inside a span."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def merge(self, other):
+        """Adds another tracer's spans and counters (e.g. a background job's) to this one."""
+        with other._lock:
+            spans = list(other.spans)
+            counter_events = list(other._counter_events)
+            counters = dict(other.counters)
+            origin = other._origin
+        with self._lock:
+            self.spans.extend(spans)
+            self._counter_events.extend(counter_events)
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self._origin = min(self._origin, origin)
+
+    def _record(self, name, start, duration, args):
+        with self._lock:
+            self.spans.append((name, start, duration, threading.get_ident(), args))
+
+    def summary(self):
+        """Per-stage totals as DataFrame [Stage, Calls, Total ms, Mean ms, Share %], slowest first."""
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return pd.DataFrame({'Stage': [], 'Calls': [], 'Total ms': [], 'Mean ms': [], 'Share %': []})
+
+        frame = pd.DataFrame({'Stage': [s[0] for s in spans], 'ms': [s[2] / 1e6 for s in spans]})
+        stats = frame.groupby('Stage', sort=False)['ms'].agg(['count', 'sum', 'mean']).reset_index()
+        stats.columns = ['Stage', 'Calls', 'Total ms', 'Mean ms']
+        wall = (max(s[1] + s[2] for s in spans) - min(s[1] for s in spans)) / 1e6
+        stats['Share %'] = stats['Total ms'] / max(wall, 1e-9) * 100
+        return stats.sort_values('Total ms', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    def trace_events(self):
+        """Spans and counters in Chrome trace-event format (microsecond timestamps)."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            counter_events = list(self._counter_events)
+            origin = self._origin
+
+        events = [{
+            'name': name, 'ph': 'X', 'ts': (start - origin) / 1e3, 'dur': duration / 1e3,
+            'pid': pid, 'tid': tid, 'args': args
+        } for name, start, duration, tid, args in spans]
+        events += [{
+            'name': name, 'ph': 'C', 'ts': (at - origin) / 1e3, 'pid': pid, 'args': {name: total}
+        } for name, at, total in counter_events]
+        return events
+
+    def to_json(self):
+        return json.dumps({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms',
+                           'otherData': {'counters': self.counters}})
+
+    def write_trace(self, path=DEFAULT_TRACE_PATH):
+        """Writes the Chrome trace JSON; returns the path."""
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+        return path
+
+
+_thread = threading.local()
+
+
+def current_tracer():
+    """Tracer bound to the calling thread (bind_tracer / use_tracer), else PROCESS_TRACER."""
+    return getattr(_thread, 'tracer', None) or PROCESS_TRACER
+
+
+def bind_tracer(tracer):
+    """Routes TRACER in the calling thread to `tracer` (None: back to PROCESS_TRACER)."""
+    _thread.tracer = tracer
+
+
+@contextlib.contextmanager
+def use_tracer(tracer):
+    """Routes TRACER in the calling thread to `tracer` for the duration of the block."""
+    previous = getattr(_thread, 'tracer', None)
+    _thread.tracer = tracer
+    try:
+        yield tracer
+    finally:
+        _thread.tracer = previous
+
+
+class _ThreadTracer:
+    """TRACER: forwards to current_tracer(), so the engine needs no tracer argument."""
+
+    @property
+    def enabled(self):
+        return current_tracer().enabled
+
+    def span(self, name, **args):
+        return current_tracer().span(name, **args)
+
+    def count(self, name, value=1):
+        current_tracer().count(name, value)
+
+    def traced(self, name):
+        """Decorator: runs the whole function inside a span of the calling thread's tracer."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                tracer = current_tracer()
+                if not tracer.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(tracer, name, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def __getattr__(self, name):
+        return getattr(current_tracer(), name)
+
+
+def render_timings(container, tracer=None, jobs=None):
+    """
+    Stage breakdown, counters and a trace download for a Streamlit container
+    (e.g. st.sidebar); takes the container so this module does not import Streamlit.
+    `jobs` ({label: Tracer}) adds the background jobs behind the results on screen.
+    """
+    tracer = tracer or current_tracer()
+    jobs = {label: job for label, job in (jobs or {}).items() if job.spans or job.counters}
+    combined = Tracer()
+    for part in [tracer, *jobs.values()]:
+        combined.merge(part)
+    trace_json = combined.to_json()
+    # ATTRIBUTION_TRACE_FILE set: also keep the latest trace on disk for external profilers
+    if 'ATTRIBUTION_TRACE_FILE' in os.environ:
+        with open(DEFAULT_TRACE_PATH, 'w') as f:
+            f.write(trace_json)
+
+    box = container.expander("⏱️ Stage Timings", expanded=True)
+    box.caption("Stages of this rerun; cached stages only appear when recomputed.")
+    box.dataframe(
+        tracer.summary().style.format({'Total ms': '{:.2f}', 'Mean ms': '{:.3f}', 'Share %': '{:.1f}'}),
+        use_container_width=True
+    )
+    box.write({name: f"{value:,}" for name, value in tracer.counters.items()})
+    for label, job in jobs.items():
+        box.caption(f"Background job: {label}")
+        box.dataframe(
+            job.summary().style.format({'Total ms': '{:.2f}', 'Mean ms': '{:.3f}', 'Share %': '{:.1f}'}),
+            use_container_width=True
+        )
+        box.write({name: f"{value:,}" for name, value in job.counters.items()})
+    box.download_button(
+        label="📥 Download trace (JSON)",
+        data=trace_json.encode('utf-8'),
+        file_name='attribution_trace.json',
+        mime='application/json',
+        help="Chrome trace-event format: open in chrome://tracing, Perfetto or speedscope."
+    )
+
+
+# Process-wide tracer of threads without their own (CLI, benchmarks)
+PROCESS_TRACER = Tracer(enabled=os.environ.get('ATTRIBUTION_TRACE', '') not in ('', '0'))
+# Used by app.py, marketing_dashboard.py, attribution_logic.py and the engine
+TRACER = _ThreadTracer()
@@ -0,0 +1,121 @@
+"""
+Loan-Window Journey Builder
+Python port of buildJourneys in upload_script.js, as one sort-merge pass
+instead of filtering a client's whole event list for every loan.
+
+A loan's journey is the client's events in (previous DT_OPEN, DT_OPEN],
+where a DT_OPEN without a time of day means the end of that day. Events and
+loan window bounds are sorted together once; each bound's rank among the
+events gives the window as a slice of the sorted event array.
+"""
+
+import numpy as np
+
+from attribution_engine import JourneyBatch, code_dtype
+
+DAY_NS = 86_400_000_000_000
+END_OF_DAY_NS = DAY_NS - 1_000_000  # 23:59:59.999, like setHours(23, 59, 59, 999)
+
+
+def _end_of_day_if(times_ns, time_of_day_limit_ns):
+    """Moves times whose time of day is below the limit to 23:59:59.999 of the same day."""
+    time_of_day = times_ns % DAY_NS
+    return np.where(time_of_day < time_of_day_limit_ns, times_ns - time_of_day + END_OF_DAY_NS, times_ns)
+
+
+def _window_bounds(event_client, event_time, query_client, query_time):
+    """
+    Sorts the events by (client, time) and, for every (client, time) query,
+    counts the events that sort at or before it, i.e. searchsorted(side='right')
+    on that order. Returns (event_order, ranks).
+
+    When it fits in int64, (client, time) is packed into one key - time in
+    the coarsest unit that divides every event time, so floor-dividing the
+    bounds keeps `<=` / `>` exact - which is one stable argsort plus a binary
+    search. Otherwise events and queries are lexsorted together.
+    """
+    n_clients = int(max(event_client.max(initial=-1), query_client.max(initial=-1))) + 1
+    if len(event_time):
+        origin = int(event_time.min())
+        offset = event_time - origin
+        unit = next(u for u in (10**9, 10**6, 10**3, 1) if not (offset % u).any())
+        width = int(offset.max()) // unit + 1
+        if n_clients * (width + 1) < 2**62:
+            event_key = event_client * width + offset // unit
+            event_order = np.argsort(event_key, kind='stable')
+            # Bounds outside the event range clip to just before / at the end of the client's block
+            query_offset = np.clip((query_time - origin) // unit, -1, width - 1)
+            ranks = np.searchsorted(event_key[event_order], query_client * width + query_offset, side='right')
+            return event_order, ranks
+
+    n_events = len(event_client)
+    client = np.concatenate([event_client, query_client])
+    time = np.concatenate([event_time, query_time])
+    # Ties: events before queries, so an event at exactly the bound counts as "at or before"
+    is_query = np.concatenate([np.zeros(n_events, dtype=np.int8), np.ones(len(query_client), dtype=np.int8)])
+
+    order = np.lexsort((is_query, time, client))
+    events_before = np.cumsum(is_query[order] == 0)
+
+    ranks = np.empty(len(query_client), dtype=np.int64)
+    query_pos = order >= n_events
+    ranks[order[query_pos] - n_events] = events_before[query_pos]
+    return order[~query_pos], ranks
+
+
+def build_loan_journeys(store, dedup=True):
+    """
+    One journey per loan of an EventStore (ingestion.py), in loan order.
+
+    Returns a JourneyBatch whose paths are the channels of the client's
+    events inside the loan window (consecutive duplicates collapsed unless
+    dedup=False), revenue 1 per loan, and columns:
+        Client (int client code), CLI_CODE (normalized ID), DT_Open,
+        Is_Organic (no communications in the window)
+    """
+    n_loans = store.n_loans
+    loan_client = store.loan_client.astype(np.int64)
+    loan_open = store.loan_open.astype('datetime64[ns]').astype(np.int64)
+
+    # Window end: DT_OPEN, or the end of that day if it has no time (h = m = s = 0)
+    cutoff = _end_of_day_if(loan_open, 1_000_000_000)
+
+    # Window start: previous loan of the same client (sorted by DT_OPEN), end of
+    # its day if it has no hours/minutes; epoch for the first loan
+    by_client = np.lexsort((np.arange(n_loans), loan_open, loan_client))
+    sorted_client = loan_client[by_client]
+    has_prev = np.zeros(n_loans, dtype=bool)
+    has_prev[1:] = sorted_client[1:] == sorted_client[:-1]
+    prev_open = np.zeros(n_loans, dtype=np.int64)
+    prev_open[1:] = loan_open[by_client][:-1]
+    sorted_start = np.where(has_prev, _end_of_day_if(prev_open, 60_000_000_000), 0)
+    start = np.empty(n_loans, dtype=np.int64)
+    start[by_client] = sorted_start
+
+    # Events sorted once by (client, time); windows become slices [lo, hi)
+    event_client = store.event_client.astype(np.int64)
+    event_time = store.event_time.astype('datetime64[ns]').astype(np.int64)
+    event_order, bounds = _window_bounds(
+        event_client, event_time,
+        np.concatenate([loan_client, loan_client]), np.concatenate([start, cutoff])
+    )
+    lo, hi = bounds[:n_loans], bounds[n_loans:]
+    lengths = np.maximum(hi - lo, 0)
+
+    offsets = np.zeros(n_loans + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    events = event_order[np.repeat(lo, lengths) + within]
+
+    codes = store.event_channel[events].astype(code_dtype(len(store.channels)))
+    batch = JourneyBatch(codes, offsets, np.ones(n_loans, dtype=np.int32), store.channels)
+    if dedup:
+        batch = batch.deduplicate()
+
+    batch.columns = {
+        'Client': store.loan_client,
+        'CLI_CODE': store.loan_client_ids,
+        'DT_Open': store.loan_open,
+        'Is_Organic': batch.lengths == 0,
+    }
+    return batch
@@ -0,0 +1,234 @@
+"""
+On-Disk Journey Store
+Persistent, append-only columnar journey storage for datasets that do not fit
+in memory. A store is a directory of flat little-endian binary files plus a
+small JSON manifest:
+
+    manifest.json       counts, dtypes, channel names, per-journey columns
+    codes.bin           channel code of every touch
+    offsets.bin         int64, n_journeys + 1 (journey j = codes[offsets[j]:offsets[j+1]])
+    revenue.bin         revenue of every journey
+    touch_time.bin      optional int64 ns timestamp of every touch
+    col_<name>.bin      optional numeric per-journey columns
+
+Files are read through memory maps, so opening a store only parses the
+manifest, and attribution runs chunk by chunk over JourneyBatch views.
+Appends write and fsync the data files first and replace the manifest last
+(atomically, then fsync the directory), so a crash mid-append leaves the
+previous state readable, and a durable manifest never points past durable data.
+A failed append leaves the store unchanged.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from attribution_engine import JourneyBatch, code_dtype
+from channels import ChannelRegistry
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_JOURNEYS = 1_000_000
+
+
+def _fsync_dir(path):
+    """Makes file creations / renames in a directory durable (no-op where directories cannot be opened)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _map(path, dtype, count):
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+class JourneyStore:
+    """
+    Open with JourneyStore.create(path, ...) or JourneyStore.open(path).
+
+    Attributes (memory-mapped, read-only):
+        codes, offsets, revenue, touch_time (or None), columns {name: array}
+        channels: ChannelRegistry of the store's codes
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.channels = ChannelRegistry(manifest['channels'])
+        self._map_files()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map_files(self):
+        m = self.manifest
+        n, n_touches = m['n_journeys'], m['n_touches']
+        self.codes = _map(self._file('codes.bin'), m['code_dtype'], n_touches)
+        self.offsets = _map(self._file('offsets.bin'), '<i8', n + 1)
+        if n == 0:
+            self.offsets = np.zeros(1, dtype='<i8')
+        self.revenue = _map(self._file('revenue.bin'), m['revenue_dtype'], n)
+        self.touch_time = _map(self._file('touch_time.bin'), '<i8', n_touches) if m['touch_time'] else None
+        self.columns = {name: _map(self._file(f'col_{name}.bin'), dtype, n) for name, dtype in m['columns'].items()}
+
+    @classmethod
+    def create(cls, path, channels=(), revenue_dtype='<f8', columns=None, touch_time=False, max_channels=255):
+        """
+        Creates an empty store.
+
+        Args:
+            channels: initial channel names (more are added on append)
+            revenue_dtype: dtype of the revenue file
+            columns: {name: dtype} of numeric per-journey columns
+            touch_time: also store a timestamp per touch
+            max_channels: sizes the code dtype (uint8 up to 255 channels)
+        """
+        os.makedirs(path, exist_ok=False)
+        manifest = {
+            'version': FORMAT_VERSION,
+            'n_journeys': 0,
+            'n_touches': 0,
+            'code_dtype': np.dtype(code_dtype(max_channels)).newbyteorder('<').str,
+            'revenue_dtype': np.dtype(revenue_dtype).newbyteorder('<').str,
+            'touch_time': bool(touch_time),
+            'columns': {name: np.dtype(dtype).newbyteorder('<').str for name, dtype in (columns or {}).items()},
+            'channels': list(channels),
+        }
+        names = ['codes.bin', 'offsets.bin', 'revenue.bin'] + [f'col_{name}.bin' for name in manifest['columns']]
+        if touch_time:
+            names.append('touch_time.bin')
+        for name in names:
+            open(os.path.join(path, name), 'wb').close()
+        with open(os.path.join(path, 'offsets.bin'), 'wb') as f:
+            f.write(np.zeros(1, dtype='<i8').tobytes())
+        store = cls(path, manifest)
+        store._write_manifest(manifest)
+        return store
+
+    @classmethod
+    def open(cls, path):
+        """Opens an existing store (reads the manifest and maps the files)."""
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported journey store version {manifest.get('version')}")
+        return cls(path, manifest)
+
+    def _write_manifest(self, manifest):
+        tmp = self._file(MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # Data file entries before the manifest that points at them, then the rename itself
+        _fsync_dir(self.path)
+        os.replace(tmp, self._file(MANIFEST))
+        _fsync_dir(self.path)
+        self.manifest = manifest
+
+    def _append_file(self, name, values, count):
+        """
+        Appends at the position implied by the manifest (drops bytes of an
+        interrupted append) and fsyncs the file.
+        """
+        values = np.ascontiguousarray(values)
+        with open(self._file(name), 'r+b') as f:
+            f.truncate(count * values.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, batch, touch_time=None):
+        """
+        Appends a JourneyBatch (its channel codes are translated to the
+        store's codes by name). `touch_time` (datetime64 / int64 ns per touch)
+        is required if the store keeps touch timestamps; the store's
+        per-journey columns are taken from batch.columns.
+
+        Everything is validated and converted before the first write, and new
+        channel names are only added to the store's registry once the
+        manifest is written, so a failed append leaves the store unchanged.
+        """
+        m = self.manifest
+        if m['touch_time'] and touch_time is None:
+            raise ValueError("this store keeps touch timestamps: pass touch_time")
+        missing = [name for name in m['columns'] if name not in batch.columns]
+        if missing:
+            raise ValueError(f"batch is missing store columns: {missing}")
+
+        # Store codes of the batch's channels; new names get the next free codes
+        new_names = [name for name in dict.fromkeys(batch.channels) if name not in self.channels]
+        codes_dtype = np.dtype(m['code_dtype'])
+        if len(self.channels) + len(new_names) > np.iinfo(codes_dtype).max + 1:
+            raise ValueError(f"too many channels for a {codes_dtype} code file")
+        new_codes = {name: len(self.channels) + i for i, name in enumerate(new_names)}
+        lookup = np.array([self.channels.get(name, new_codes.get(name)) for name in batch.channels], dtype=np.int64)
+        codes = lookup[batch.codes].astype(codes_dtype) if len(batch.codes) else np.zeros(0, dtype=codes_dtype)
+
+        n, n_touches = m['n_journeys'], m['n_touches']
+        per_journey = {'revenue.bin': np.asarray(batch.revenue).astype(m['revenue_dtype'])}
+        for name, dtype in m['columns'].items():
+            per_journey[f'col_{name}.bin'] = np.asarray(batch.columns[name]).astype(dtype)
+        wrong = [name for name, values in per_journey.items() if len(values) != batch.n_journeys]
+        if wrong:
+            raise ValueError(f"{wrong}: not one value per journey")
+        arrays = [('codes.bin', codes, n_touches),
+                  ('offsets.bin', (np.asarray(batch.offsets[1:]) + n_touches).astype('<i8'), n + 1)]
+        arrays += [(name, values, n) for name, values in per_journey.items()]
+        if m['touch_time']:
+            times = np.asarray(touch_time).astype('datetime64[ns]').astype('<i8')
+            if len(times) != len(codes):
+                raise ValueError(f"touch_time has {len(times)} values for {len(codes)} touches")
+            arrays.append(('touch_time.bin', times, n_touches))
+
+        for name, values, count in arrays:
+            self._append_file(name, values, count)
+        self._write_manifest(dict(m, n_journeys=n + batch.n_journeys, n_touches=n_touches + len(codes),
+                                  channels=self.channels.names + new_names))
+        for name in new_names:
+            self.channels.code(name)
+        self._map_files()
+        return self
+
+    @property
+    def n_journeys(self):
+        return self.manifest['n_journeys']
+
+    def __len__(self):
+        return self.n_journeys
+
+    def batch(self, start=0, stop=None):
+        """Journeys start..stop as a JourneyBatch of memory-mapped views (only touched pages are read)."""
+        stop = self.n_journeys if stop is None else min(stop, self.n_journeys)
+        lo, hi = int(self.offsets[start]), int(self.offsets[stop])
+        columns = {name: values[start:stop] for name, values in self.columns.items()}
+        return JourneyBatch(self.codes[lo:hi], np.asarray(self.offsets[start:stop + 1]) - lo,
+                            self.revenue[start:stop], self.channels, columns)
+
+    def iter_batches(self, chunk_journeys=DEFAULT_CHUNK_JOURNEYS):
+        """JourneyBatch chunks of at most chunk_journeys journeys, in order."""
+        for start in range(0, self.n_journeys, chunk_journeys):
+            yield self.batch(start, start + chunk_journeys)
+
+    def reduce_credit(self, credit_fn, *args, chunk_journeys=DEFAULT_CHUNK_JOURNEYS, **kwargs):
+        """
+        Runs a batch credit function (e.g. attribution_engine.u_shape_credit,
+        returning (totals, present)) chunk by chunk and sums the chunks.
+        Returns {channel: credit}.
+        """
+        n_ch = len(self.channels)
+        totals = np.zeros(n_ch)
+        present = np.zeros(n_ch, dtype=bool)
+        for batch in self.iter_batches(chunk_journeys):
+            part_totals, part_present = credit_fn(batch, *args, **kwargs)
+            totals[:len(part_totals)] += part_totals
+            present[:len(part_present)] |= part_present
+        return {self.channels[c]: float(totals[c]) for c in np.flatnonzero(present)}
@@ -5,126 +5,98 @@ import plotly.express as px
 import plotly.graph_objects as go
 import time
 
+from attribution_engine import JourneyBatch, code_dtype
+from attribution_models import calculate_attribution
+from background_jobs import POLL_SECONDS, JobRunner, render_job_status, shared_executor
+from bootstrap import bootstrap_credit
+from channels import CHANNELS, STORIES
+from instrumentation import PROCESS_TRACER, TRACER, Tracer, bind_tracer, render_timings
+from navigation_index import build_last_touch_index
+
 # ---------------------------------------------------------
 # 1. Synthetic Data Generation (Cached)
 # ---------------------------------------------------------
 @st.cache_data
-def generate_synthetic_data(n_rows=8000):
+def generate_synthetic_data(n_rows=8000, seed=None):
     """
     Generates synthetic user journey data for a Banking Loan product.
     Simulates a bias where 'Stories' often appears as a last touch 
     very close to conversion (navigation clicks).
+    
+    Returns a compact JourneyBatch instead of a DataFrame of Python lists:
+    uint8 channel codes (shared CHANNELS registry) + offsets, with int32 Loan_Amount (revenue) and
+    Time_To_Convert_Seconds columns. All rows are drawn at once with NumPy.
     """
     
     channels = ['Digital Ads', 'Push', 'Telemarketing', 'SMS', 'Direct', 'Stories']
+    channel_codes = CHANNELS.encode(channels).astype(code_dtype(len(CHANNELS)))
+    rng = np.random.default_rng(seed)
     
-    data = []
+    # Random journey length 2-6
+    journey_len = rng.integers(2, 7, size=n_rows)
+    offsets = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(journey_len, out=offsets[1:])
+    last = offsets[1:] - 1
     
-    # Probabilities for channel occurrence
-    # Stories has high prob to be last touch in bias scenario
+    # Base journey
+    codes = channel_codes[rng.integers(0, len(channels), size=offsets[-1])]
     
-    for _ in range(n_rows):
-        # Random journey length 2-6
-        journey_len = np.random.randint(2, 7)
-        
-        # Base journey
-        journey = np.random.choice(channels, size=journey_len, replace=True).tolist()
-        
-        # Simulating Bias: 
-        # 30% of conversions have "Stories" as the very last touch
-        # and it happened very quickly (navigation click)
-        is_navigation_click = np.random.random() < 0.30
-        
-        time_to_convert = 0
-        
-        if is_navigation_click:
-            # Force last touch to be Stories
-            journey[-1] = 'Stories'
-            # Short time to convert (e.g., 5-55 seconds)
-            time_to_convert = np.random.randint(5, 59)
-        else:
-            # Normal conversions (e.g., 2 minutes to 24 hours)
-            time_to_convert = np.random.randint(120, 86400)
-            
-            # Ensure last touch isn't Stories to emphasize the contrast 
-            # (or leave it random, but let's make it less likely for contrast)
-            if journey[-1] == 'Stories' and np.random.random() < 0.5:
-                 journey[-1] = np.random.choice(['Digital Ads', 'Telemarketing'])
-
-        # Loan Amount ($1k - $50k)
-        loan_amount = np.random.randint(1000, 50001)
-        
-        data.append({
-            'Journey_List': journey,
-            'Time_To_Convert_Seconds': time_to_convert,
-            'Loan_Amount': loan_amount
-        })
-        
-    return pd.DataFrame(data)
+    # Simulating Bias: 
+    # 30% of conversions have "Stories" as the very last touch
+    # and it happened very quickly (navigation click)
+    is_navigation_click = rng.random(n_rows) < 0.30
+    
+    # Force last touch to be Stories, short time to convert (e.g., 5-58 seconds)
+    codes[last[is_navigation_click]] = STORIES
+    time_to_convert = np.where(
+        is_navigation_click,
+        rng.integers(5, 59, size=n_rows),
+        # Normal conversions (e.g., 2 minutes to 24 hours)
+        rng.integers(120, 86400, size=n_rows)
+    ).astype(np.int32)
+    
+    # Ensure last touch isn't Stories to emphasize the contrast 
+    # (half of the normal conversions ending in Stories move to Digital Ads / Telemarketing)
+    swap = ~is_navigation_click & (codes[last] == STORIES) & (rng.random(n_rows) < 0.5)
+    replacement = CHANNELS.encode(['Digital Ads', 'Telemarketing']).astype(codes.dtype)
+    codes[last[swap]] = replacement[rng.integers(0, 2, size=swap.sum())]
+    
+    # Loan Amount ($1k - $50k)
+    loan_amount = rng.integers(1000, 50001, size=n_rows).astype(np.int32)
+    
+    return JourneyBatch(
+        codes,
+        offsets,
+        loan_amount,
+        CHANNELS,
+        columns={'Time_To_Convert_Seconds': time_to_convert, 'Loan_Amount': loan_amount}
+    )
 
 # ---------------------------------------------------------
 # 2. Attribution Logic
 # ---------------------------------------------------------
-def calculate_attribution(df, model_type, navigation_threshold=60, u_shape_weights=(0.4, 0.4, 0.2)):
+@st.cache_data
+def build_navigation_index():
     """
-    Calculates attributed sales volume based on the selected model.
+    Smart Model basis for every navigation threshold at once, so the
+    threshold and weight sliders only do a lookup (see navigation_index.py).
     """
-    # Initialize attributions
-    channel_revenue = {}
-    
-    w_first, w_last, w_middle = u_shape_weights
-    
-    for _, row in df.iterrows():
-        journey = row['Journey_List']
-        revenue = row['Loan_Amount']
-        time_seconds = row['Time_To_Convert_Seconds']
-        
-        # --- PRE-PROCESSING (SMART MODEL ONLY) ---
-        if model_type == 'Smart Model':
-            # Check for "Navigation Click" bias
-            last_touch = journey[-1]
-            if last_touch == 'Stories' and time_seconds < navigation_threshold:
-                # Ignore the last touch (Stories)
-                # Slicing excluding the last element
-                journey = journey[:-1]
-                
-            # If journey becomes empty (rare, but possible if length was 1), skip or attribute to Direct
-            if not journey:
-                continue
-
-        # --- ATTRIBUTION MODELS ---
-        
-        if model_type == 'Legacy Last Touch':
-            # Simple Last Touch
-            winner = journey[-1]
-            channel_revenue[winner] = channel_revenue.get(winner, 0) + revenue
-            
-        elif model_type == 'Smart Model':
-            # U-Shape (Position Based) on the *cleaned* journey
-            n = len(journey)
-            
-            if n == 1:
-                # 100% to single touch
-                touch = journey[0]
-                channel_revenue[touch] = channel_revenue.get(touch, 0) + revenue
-            elif n == 2:
-                # Split 50/50 (or follow U-Shape logic: first/last)
-                # Let's use proportional U-Shape logic: First (0.5), Last (0.5) normalizing 0.4/0.4
-                # Or simplier: 50% each
-                for touch in journey:
-                    channel_revenue[touch] = channel_revenue.get(touch, 0) + (revenue * 0.5)
-            else:
-                # 3+ touchpoints
-                # First
-                channel_revenue[journey[0]] = channel_revenue.get(journey[0], 0) + (revenue * w_first)
-                # Last
-                channel_revenue[journey[-1]] = channel_revenue.get(journey[-1], 0) + (revenue * w_last)
-                # Middle (split remaining w_middle among n-2 items)
-                middle_share = (revenue * w_middle) / (n - 2)
-                for touch in journey[1:-1]:
-                    channel_revenue[touch] = channel_revenue.get(touch, 0) + middle_share
+    batch = generate_synthetic_data()
+    return build_last_touch_index(batch, batch.columns['Time_To_Convert_Seconds'])
 
-    return channel_revenue
+def compute_intervals(token, batch, nav_threshold, u_shape_weights):
+    """
+    95% bootstrap intervals of both models on the same 1,000 journey resamples
+    (see bootstrap.py); runs as a background job (see background_jobs.py).
+    """
+    token.report(0.1, 'Resampling journeys')
+    intervals = bootstrap_credit(batch, {
+        'last_touch': {},
+        'navigation_u_shape': {'navigation_threshold': nav_threshold, 'u_shape_weights': u_shape_weights},
+    }, seed=0, token=token)
+    intervals['Model'] = intervals['Model'].map({'last_touch': 'Legacy Last Touch',
+                                                 'navigation_u_shape': 'Smart Model'})
+    return intervals
 
 # ---------------------------------------------------------
 # 3. Main Render Function
@@ -136,6 +108,15 @@ def render_attribution_page():
     # --- Sidebar Controls ---
     st.sidebar.header("⚙️ Smart Model Settings")
     
+    # Per-session tracer bound to this script thread (see instrumentation.py)
+    if 'tracer' not in st.session_state:
+        st.session_state.tracer = Tracer(enabled=PROCESS_TRACER.enabled)
+    tracer = st.session_state.tracer
+    show_timings = st.sidebar.checkbox("⏱️ Show stage timings", value=tracer.enabled)
+    tracer.enable(show_timings)
+    tracer.reset()
+    bind_tracer(tracer)
+    
     nav_threshold = st.sidebar.slider(
         "Navigation Threshold (Stories)", 
         min_value=0, 
@@ -157,22 +138,21 @@ def render_attribution_page():
         st.sidebar.info(f"Middle Weight (Calculated): {w_middle}")
     
     # --- Data Generation ---
-    with st.spinner("Generating synthetic banking journeys..."):
+    with st.spinner("Generating synthetic banking journeys..."), TRACER.span('dashboard.generate_data'):
         df = generate_synthetic_data()
         
     st.write(f"**Data Profile:** {len(df):,} User Journeys generated.")
     
     with st.expander("Peek at Raw Data"):
-        st.dataframe(df.head())
+        st.dataframe(df.to_frame(0, 5))
 
     # --- Calculations ---
-    legacy_results = calculate_attribution(df, 'Legacy Last Touch')
-    smart_results = calculate_attribution(
-        df, 
-        'Smart Model', 
-        navigation_threshold=nav_threshold, 
-        u_shape_weights=(w_first, w_last, w_middle)
-    )
+    with TRACER.span('dashboard.legacy_last_touch'):
+        legacy_results = calculate_attribution(df, 'Legacy Last Touch')
+    navigation_index = build_navigation_index()
+    with TRACER.span('dashboard.smart_model_lookup'):
+        smart_results = navigation_index.lookup_dict(nav_threshold, w_first, w_last, w_middle)
+    TRACER.count('dashboard.journeys', len(df))
     
     # --- Processing for Chart ---
     # Convert dicts to DF
@@ -190,18 +170,19 @@ def render_attribution_page():
     # --- Visualization ---
     st.subheader("📊 Attribution Model Comparison")
     
-    fig = px.bar(
-        df_combined,
-        x='Channel',
-        y='Volume',
-        color='Model',
-        barmode='group',
-        category_orders={'Channel': total_vol},
-        title="Attributed Sales Volume: Legacy vs Smart Logic",
-        color_discrete_map={'Legacy Last Touch': '#EF553B', 'Smart Model': '#636EFA'}
-    )
-    fig.update_layout(yaxis_title="Total Loan Value ($)")
-    st.plotly_chart(fig, use_container_width=True)
+    with TRACER.span('dashboard.plotly_render'):
+        fig = px.bar(
+            df_combined,
+            x='Channel',
+            y='Volume',
+            color='Model',
+            barmode='group',
+            category_orders={'Channel': total_vol},
+            title="Attributed Sales Volume: Legacy vs Smart Logic",
+            color_discrete_map={'Legacy Last Touch': '#EF553B', 'Smart Model': '#636EFA'}
+        )
+        fig.update_layout(yaxis_title="Total Loan Value ($)")
+        st.plotly_chart(fig, use_container_width=True)
     
     # --- Metric Deltas ---
     st.subheader("📉 Impact Analysis")
@@ -234,6 +215,42 @@ def render_attribution_page():
             delta_color="normal" # Positive is green
         )
         st.caption("Real value uncovered underneath")
+    
+    intervals_shown = None
+    if st.checkbox("📏 Show 95% bootstrap intervals"):
+        # Resampling runs in the background: slider moves supersede it and
+        # the previous intervals stay on screen until the new ones are ready
+        if 'jobs' not in st.session_state:
+            st.session_state.jobs = JobRunner(shared_executor())
+        jobs = st.session_state.jobs
+        jobs.tracing = show_timings
+        u_shape_weights = (w_first, w_last, w_middle)
+        intervals_job = jobs.submit(
+            'dashboard_intervals', {'navigation_threshold': nav_threshold, 'u_shape_weights': u_shape_weights},
+            compute_intervals, df, nav_threshold, u_shape_weights
+        )
+        intervals, fresh = jobs.display_result(intervals_job)
+        render_job_status(st, intervals_job, showing_previous=intervals is not None and not fresh)
+        if intervals is not None:
+            st.dataframe(
+                intervals.style.format(
+                    {'Estimate': '${:,.0f}', 'Lower': '${:,.0f}', 'Upper': '${:,.0f}', 'Std Error': '${:,.0f}'}
+                ),
+                use_container_width=True
+            )
+        pending = not intervals_job.finished_or_failed
+        intervals_shown = jobs.last_finished('dashboard_intervals')
+    else:
+        pending = False
+    
+    if tracer.enabled:
+        render_timings(st.sidebar, tracer,
+                       {'dashboard_intervals': intervals_shown.tracer} if intervals_shown is not None else None)
+    
+    # Poll until the background intervals are ready
+    if pending:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
 
 # Entry point for testing the module directly
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+"""
+Navigation Threshold Index
+Precomputes Smart Attribution channel totals at every navigation-threshold
+breakpoint, so moving the threshold slider is a binary search plus a row
+lookup instead of a full attribution rerun.
+
+Only the Stories touches that fall under the cutoff change with the threshold.
+Each such touch is a breakpoint: crossing it moves its journey from one
+filtered state to the next, which changes the channel totals by a fixed delta.
+Sorting the breakpoints and taking a cumulative sum of those deltas gives the
+totals for every threshold at once.
+
+Thresholds are limited to the slider range (THRESHOLD_RANGE, lookups outside
+it are clipped): touches below it are filtered at every threshold and folded
+into the base row, touches above it are never filtered and get no state at
+all, and equal breakpoints share one row. The index therefore has at most one
+row per distinct time-to-conversion inside the range (301 for whole-second
+timestamps), whatever the number of Stories touches.
+
+Totals are stored as U-Shape basis vectors (see attribution_engine.BASIS), so
+the index is built once per dataset and serves every weight combination too.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from attribution_engine import channel_basis, combine_basis, position_basis
+
+# Navigation-threshold slider range of both dashboards, in seconds
+THRESHOLD_RANGE = (0, 300)
+
+
+class ThresholdIndex:
+    """
+    Channel totals as a step function of the navigation threshold.
+
+    Attributes:
+        breakpoints: sorted distinct thresholds inside threshold_range at which the totals change
+        totals: (len(breakpoints) + 1, 4, n_channels) basis array, row k = basis
+                once the first k breakpoints are filtered (row 0: at threshold_range[0])
+        counts: (len(breakpoints) + 1, n_channels) number of credited touches
+                per channel (a channel with count 0 is absent from the result)
+        channels: list of channel names, channels[code] -> name
+        inclusive: True if a touch is filtered when time <= threshold
+                   (app.py), False if only when time < threshold (marketing_dashboard.py)
+        threshold_range: (low, high) supported thresholds; lookups are clipped to it
+    """
+
+    def __init__(self, breakpoints, totals, counts, channels, inclusive=True, threshold_range=THRESHOLD_RANGE):
+        self.breakpoints = breakpoints
+        self.totals = totals
+        self.counts = counts
+        self.channels = list(channels)
+        self.inclusive = inclusive
+        self.threshold_range = threshold_range
+
+    def _row(self, threshold):
+        side = 'right' if self.inclusive else 'left'
+        return np.searchsorted(self.breakpoints, np.clip(threshold, *self.threshold_range), side=side)
+
+    def lookup(self, threshold, first_weight, last_weight, middle_weight):
+        """Returns (totals, present) arrays indexed by channel code for one threshold and weight set."""
+        row = self._row(threshold)
+        return combine_basis(self.totals[row], first_weight, last_weight, middle_weight), self.counts[row] > 0
+
+    def lookup_dict(self, threshold, first_weight, last_weight, middle_weight):
+        """Returns {channel: revenue} for one threshold, like marketing_dashboard.calculate_attribution."""
+        totals, present = self.lookup(threshold, first_weight, last_weight, middle_weight)
+        return {self.channels[c]: float(totals[c]) for c in np.flatnonzero(present)}
+
+    def sweep(self, first_weight, last_weight, middle_weight, thresholds=None):
+        """
+        Full threshold -> attribution curve for plotting.
+        Returns a DataFrame indexed by Threshold with one column per channel.
+        Defaults to every breakpoint (plus the start of the range), i.e. the exact step curve.
+        """
+        if thresholds is None:
+            thresholds = np.concatenate([[self.threshold_range[0]], self.breakpoints])
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+
+        basis = np.moveaxis(self.totals[self._row(thresholds)], 1, 0)
+        curve = pd.DataFrame(combine_basis(basis, first_weight, last_weight, middle_weight), columns=self.channels)
+        curve.index = pd.Index(thresholds, name='Threshold')
+
+        # Registered channels that never receive credit are left out
+        seen = (self.counts > 0).any(axis=0)
+        return curve.loc[:, seen]
+
+
+def _build_index(base_totals, base_counts, breakpoints, delta_totals, delta_counts, channels, inclusive,
+                 threshold_range):
+    low, high = threshold_range
+    # Below the range: filtered at every supported threshold, part of the base row
+    below = breakpoints < low
+    base_totals = base_totals + delta_totals[below].sum(axis=0)
+    base_counts = base_counts + delta_counts[below].sum(axis=0)
+
+    # Above it: never filtered. Equal breakpoints are summed into one row
+    inside = np.flatnonzero(~below & (breakpoints <= high))
+    inside = inside[np.argsort(breakpoints[inside], kind='mergesort')]
+    sorted_breakpoints = breakpoints[inside]
+    new_row = np.ones(len(inside), dtype=bool)
+    new_row[1:] = sorted_breakpoints[1:] != sorted_breakpoints[:-1]
+    first = np.flatnonzero(new_row)
+    if len(inside):
+        row_totals = np.add.reduceat(delta_totals[inside], first)
+        row_counts = np.add.reduceat(delta_counts[inside], first)
+    else:
+        row_totals, row_counts = delta_totals[:0], delta_counts[:0]
+
+    totals = np.concatenate([base_totals[None], row_totals]).cumsum(axis=0)
+    counts = np.concatenate([base_counts[None], row_counts]).cumsum(axis=0)
+    return ThresholdIndex(sorted_breakpoints[first], totals, counts, channels, inclusive, threshold_range)
+
+
+def _state_credit(state_ids, n_states, channels, values, n_ch, two_touch_weights=None):
+    """
+    Dense (n_states, 4, n_ch) basis and (n_states, n_ch) touch-count matrices
+    for touches grouped by state. `values` is the revenue of every state.
+    Only journeys with a breakpoint at or below the top of the threshold range
+    get states, so the size follows the touches the slider can filter.
+    """
+    touch_basis = position_basis(state_ids, n_states, two_touch_weights) * values[state_ids]
+    keys = state_ids.astype(np.int64) * n_ch + channels
+    credit = np.stack([np.bincount(keys, weights=b, minlength=n_states * n_ch) for b in touch_basis])
+    count = np.bincount(keys, minlength=n_states * n_ch)
+    return np.moveaxis(credit.reshape(4, n_states, n_ch), 0, 1), count.reshape(n_states, n_ch)
+
+
+def _kept_touches(touches, keep):
+    """ConversionTouches view without the touches `keep` drops (journeys and conversions unchanged)."""
+    kept = copy.copy(touches)
+    for name in ('touch_journey', 'touch_channel', 'touch_time', 'time_to_conversion'):
+        setattr(kept, name, getattr(touches, name)[keep])
+    kept.touch_columns = {name: column[keep] for name, column in touches.touch_columns.items()}
+    return kept
+
+
+def build_smart_index(touches, channel='Stories', threshold_range=THRESHOLD_RANGE, keep=None):
+    """
+    Threshold index for app.apply_smart_attribution over a ConversionTouches view.
+
+    Every Stories touch up to the top of threshold_range is a breakpoint at its
+    time-to-conversion. A journey with s such touches has s + 1 states (its k
+    closest Stories touches removed); only those journeys are expanded, once
+    per state.
+
+    `keep` (a touch mask, e.g. the keep mask of touch_filters rules other than
+    the navigation filter) drops touches at every threshold, so the index
+    matches apply_smart_attribution with those rules added.
+    """
+    if keep is not None:
+        touches = _kept_touches(touches, keep)
+    n_ch = touches.n_channels
+    n_journeys = touches.n_journeys
+    values = touches.conversion_value.astype(np.float64)
+
+    lengths = np.bincount(touches.touch_journey, minlength=n_journeys)
+    starts = np.cumsum(lengths) - lengths
+
+    # Stories touches sorted by (journey, time_to_conversion); rank 1 = closest to conversion
+    story_rows = np.flatnonzero(touches.touch_channel == touches.channel_code(channel))
+    story_journey = touches.touch_journey[story_rows]
+    story_ttc = touches.time_to_conversion[story_rows]
+    order = np.lexsort((story_ttc, story_journey))
+    # Touches beyond the range are never filtered; they come last within their journey
+    order = order[story_ttc[order] <= threshold_range[1]]
+    story_rows, story_journey, story_ttc = story_rows[order], story_journey[order], story_ttc[order]
+
+    new_journey = np.ones(len(story_rows), dtype=bool)
+    new_journey[1:] = story_journey[1:] != story_journey[:-1]
+    group_start = np.maximum.accumulate(np.where(new_journey, np.arange(len(story_rows)), 0))
+    story_rank = np.arange(len(story_rows)) - group_start + 1
+
+    removal_rank = np.full(len(touches.touch_journey), np.iinfo(np.int64).max)
+    removal_rank[story_rows] = story_rank
+
+    # States: one unfiltered state per affected journey, then one per Stories touch
+    affected = story_journey[new_journey]
+    state_journey = np.concatenate([affected, story_journey])
+    state_k = np.concatenate([np.zeros(len(affected), dtype=np.int64), story_rank])
+    n_states = len(state_journey)
+
+    # Expand every state into its journey's touches, dropping the removed Stories
+    rep = lengths[state_journey]
+    rep_start = np.cumsum(rep) - rep
+    exp_state = np.repeat(np.arange(n_states), rep)
+    exp_touch = np.repeat(starts[state_journey], rep) + (np.arange(rep.sum()) - np.repeat(rep_start, rep))
+    keep = removal_rank[exp_touch] > state_k[exp_state]
+    exp_state, exp_touch = exp_state[keep], exp_touch[keep]
+
+    credit, count = _state_credit(exp_state, n_states, touches.touch_channel[exp_touch], values[state_journey], n_ch)
+
+    # Fully filtered state -> conversion channel takes the whole value
+    empty = np.flatnonzero(np.bincount(exp_state, minlength=n_states) == 0)
+    fallback = touches.conversion_channel[state_journey[empty]]
+    credit[empty, 0, fallback] += values[state_journey[empty]]
+    count[empty, fallback] += 1
+
+    # Delta of each Stories touch = its state minus the previous state of the same journey
+    base_state = np.empty(n_journeys, dtype=np.int64)
+    base_state[affected] = np.arange(len(affected))
+    story_state = len(affected) + np.arange(len(story_rows))
+    prev_state = np.where(story_rank == 1, base_state[story_journey], story_state - 1)
+
+    # Base: nothing filtered
+    base_credit, base_count = channel_basis(touches.touch_journey, n_journeys, touches.touch_channel, values, n_ch)
+    no_touch = lengths == 0
+    base_credit[0] += np.bincount(touches.conversion_channel[no_touch], weights=values[no_touch], minlength=n_ch)
+    base_count += np.bincount(touches.conversion_channel[no_touch], minlength=n_ch)
+
+    return _build_index(
+        base_credit, base_count,
+        story_ttc,
+        credit[story_state] - credit[prev_state],
+        count[story_state] - count[prev_state],
+        touches.channels,
+        inclusive=True,
+        threshold_range=threshold_range
+    )
+
+
+def build_last_touch_index(batch, seconds, channel='Stories', threshold_range=THRESHOLD_RANGE):
+    """
+    Threshold index for marketing_dashboard.calculate_attribution('Smart Model').
+
+    There a journey whose last touch is Stories loses that touch when
+    seconds < threshold (empty journeys are skipped), so each such journey is
+    a single breakpoint at its time-to-convert.
+
+    Args:
+        batch: JourneyBatch of Journey_List with Loan_Amount as revenue
+        seconds: Time_To_Convert_Seconds per journey
+    """
+    n_ch = batch.n_channels
+    two_touch = (0.5, 0.5)
+    seg = batch.segment_ids()
+    lengths = batch.lengths
+
+    base_credit, base_count = channel_basis(seg, batch.n_journeys, batch.codes, batch.revenue, n_ch, two_touch)
+
+    code = batch.channels.get(channel)
+    seconds = np.asarray(seconds, dtype=np.float64)
+    has = lengths > 0
+    # seconds >= the top of the range: never below a supported threshold
+    candidates = np.flatnonzero(has & (batch.codes[np.maximum(batch.offsets[1:] - 1, 0)] == code)
+                                & (seconds < threshold_range[1]))
+
+    # Two states per candidate journey: full, and without its last touch
+    is_candidate = np.zeros(batch.n_journeys, dtype=bool)
+    is_candidate[candidates] = True
+    state_of = np.cumsum(is_candidate) - 1
+    in_candidate = is_candidate[seg]
+    full_credit, full_count = _state_credit(
+        state_of[seg[in_candidate]], len(candidates), batch.codes[in_candidate], batch.revenue[candidates], n_ch, two_touch
+    )
+    cut = in_candidate & (batch.positions() < lengths[seg] - 1)
+    cut_credit, cut_count = _state_credit(
+        state_of[seg[cut]], len(candidates), batch.codes[cut], batch.revenue[candidates], n_ch, two_touch
+    )
+
+    return _build_index(
+        base_credit, base_count,
+        seconds[candidates],
+        cut_credit - full_credit,
+        cut_count - full_count,
+        batch.channels,
+        inclusive=False,
+        threshold_range=threshold_range
+    )
@@ -0,0 +1,193 @@
+"""
+Conversion Path Trie
+Counted prefix trie over encoded journeys (channel codes + offsets), built in
+one vectorized pass, level by level. Every node is a path prefix and stores
+how many journeys pass through it / end at it and their revenue, so
+
+- top-k most common conversion paths,
+- counts and revenue for "all paths starting with X -> Y",
+- next-step drill-downs
+
+are answered from small node arrays instead of re-joining path strings.
+"""
+
+import numpy as np
+import pandas as pd
+
+PATH_SEPARATOR = ' → '
+EMPTY_PATH = 'Direct'
+
+
+class PathTrie:
+    """
+    Node arrays (node 0 is the root / empty path):
+        parent, code, depth
+        count, revenue: journeys whose path starts with this prefix
+        end_count, end_revenue: journeys whose path is exactly this prefix
+        first: index of the first journey ending here (stable tie-break)
+        pre, size: preorder rank and subtree size, so a subtree is the
+                   contiguous range pre[v] .. pre[v] + size[v] - 1
+    """
+
+    def __init__(self, batch):
+        """
+        Builds the trie from a JourneyBatch; batch.revenue is the value of
+        each journey (use 1s to only count).
+        """
+        self.channels = batch.channels
+        n_ch = max(batch.n_channels, 1)
+        lengths = batch.lengths
+        revenue = batch.revenue.astype(np.float64)
+        n_journeys = batch.n_journeys
+
+        parent = [np.array([-1])]
+        code = [np.array([-1])]
+        depth = [np.array([0])]
+        n_nodes = 1
+
+        # Node of every journey at the current depth (all start at the root)
+        node_of = np.zeros(n_journeys, dtype=np.int64)
+        end_node = np.zeros(n_journeys, dtype=np.int64)
+        active = np.flatnonzero(lengths > 0)
+
+        d = 0
+        while len(active):
+            step_code = batch.codes[batch.offsets[:-1][active] + d].astype(np.int64)
+            keys, inverse = np.unique(node_of[active] * n_ch + step_code, return_inverse=True)
+            inverse = inverse.ravel()
+            parent.append(keys // n_ch)
+            code.append(keys % n_ch)
+            depth.append(np.full(len(keys), d + 1))
+            node_of[active] = n_nodes + inverse
+            n_nodes += len(keys)
+
+            d += 1
+            ended = lengths[active] == d
+            end_node[active[ended]] = node_of[active[ended]]
+            active = active[~ended]
+
+        self.parent = np.concatenate(parent)
+        self.code = np.concatenate(code)
+        self.depth = np.concatenate(depth)
+
+        self.end_count = np.bincount(end_node, minlength=n_nodes)
+        self.end_revenue = np.bincount(end_node, weights=revenue, minlength=n_nodes)
+        self.first = np.full(n_nodes, n_journeys, dtype=np.int64)
+        np.minimum.at(self.first, end_node, np.arange(n_journeys))
+
+        # Roll terminal counts up to every prefix, deepest level first
+        self.count = self.end_count.copy()
+        self.revenue = self.end_revenue.copy()
+        self.size = np.ones(n_nodes, dtype=np.int64)
+        for level in range(self.depth.max(), 0, -1):
+            nodes = np.flatnonzero(self.depth == level)
+            np.add.at(self.count, self.parent[nodes], self.count[nodes])
+            np.add.at(self.revenue, self.parent[nodes], self.revenue[nodes])
+            np.add.at(self.size, self.parent[nodes], self.size[nodes])
+
+        # Preorder numbering, top-down; siblings are already sorted by code
+        self.pre = np.zeros(n_nodes, dtype=np.int64)
+        for level in range(1, self.depth.max() + 1):
+            nodes = np.flatnonzero(self.depth == level)
+            sizes = self.size[nodes]
+            before = np.cumsum(sizes) - sizes
+            new_parent = np.ones(len(nodes), dtype=bool)
+            new_parent[1:] = self.parent[nodes][1:] != self.parent[nodes][:-1]
+            group_start = np.maximum.accumulate(np.where(new_parent, before, 0))
+            self.pre[nodes] = self.pre[self.parent[nodes]] + 1 + before - group_start
+        self.by_pre = np.argsort(self.pre)
+
+        # (parent, code) -> node lookup for prefix walks
+        self._n_ch = n_ch
+        self._keys = self.parent[1:] * n_ch + self.code[1:]
+        self._key_order = np.argsort(self._keys)
+
+    @property
+    def n_nodes(self):
+        return len(self.parent)
+
+    def child(self, node, channel):
+        """Child of `node` for a channel name, or -1 if no journey takes that step."""
+        code = self.channels.get(channel)
+        if code < 0:
+            return -1
+        key = node * self._n_ch + code
+        i = np.searchsorted(self._keys, key, sorter=self._key_order)
+        if i < len(self._keys) and self._keys[self._key_order[i]] == key:
+            return int(self._key_order[i]) + 1
+        return -1
+
+    def find(self, prefix):
+        """Node of a path prefix (list of channel names), or -1."""
+        node = 0
+        for channel in prefix:
+            node = self.child(node, channel)
+            if node < 0:
+                return -1
+        return node
+
+    def path(self, node):
+        """Channel names from the root to `node`."""
+        names = []
+        while node > 0:
+            names.append(self.channels[self.code[node]])
+            node = self.parent[node]
+        return names[::-1]
+
+    def path_string(self, node):
+        names = self.path(node)
+        return PATH_SEPARATOR.join(names) if names else EMPTY_PATH
+
+    def prefix_count(self, prefix):
+        """Number of journeys whose path starts with `prefix` (e.g. ['Digital Ads', 'Stories'])."""
+        node = self.find(prefix)
+        return int(self.count[node]) if node >= 0 else 0
+
+    def prefix_revenue(self, prefix):
+        """Total revenue of journeys whose path starts with `prefix`."""
+        node = self.find(prefix)
+        return float(self.revenue[node]) if node >= 0 else 0.0
+
+    def top_paths(self, k=5, prefix=()):
+        """
+        k most common complete paths (optionally only those starting with
+        `prefix`), as a DataFrame [Conversion Path, Count, Revenue].
+        Uses O(n) selection, then sorts only the k winners; ties keep
+        first-occurrence order.
+        """
+        node = self.find(prefix)
+        if node < 0:
+            return pd.DataFrame({'Conversion Path': [], 'Count': [], 'Revenue': []})
+
+        subtree = self.by_pre[self.pre[node]:self.pre[node] + self.size[node]]
+        candidates = subtree[self.end_count[subtree] > 0]
+        if len(candidates) > k:
+            counts = self.end_count[candidates]
+            threshold = -np.partition(-counts, k - 1)[k - 1]
+            candidates = candidates[counts >= threshold]
+        order = np.lexsort((self.first[candidates], -self.end_count[candidates]))[:k]
+        winners = candidates[order]
+
+        return pd.DataFrame({
+            'Conversion Path': [self.path_string(v) for v in winners],
+            'Count': self.end_count[winners],
+            'Revenue': self.end_revenue[winners]
+        })
+
+    def next_steps(self, prefix=()):
+        """
+        Drill-down: every channel that follows `prefix`, with the number and
+        revenue of journeys taking that step, as a DataFrame [Channel, Count, Revenue].
+        """
+        node = self.find(prefix)
+        if node < 0:
+            return pd.DataFrame({'Channel': [], 'Count': [], 'Revenue': []})
+
+        children = self.by_pre[self.pre[node] + 1:self.pre[node] + self.size[node]]
+        children = children[self.parent[children] == node]
+        frame = pd.DataFrame({
+            'Channel': self.channels.decode(self.code[children]),
+            'Count': self.count[children],
+            'Revenue': self.revenue[children]
+        })
+        return frame.sort_values('Count', ascending=False, kind='mergesort').reset_index(drop=True)
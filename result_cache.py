@@ -0,0 +1,246 @@
+"""
+Persistent Result Cache
+Cross-session, cross-process cache of attribution results on local disk.
+
+Results are keyed by (dataset content fingerprint, model, parameters) and
+stored pickled in one SQLite file, which every dashboard process can share
+safely (SQLite locking, WAL journal). The file is bounded in size: the least
+recently used entries are evicted first. Hit / miss counters are kept in the
+same file, so they cover every session using it.
+
+Reads never write: a hit is a plain SELECT, and the LRU access times and the
+hit / miss counters are buffered per process and written in one transaction
+at most every FLUSH_SECONDS (and before every store, so eviction sees them).
+Keys include CACHE_VERSION; bump it whenever a model's results change, so
+results pickled by older model code are no longer served.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from attribution_engine import JourneyBatch
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Bump when cached model results change (e.g. a model fix); part of every key
+CACHE_VERSION = 3
+# Buffered access times / counters are written at most this often (and on put)
+FLUSH_SECONDS = 5.0
+DEFAULT_PATH = os.path.join(
+    os.environ.get('ATTRIBUTION_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'attribution-calculator')),
+    'results.sqlite'
+)
+
+_MISSING = object()
+
+
+def dataset_fingerprint(data):
+    """
+    Content hash of a dataset: an interaction log / journey DataFrame, a
+    JourneyBatch or a NumPy array. Equal content gives the same fingerprint
+    in every process.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(data, pd.DataFrame):
+        h.update(json.dumps([list(map(str, data.columns)), list(map(str, data.dtypes))]).encode())
+        h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, JourneyBatch):
+        h.update(json.dumps(data.channels.names).encode())
+        for array in (data.codes, data.offsets, data.revenue):
+            h.update(np.ascontiguousarray(array).tobytes())
+        for name in sorted(data.columns):
+            h.update(name.encode())
+            h.update(pd.util.hash_array(np.asarray(data.columns[name])).tobytes())
+    else:
+        array = np.ascontiguousarray(data)
+        h.update(str(array.dtype).encode())
+        h.update(array.tobytes())
+    return h.hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"cache parameter of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    """
+    Size-bounded LRU result cache in an SQLite file.
+
+    Args:
+        path: cache file (default ~/.cache/attribution-calculator/results.sqlite,
+              or $ATTRIBUTION_CACHE_DIR/results.sqlite)
+        max_bytes: total size of stored results before LRU eviction
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Counters of this process only; stats() also reports the shared totals
+        self.process_hits = 0
+        self.process_misses = 0
+        # Not yet written: {key: last access time} and counter increments
+        self._lock = threading.Lock()
+        self._pending_access = {}
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_access REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)')
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def key(fingerprint, model, params=None, version=CACHE_VERSION):
+        """Cache key of (cache version, dataset fingerprint, model name, parameter dict)."""
+        payload = json.dumps([version, fingerprint, model, params or {}], sort_keys=True, default=_jsonable)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def get(self, key, default=None):
+        """Cached value of a key (refreshing its LRU position), or default."""
+        value = self._get(key)
+        return default if value is _MISSING else value
+
+    def _get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if row is None:
+                self.process_misses += 1
+                self._pending_misses += 1
+            else:
+                self.process_hits += 1
+                self._pending_hits += 1
+                self._pending_access[key] = time.time()
+            due = time.monotonic() - self._last_flush >= FLUSH_SECONDS
+        if due:
+            self.flush()
+        return _MISSING if row is None else pickle.loads(row[0])
+
+    def _take_pending(self):
+        with self._lock:
+            pending = (self._pending_access, self._pending_hits, self._pending_misses)
+            self._pending_access, self._pending_hits, self._pending_misses = {}, 0, 0
+            self._last_flush = time.monotonic()
+        return pending
+
+    @staticmethod
+    def _write_pending(conn, pending):
+        access, hits, misses = pending
+        if access:
+            conn.executemany('UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?',
+                             [(when, key) for key, when in access.items()])
+        if hits:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'hits'", (hits,))
+        if misses:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'misses'", (misses,))
+
+    def flush(self):
+        """Writes the buffered access times and counter increments in one transaction."""
+        pending = self._take_pending()
+        if not any(pending):
+            return
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._write_pending(conn, pending)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def put(self, key, value):
+        """Stores a value, then evicts least recently used entries beyond max_bytes."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        pending = self._take_pending()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Buffered access times first, so eviction sees the real LRU order
+            self._write_pending(conn, pending)
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                         (key, sqlite3.Binary(blob), len(blob), time.time()))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute('SELECT key, size FROM results WHERE key != ? ORDER BY last_access',
+                                    (key,)).fetchall()
+                evict = []
+                for old_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    total -= size
+                conn.executemany('DELETE FROM results WHERE key = ?', evict)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def get_or_compute(self, fingerprint, model, params, compute):
+        """Cached result of compute() for (fingerprint, model, params), computing and storing it on a miss."""
+        key = self.key(fingerprint, model, params)
+        value = self._get(key)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        """
+        Hit / miss counters (shared, including this process's unwritten ones,
+        and this process alone), number of entries and bytes used.
+        """
+        with self._lock:
+            pending_hits, pending_misses = self._pending_hits, self._pending_misses
+        conn = self._connect()
+        try:
+            counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        finally:
+            conn.close()
+        return {
+            'hits': counters.get('hits', 0) + pending_hits,
+            'misses': counters.get('misses', 0) + pending_misses,
+            'process_hits': self.process_hits,
+            'process_misses': self.process_misses,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+    def clear(self):
+        """Drops every cached result and resets the counters."""
+        self._take_pending()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM results')
+            conn.execute("UPDATE counters SET value = 0")
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
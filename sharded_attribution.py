@@ -0,0 +1,322 @@
+"""
+Sharded Parallel Attribution
+Runs an attribution model over hash partitions of the data on a process pool.
+
+Journeys are independent per user, so rows are hash-partitioned by User_ID /
+client into a fixed number of shards, laid out contiguously in shared memory
+once, and every worker only reads its shard's slice - no DataFrame is pickled.
+Each shard returns mergeable partial state (per-channel sums, path counts),
+merged in shard order: the result depends on n_shards, never on the number
+of workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from attribution_engine import (ConversionTouches, JourneyBatch, as_journey_batch, last_touch_credit,
+                                last_touch_navigation_credit, smart_attribution_totals, u_shape_credit,
+                                weighted_score_credit)
+from channels import CHANNELS
+from path_trie import EMPTY_PATH, PATH_SEPARATOR, PathTrie
+
+DEFAULT_SHARDS = 64
+
+TOUCH_COLUMNS = ('User_ID', 'Channel', 'Interaction_Time', 'Converted', 'Conversion_Value')
+
+
+# ---- Shared memory ----
+
+def _attach_block(name):
+    # The creating process owns and unlinks the block; an attaching process
+    # must not track it, or a tracker of its own would unlink the block (and
+    # warn about a leak) when that process exits. Python 3.13+ skips tracking
+    # explicitly; before that, attaching registers the block, so it is
+    # unregistered again right away
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays copied into shared memory blocks. `spec` is the small
+    picklable description a worker passes to `attach` to map the same memory.
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.dtype.str, array.shape)
+
+    @staticmethod
+    def attach(spec):
+        """Maps the arrays of a spec; returns (arrays, blocks), close the blocks when done."""
+        arrays, blocks = {}, []
+        for name, (block_name, dtype, shape) in spec.items():
+            block = _attach_block(block_name)
+            arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+            blocks.append(block)
+        return arrays, blocks
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            # Pool workers share this process's tracker, so a worker's
+            # unregister (see _attach_block) also dropped the owner's entry;
+            # registering again (a no-op if still tracked) keeps unlink's
+            # unregister balanced
+            resource_tracker.register(block._name, 'shared_memory')
+            block.unlink()
+        self.blocks = []
+
+
+# ---- Partitioning ----
+
+def shard_of(keys, n_shards):
+    """Shard number of every key; a stable 64-bit hash, identical in every process."""
+    return (pd.util.hash_array(np.asarray(keys)) % np.uint64(n_shards)).astype(np.int64)
+
+
+def _shard_layout(shard, n_shards):
+    """Stable permutation grouping rows by shard, and the shard boundaries in it."""
+    order = np.argsort(shard, kind='stable')
+    bounds = np.searchsorted(shard[order], np.arange(n_shards + 1))
+    return order, bounds
+
+
+def _partition_journeys(batch, key, n_shards):
+    keys = batch.columns[key] if key is not None else np.arange(batch.n_journeys)
+    order, bounds = _shard_layout(shard_of(keys, n_shards), n_shards)
+
+    lengths = batch.lengths[order]
+    offsets = np.zeros(batch.n_journeys + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    arrays = {
+        'codes': batch.codes[np.repeat(batch.offsets[:-1][order], lengths) + within],
+        'offsets': offsets,
+        'revenue': batch.revenue[order],
+        'journey_index': order,
+    }
+    # Numeric per-journey columns travel along (e.g. Time_To_Convert_Seconds)
+    for name, values in batch.columns.items():
+        values = np.asarray(values)
+        if values.dtype.kind in 'biufmM':
+            arrays['column:' + name] = values[order]
+    return arrays, bounds
+
+
+def _partition_touches(df, registry, n_shards):
+    # Users are integer-coded in sorted order so each shard's ConversionTouches
+    # orders its journeys exactly like the unsharded one
+    user_codes, _ = pd.factorize(df['User_ID'], sort=True)
+    order, bounds = _shard_layout(shard_of(df['User_ID'].to_numpy(), n_shards), n_shards)
+    arrays = {
+        'user': user_codes[order],
+        'channel': registry.encode(df['Channel']).astype(np.int32)[order],
+        'time': df['Interaction_Time'].to_numpy(dtype='datetime64[ns]')[order],
+        'converted': (df['Converted'] == True).to_numpy()[order],
+        'value': df['Conversion_Value'].to_numpy()[order],
+    }
+    return arrays, bounds
+
+
+# ---- Per-shard models ----
+
+def _journey_shard(arrays, lo, hi, channels):
+    start = arrays['offsets'][lo]
+    columns = {name[len('column:'):]: values[lo:hi] for name, values in arrays.items() if name.startswith('column:')}
+    return JourneyBatch(arrays['codes'][start:arrays['offsets'][hi]], arrays['offsets'][lo:hi + 1] - start,
+                        arrays['revenue'][lo:hi], channels, columns)
+
+
+def _touch_shard(arrays, lo, hi, channels):
+    return pd.DataFrame({
+        'User_ID': arrays['user'][lo:hi],
+        'Channel': pd.Categorical.from_codes(arrays['channel'][lo:hi], categories=channels.names),
+        'Interaction_Time': arrays['time'][lo:hi],
+        'Converted': arrays['converted'][lo:hi],
+        'Conversion_Value': arrays['value'][lo:hi],
+    })
+
+
+def _u_shape(batch, u_shape_weights=(0.4, 0.4, 0.2)):
+    return u_shape_credit(batch.deduplicate(), *u_shape_weights)
+
+
+def _weighted_score(batch, channel_scores):
+    return weighted_score_credit(batch.deduplicate(), channel_scores)
+
+
+def _navigation_u_shape(batch, navigation_threshold=60, u_shape_weights=(0.4, 0.4, 0.2),
+                        seconds_col='Time_To_Convert_Seconds'):
+    return last_touch_navigation_credit(batch, batch.columns[seconds_col], navigation_threshold, *u_shape_weights)
+
+
+def _smart(df, channels, navigation_threshold_seconds=60, first_weight=0.4, last_weight=0.4, middle_weight=0.2):
+    touches = ConversionTouches(df, channels)
+    return smart_attribution_totals(touches, navigation_threshold_seconds, first_weight, last_weight, middle_weight)
+
+
+def _path_counts(batch, journey_index):
+    """Partial path counts: {path codes: (count, revenue, first journey index)}."""
+    trie = PathTrie(batch)
+    ends = np.flatnonzero(trie.end_count)
+    # Shards keep the original journey order, so the first local journey is also the first globally
+    counts = {}
+    for v in ends:
+        path = []
+        node = v
+        while node > 0:
+            path.append(int(trie.code[node]))
+            node = trie.parent[node]
+        counts[tuple(path[::-1])] = (int(trie.end_count[v]), float(trie.end_revenue[v]),
+                                     int(journey_index[trie.first[v]]))
+    return counts
+
+
+# Journey models take a JourneyBatch shard (process_all_journeys / calculate_attribution rules)
+JOURNEY_MODELS = {
+    'u_shape': _u_shape,
+    'weighted_score': _weighted_score,
+    'last_touch': last_touch_credit,
+    'navigation_u_shape': _navigation_u_shape,
+}
+
+# Touch models take an interaction log shard (app.apply_smart_attribution rules)
+TOUCH_MODELS = {
+    'smart': _smart,
+}
+
+
+def _shard_result(kind, arrays, lo, hi, model, params, channels):
+    if kind == 'touches':
+        totals, present = TOUCH_MODELS[model](_touch_shard(arrays, lo, hi, channels), channels, **params)
+    else:
+        batch = _journey_shard(arrays, lo, hi, channels)
+        if model == 'paths':
+            return _path_counts(batch, arrays['journey_index'][lo:hi])
+        fn = JOURNEY_MODELS[model] if isinstance(model, str) else model
+        totals, present = fn(batch, **params)
+    # Copy out of the shared buffers before they are unmapped
+    return np.array(totals, dtype=np.float64), np.array(present, dtype=bool)
+
+
+def _run_shard(task):
+    """Worker: attaches the shared arrays and runs the model on one shard."""
+    kind, spec, lo, hi, model, params, channels = task
+    arrays, blocks = SharedArrays.attach(spec)
+    try:
+        return _shard_result(kind, arrays, lo, hi, model, params, channels)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+def _map_shards(kind, arrays, bounds, model, params, channels, workers):
+    """Runs the model on every non-empty shard; partial results come back in shard order."""
+    shards = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(shards))
+
+    if workers <= 1:
+        return [_shard_result(kind, arrays, lo, hi, model, params, channels) for lo, hi in shards]
+
+    shared = SharedArrays(arrays)
+    try:
+        tasks = [(kind, shared.spec, lo, hi, model, params, channels) for lo, hi in shards]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_run_shard, tasks))
+    finally:
+        shared.close()
+
+
+def _is_touch_log(data):
+    return isinstance(data, pd.DataFrame) and all(col in data.columns for col in TOUCH_COLUMNS)
+
+
+def sharded_credit(data, model, params=None, key=None, workers=None, n_shards=DEFAULT_SHARDS, registry=CHANNELS):
+    """
+    Per-channel credit of a model, computed shard by shard in parallel.
+
+    Args:
+        data: interaction log DataFrame (app.py columns) for 'smart', or
+              journeys (JourneyBatch / Journey_List DataFrame) for the journey models
+        model: 'smart', 'u_shape', 'weighted_score', 'last_touch',
+               'navigation_u_shape', or any picklable function
+               f(batch, **params) -> (totals, present) over a JourneyBatch
+        params: keyword arguments of the model, e.g.
+                {'navigation_threshold_seconds': 60, 'first_weight': 0.4, ...} for 'smart',
+                {'channel_scores': {...}} for 'weighted_score'
+        key: journey column to partition by (e.g. 'Client'); journeys are
+             partitioned by index if None. Interaction logs always use User_ID.
+        workers: processes (None = CPU count, 1 = run in this process)
+        n_shards: number of hash partitions; fixes the summation order, so
+                  results are identical for any number of workers
+
+    Returns {channel: credit} for the channels that received credit.
+    """
+    params = dict(params or {})
+    if _is_touch_log(data):
+        kind = 'touches'
+        arrays, bounds = _partition_touches(data, registry, n_shards)
+        channels = registry
+    else:
+        kind = 'journeys'
+        batch = as_journey_batch(data)
+        arrays, bounds = _partition_journeys(batch, key, n_shards)
+        channels = batch.channels
+
+    partials = _map_shards(kind, arrays, bounds, model, params, channels, workers)
+
+    n_ch = max([len(totals) for totals, _ in partials], default=0)
+    totals = np.zeros(n_ch)
+    present = np.zeros(n_ch, dtype=bool)
+    for part_totals, part_present in partials:
+        totals[:len(part_totals)] += part_totals
+        present[:len(part_present)] |= part_present
+    return {channels[c]: float(totals[c]) for c in np.flatnonzero(present)}
+
+
+def sharded_path_counts(data, key=None, workers=None, n_shards=DEFAULT_SHARDS):
+    """
+    Count and revenue of every distinct path, computed shard by shard in
+    parallel; DataFrame [Conversion Path, Count, Revenue] ordered by count,
+    ties in first-occurrence order (like PathTrie.top_paths).
+    """
+    batch = as_journey_batch(data)
+    arrays, bounds = _partition_journeys(batch, key, n_shards)
+    partials = _map_shards('journeys', arrays, bounds, 'paths', {}, batch.channels, workers)
+
+    merged = {}
+    for part in partials:
+        for path, (count, revenue, first) in part.items():
+            entry = merged.get(path)
+            if entry is None:
+                merged[path] = [count, revenue, first]
+            else:
+                entry[0] += count
+                entry[1] += revenue
+                entry[2] = min(entry[2], first)
+
+    rows = sorted(merged.items(), key=lambda item: (-item[1][0], item[1][2]))
+    return pd.DataFrame({
+        'Conversion Path': [PATH_SEPARATOR.join(batch.channels.decode(path)) if path else EMPTY_PATH
+                            for path, _ in rows],
+        'Count': [entry[0] for _, entry in rows],
+        'Revenue': [entry[1] for _, entry in rows],
+    })
@@ -0,0 +1,254 @@
+"""
+Streaming Attribution
+Event-at-a-time version of app.apply_smart_attribution for continuously
+arriving touch / conversion events.
+
+Every user with an open journey keeps only two compact arrays (channel codes
+and touch times); when the user's conversion arrives the Navigation Filter
+and U-Shape (and optionally Weighted Score) credit are applied and added to
+running per-channel totals, and the journey is dropped. Idle users are
+evicted by TTL (stream time) and/or LRU (max_users), so memory stays flat.
+
+On the same time-ordered input the totals equal the batch results, as long
+as users are not evicted before converting and convert on their last event
+(the batch model also counts touches that come after the conversion, a
+stream cannot).
+"""
+
+import csv
+import time
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from channels import CHANNELS
+
+NS_PER_SECOND = 10**9
+
+
+class _OpenJourney:
+    __slots__ = ('codes', 'times', 'last_seen', 'converted')
+
+    def __init__(self):
+        self.codes = array('H')
+        self.times = array('q')
+        self.last_seen = 0
+        self.converted = False
+
+
+class StreamingAttribution:
+    """
+    Running Smart Attribution over an event stream.
+
+    Args:
+        navigation_threshold_seconds: Stories touches at most this many seconds
+                                      before conversion are dropped
+        first_weight, last_weight, middle_weight: U-Shape weights
+        channel_scores: optional {channel: score}; if given, Weighted Score
+                        credit of the filtered journey is kept as well
+        ttl_seconds: evict users idle for longer than this (stream time)
+        max_users: keep at most this many users, least recently active evicted first
+    """
+
+    def __init__(self, navigation_threshold_seconds=60, first_weight=0.4, last_weight=0.4, middle_weight=0.2,
+                 channel_scores=None, ttl_seconds=None, max_users=None, channel='Stories', registry=CHANNELS):
+        self.navigation_threshold_ns = navigation_threshold_seconds * NS_PER_SECOND
+        self.weights = (first_weight, last_weight, middle_weight)
+        self.channel_scores = channel_scores
+        self.ttl_ns = None if ttl_seconds is None else int(ttl_seconds * NS_PER_SECOND)
+        self.max_users = max_users
+        self.channels = registry
+        self.filter_code = registry.code(channel)
+
+        self.users = OrderedDict()
+        self.clock = None
+        self.u_shape_totals = np.zeros(len(registry))
+        self.weighted_totals = np.zeros(len(registry))
+        self.u_shape_present = np.zeros(len(registry), dtype=bool)
+        self.weighted_present = np.zeros(len(registry), dtype=bool)
+        self.stats = {'events': 0, 'conversions': 0, 'evicted_ttl': 0, 'evicted_lru': 0}
+
+    def _grow(self):
+        n = len(self.channels)
+        if n > len(self.u_shape_totals):
+            pad = n - len(self.u_shape_totals)
+            self.u_shape_totals = np.concatenate([self.u_shape_totals, np.zeros(pad)])
+            self.weighted_totals = np.concatenate([self.weighted_totals, np.zeros(pad)])
+            self.u_shape_present = np.concatenate([self.u_shape_present, np.zeros(pad, dtype=bool)])
+            self.weighted_present = np.concatenate([self.weighted_present, np.zeros(pad, dtype=bool)])
+
+    def process(self, user_id, channel, when, converted=False, value=0):
+        """
+        Feeds one event. `when` is anything pd.Timestamp accepts (or int ns).
+        Returns the per-channel U-Shape credit of the journey if this event
+        was a conversion, else None.
+        """
+        t = when if isinstance(when, (int, np.integer)) else pd.Timestamp(when).value
+        self.stats['events'] += 1
+        self.clock = t if self.clock is None else max(self.clock, t)
+
+        journey = self.users.get(user_id)
+        if journey is None:
+            journey = self.users[user_id] = _OpenJourney()
+        else:
+            self.users.move_to_end(user_id)
+        journey.last_seen = t
+
+        credit = None
+        if not journey.converted:
+            code = self.channels.code(channel)
+            if code >= len(self.u_shape_totals):
+                self._grow()
+            if converted:
+                credit = self._convert(journey, code, t, value)
+                # Keep a closed marker: later events of the user are ignored, like in the batch model
+                journey.converted = True
+                journey.codes = array('H')
+                journey.times = array('q')
+            else:
+                journey.codes.append(code)
+                journey.times.append(t)
+
+        self._evict()
+        return credit
+
+    def _convert(self, journey, conversion_code, t, value):
+        self.stats['conversions'] += 1
+        f_w, l_w, m_w = self.weights
+
+        # Navigation Filter
+        path = [code for code, touch_time in zip(journey.codes, journey.times)
+                if not (code == self.filter_code and t - touch_time <= self.navigation_threshold_ns)]
+
+        # U-Shape, or the conversion channel if nothing is left
+        n = len(path)
+        if n == 0:
+            shares = [(conversion_code, 1.0)]
+        elif n == 1:
+            shares = [(path[0], 1.0)]
+        elif n == 2:
+            shares = [(path[0], f_w), (path[1], l_w)]
+        else:
+            middle = m_w / (n - 2)
+            shares = [(path[0], f_w)] + [(code, middle) for code in path[1:-1]] + [(path[-1], l_w)]
+
+        credit = {}
+        for code, share in shares:
+            self.u_shape_totals[code] += value * share
+            self.u_shape_present[code] = True
+            name = self.channels[code]
+            credit[name] = credit.get(name, 0.0) + value * share
+
+        if self.channel_scores is not None:
+            unique = list(dict.fromkeys(path))
+            scores = [self.channel_scores.get(self.channels[code], 0) for code in unique]
+            total_score = sum(scores)
+            if total_score > 0:
+                for code, score in zip(unique, scores):
+                    self.weighted_totals[code] += value * score / total_score
+                    self.weighted_present[code] = True
+        return credit
+
+    def _evict(self):
+        if self.ttl_ns is not None:
+            horizon = self.clock - self.ttl_ns
+            while self.users:
+                user_id, journey = next(iter(self.users.items()))
+                if journey.last_seen >= horizon:
+                    break
+                self.users.popitem(last=False)
+                self.stats['evicted_ttl'] += 1
+        if self.max_users is not None:
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+                self.stats['evicted_lru'] += 1
+
+    def consume(self, events):
+        """Feeds an iterable of (user_id, channel, time, converted, value) tuples."""
+        for event in events:
+            self.process(*event)
+        return self
+
+    @property
+    def n_open(self):
+        """Users currently holding state (open journeys and closed markers)."""
+        return len(self.users)
+
+    def totals(self):
+        """Running Smart Attribution (U-Shape) credit as {channel: revenue}."""
+        return {self.channels[c]: float(self.u_shape_totals[c]) for c in np.flatnonzero(self.u_shape_present)}
+
+    def weighted_score_totals(self):
+        """Running Weighted Score credit as {channel: revenue} (needs channel_scores)."""
+        return {self.channels[c]: float(self.weighted_totals[c]) for c in np.flatnonzero(self.weighted_present)}
+
+    def to_frame(self, value_name='Revenue'):
+        """Running totals as DataFrame[Channel, value_name] sorted by channel, like app.apply_smart_attribution."""
+        totals = self.totals()
+        frame = pd.DataFrame({'Channel': list(totals), value_name: list(totals.values())})
+        return frame.sort_values('Channel').reset_index(drop=True)
+
+
+# ---- Event sources ----
+
+def iter_frame_events(df):
+    """(user_id, channel, time ns, converted, value) tuples of an interaction log in time order."""
+    ordered = df.sort_values('Interaction_Time', kind='mergesort')
+    return zip(
+        ordered['User_ID'].tolist(),
+        ordered['Channel'].astype(str).tolist(),
+        ordered['Interaction_Time'].to_numpy(dtype='datetime64[ns]').astype(np.int64).tolist(),
+        (ordered['Converted'] == True).tolist(),
+        ordered['Conversion_Value'].tolist(),
+    )
+
+
+def iter_synthetic_events(num_users=500, seed=None, chunk_users=synthetic_data.DEFAULT_CHUNK_USERS,
+                          reference_time=None):
+    """
+    Local event source: the synthetic interaction log (synthetic_data.py) as
+    an event stream, chunk by chunk. Users never span chunks, so every user's
+    events arrive in time order.
+    """
+    for chunk in synthetic_data.iter_synthetic_chunks(num_users, seed=seed, chunk_users=chunk_users,
+                                                      reference_time=reference_time):
+        yield from iter_frame_events(chunk)
+
+
+def tail_events(path, follow=False, poll_interval=1.0):
+    """
+    File tailer: yields events from a CSV interaction log (app.py columns,
+    e.g. written by synthetic_data.write_synthetic_data) as rows are appended.
+    With follow=False it stops at the end of the file.
+    """
+    with open(path, newline='') as f:
+        header = f.readline()
+        while not header:
+            if not follow:
+                return
+            time.sleep(poll_interval)
+            header = f.readline()
+        columns = next(csv.reader([header]))
+        idx = [columns.index(c) for c in ('User_ID', 'Channel', 'Interaction_Time', 'Converted', 'Conversion_Value')]
+
+        pending = ''
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    return
+                time.sleep(poll_interval)
+                continue
+            pending += line
+            if not pending.endswith('\n') and follow:
+                continue  # partially written row, wait for the rest
+            row = next(csv.reader([pending]))
+            pending = ''
+            if not row:
+                continue
+            user, channel, when, converted, value = (row[i] for i in idx)
+            yield (int(user) if user.lstrip('-').isdigit() else user, channel, pd.Timestamp(when).value,
+                   converted == 'True', float(value) if value else 0)
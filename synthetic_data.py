@@ -0,0 +1,224 @@
+"""
+Synthetic Data Generator
+Vectorized, seedable generator for the interaction log used by app.py
+(User_ID, Channel, Interaction_Time, Converted, Conversion_Value).
+
+Every scenario is a fixed template of touches; a whole block of users is
+drawn per template step with NumPy instead of one dict per event, so load-test
+datasets with millions of users can be generated in chunks or written straight
+to disk without holding them in memory.
+"""
+
+import numpy as np
+import pandas as pd
+
+CHANNELS = ["Digital Ads", "Stories", "Push", "SMS", "Telemarketing"]
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Scenario templates: one tuple per touch, in journey order
+# (channel, offset_lo_seconds, offset_hi_seconds, converted)
+# The touch happens at base_time + uniform integer offset in [lo, hi].
+# Offsets given in hours in the original scenarios are drawn in whole hours.
+SCENARIOS = {
+    # Scenario A: Digital -> Push -> Telemarketing -> Conversion (Strong TM influence)
+    'A': [
+        ("Digital Ads", 0, 0, False),
+        ("Push", 2 * HOUR, 24 * HOUR, False),
+        ("Telemarketing", 25 * HOUR, 48 * HOUR, False),
+        ("Telemarketing", 48 * HOUR, 50 * HOUR, True),
+    ],
+    # Scenario B: Digital -> Stories (navigation) -> Conversion
+    # Stories clicked 20-60 seconds before conversion (the "navigation problem")
+    'B': [
+        ("Digital Ads", 0, 0, False),
+        ("Stories", 5 * HOUR, 24 * HOUR, False),
+        ("Stories", 24 * HOUR - 60, 24 * HOUR - 20, False),
+        ("Stories", 24 * HOUR, 24 * HOUR, True),
+    ],
+    # Scenario C: SMS -> Push -> Conversion
+    'C': [
+        ("SMS", 0, 0, False),
+        ("Push", 12 * HOUR, 48 * HOUR, False),
+        ("Push", 48 * HOUR, 72 * HOUR, True),
+    ],
+    # Scenario D: Digital -> Stories (legitimate) -> Telemarketing -> Conversion
+    'D': [
+        ("Digital Ads", 0, 0, False),
+        ("Stories", 6 * HOUR, 24 * HOUR, False),
+        ("Telemarketing", 25 * HOUR, 48 * HOUR, False),
+        ("Telemarketing", 48 * HOUR, 72 * HOUR, True),
+    ],
+}
+
+# Share of users per scenario; 'noise' = non-converting users with 1-4 random touches.
+# Matches the original 100 / 75 / 38 / 37 / 250 split of 500 users.
+DEFAULT_SCENARIO_MIX = {'A': 0.2, 'B': 0.15, 'C': 0.076, 'D': 0.074, 'noise': 0.5}
+
+DEFAULT_CHUNK_USERS = 1_000_000
+# Users drawn per random stream: the output depends on the seed, not on chunk_users
+BLOCK_USERS = 100_000
+
+
+def allocate_users(num_users, scenario_mix):
+    """
+    Splits num_users across scenarios proportionally (largest remainder),
+    so the counts always add up to num_users.
+    """
+    names = list(scenario_mix)
+    shares = np.array([scenario_mix[name] for name in names], dtype=np.float64)
+    if (shares < 0).any() or shares.sum() <= 0:
+        raise ValueError("scenario_mix must have non-negative shares with a positive sum")
+
+    exact = num_users * shares / shares.sum()
+    counts = np.floor(exact + 1e-9).astype(np.int64)
+    remainder = num_users - counts.sum()
+    if remainder > 0:
+        counts[np.argsort(-(exact - counts), kind='mergesort')[:remainder]] += 1
+    return dict(zip(names, counts.tolist()))
+
+
+def _scenario_events(rng, template, user_ids, base_times):
+    """Columns for every user of one scenario, one template step at a time."""
+    n = len(user_ids)
+    steps = len(template)
+
+    channel = np.empty((n, steps), dtype=np.int8)
+    seconds = np.empty((n, steps), dtype=np.int64)
+    converted = np.zeros((n, steps), dtype=bool)
+    value = np.zeros((n, steps), dtype=np.int64)
+
+    for step, (name, lo, hi, is_conversion) in enumerate(template):
+        channel[:, step] = CHANNELS.index(name)
+        if lo == hi:
+            offset = np.full(n, lo, dtype=np.int64)
+        elif lo % HOUR == 0 and hi % HOUR == 0:
+            offset = rng.integers(lo // HOUR, hi // HOUR + 1, size=n) * HOUR
+        else:
+            offset = rng.integers(lo, hi + 1, size=n)
+        seconds[:, step] = base_times + offset
+        if is_conversion:
+            converted[:, step] = True
+            value[:, step] = rng.integers(5000, 50001, size=n)
+
+    return (np.repeat(user_ids, steps), channel.ravel(), seconds.ravel(),
+            converted.ravel(), value.ravel())
+
+
+def _noise_events(rng, user_ids, base_times):
+    """Non-converting users: 1-4 random touches, i * (1-24h) after base time."""
+    num_touches = rng.integers(1, 5, size=len(user_ids))
+    total = num_touches.sum()
+
+    users = np.repeat(user_ids, num_touches)
+    starts = np.cumsum(num_touches) - num_touches
+    touch_idx = np.arange(total) - np.repeat(starts, num_touches)
+    seconds = np.repeat(base_times, num_touches) + touch_idx * rng.integers(1, 25, size=total) * HOUR
+    channel = rng.integers(0, len(CHANNELS), size=total).astype(np.int8)
+
+    return users, channel, seconds, np.zeros(total, dtype=bool), np.zeros(total, dtype=np.int64)
+
+
+def _generate_block(rng, first_user_id, num_users, scenario_mix, reference_time):
+    """One contiguous block of users, laid out scenario by scenario like the original generator."""
+    now = reference_time.value // 10**9
+    parts = []
+    user_id = first_user_id
+
+    for name, count in allocate_users(num_users, scenario_mix).items():
+        if count == 0:
+            continue
+        user_ids = np.arange(user_id, user_id + count, dtype=np.int64)
+        base_times = now - rng.integers(1, 31, size=count) * DAY
+        if name == 'noise':
+            parts.append(_noise_events(rng, user_ids, base_times))
+        else:
+            parts.append(_scenario_events(rng, SCENARIOS[name], user_ids, base_times))
+        user_id += count
+
+    users, channel, seconds, converted, value = (np.concatenate(col) for col in zip(*parts))
+    order = np.lexsort((seconds, users))
+
+    df = pd.DataFrame({
+        "User_ID": users[order],
+        "Channel": pd.Categorical.from_codes(channel[order], categories=CHANNELS),
+        "Interaction_Time": seconds[order].astype("datetime64[s]").astype("datetime64[ns]"),
+        "Converted": converted[order],
+        "Conversion_Value": value[order]
+    })
+    return df
+
+
+def iter_synthetic_chunks(num_users=500, scenario_mix=None, seed=None, chunk_users=DEFAULT_CHUNK_USERS,
+                          reference_time=None):
+    """
+    Yields the interaction log as DataFrames of at most chunk_users users each,
+    sorted by (User_ID, Interaction_Time) within and across chunks.
+
+    Users are generated in blocks of BLOCK_USERS, each from its own child of
+    the seed, and the blocks are cut into chunks, so the concatenated output
+    is the same for any chunk_users.
+
+    Args:
+        num_users: total number of users to generate
+        scenario_mix: {scenario: share}, scenarios are 'A'-'D' and 'noise'
+                      (defaults to DEFAULT_SCENARIO_MIX)
+        seed: int seed; with a fixed seed and reference_time the output is
+              identical on every run, whatever chunk_users
+        chunk_users: users per chunk (peak memory follows max(chunk_users, BLOCK_USERS))
+        reference_time: "now" for the 1-30 days back base times (defaults to the current time)
+    """
+    if num_users < 1:
+        raise ValueError("num_users must be at least 1")
+    scenario_mix = scenario_mix or DEFAULT_SCENARIO_MIX
+    reference_time = pd.Timestamp.now() if reference_time is None else pd.Timestamp(reference_time)
+
+    n_blocks = -(-num_users // BLOCK_USERS)
+    block_seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+
+    pending = []
+    next_chunk = 1 + chunk_users  # first user of the next chunk
+    first_user_id = 1
+    for block_seed in block_seeds:
+        count = min(BLOCK_USERS, num_users - first_user_id + 1)
+        block = _generate_block(np.random.default_rng(block_seed), first_user_id, count, scenario_mix,
+                                reference_time)
+        first_user_id += count
+
+        users = block['User_ID'].to_numpy()
+        start = 0
+        while next_chunk <= first_user_id:
+            stop = int(np.searchsorted(users, next_chunk))
+            pending.append(block.iloc[start:stop])
+            yield pd.concat(pending, ignore_index=True)
+            pending, start = [], stop
+            next_chunk += chunk_users
+        if start < len(block):
+            pending.append(block.iloc[start:])
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def generate_synthetic_data(num_users=500, scenario_mix=None, seed=None, chunk_users=DEFAULT_CHUNK_USERS,
+                            reference_time=None):
+    """
+    Generates the whole interaction log in memory.
+    See iter_synthetic_chunks for the arguments.
+    """
+    chunks = list(iter_synthetic_chunks(num_users, scenario_mix, seed, chunk_users, reference_time))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def write_synthetic_data(path, num_users, scenario_mix=None, seed=None, chunk_users=DEFAULT_CHUNK_USERS,
+                         reference_time=None):
+    """
+    Streams the interaction log to a CSV file chunk by chunk, so datasets far
+    larger than RAM can be produced. Compression is inferred from the file
+    name (e.g. 'events.csv.gz'). Returns the number of rows written.
+    """
+    rows = 0
+    for i, chunk in enumerate(iter_synthetic_chunks(num_users, scenario_mix, seed, chunk_users, reference_time)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        rows += len(chunk)
+    return rows
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference_models import make_interaction_log, make_journey_frame  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def interaction_log():
+    return make_interaction_log()
+
+
+@pytest.fixture(scope='session')
+def journey_frame():
+    return make_journey_frame()
@@ -0,0 +1,453 @@
+"""
+Reference implementations for the tests: the original per-user loops from
+app.py, marketing_dashboard.py and attribution_logic.py before
+vectorization (same logic, shortened comments), brute-force versions of the
+newer models, and small seeded datasets to run both on.
+"""
+
+from itertools import combinations
+from math import factorial
+
+import numpy as np
+import pandas as pd
+
+CHANNEL_NAMES = ['Digital Ads', 'Stories', 'Push', 'SMS', 'Telemarketing', 'Direct', 'Banner']
+
+
+# ---- Datasets ----
+
+def make_interaction_log(n_users=300, seed=0):
+    """
+    app.py interaction log with distinct event times: converted and
+    non-converted users, touches-only conversions, Stories touches seconds
+    before conversion, touches after the conversion and repeat conversions.
+    """
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2024-01-01')
+    rows = []
+    used = set()
+
+    def unique_time(seconds):
+        seconds = int(seconds)
+        while seconds in used:
+            seconds += 1
+        used.add(seconds)
+        return base + pd.Timedelta(seconds=seconds)
+
+    for user in range(n_users):
+        conversion = int(rng.integers(5 * 86400, 30 * 86400))
+        converted = rng.random() < 0.7
+        for _ in range(int(rng.integers(0, 7))):
+            if rng.random() < 0.3:
+                before = rng.integers(0, 300)            # navigation range
+            elif rng.random() < 0.1:
+                before = -rng.integers(1, 86400)         # after the conversion
+            else:
+                before = rng.integers(300, 4 * 86400)
+            rows.append((f'U{user:04d}', CHANNEL_NAMES[rng.integers(0, 5)], unique_time(conversion - before), False, 0))
+        if converted:
+            channel = CHANNEL_NAMES[rng.integers(0, 5)]
+            rows.append((f'U{user:04d}', channel, unique_time(conversion), True, int(rng.integers(1000, 50001))))
+            if rng.random() < 0.05:
+                rows.append((f'U{user:04d}', channel, unique_time(conversion + 3600), True, 1000))
+    df = pd.DataFrame(rows, columns=['User_ID', 'Channel', 'Interaction_Time', 'Converted', 'Conversion_Value'])
+    # Shuffled, as the engine has to sort
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def make_journey_frame(n_journeys=400, seed=0):
+    """marketing_dashboard.py journeys: Journey_List, Loan_Amount, Time_To_Convert_Seconds."""
+    rng = np.random.default_rng(seed)
+    journeys = [[CHANNEL_NAMES[c] for c in rng.integers(0, 6, size=rng.integers(1, 7))] for _ in range(n_journeys)]
+    return pd.DataFrame({
+        'Journey_List': journeys,
+        'Loan_Amount': rng.integers(1000, 50001, size=n_journeys),
+        'Time_To_Convert_Seconds': rng.integers(5, 300, size=n_journeys),
+    })
+
+
+# ---- Baseline app.py ----
+
+def apply_last_touch_attribution(df):
+    """
+    Simple Last Touch Attribution: Credit goes to the last channel before conversion.
+    No filtering applied.
+    """
+    # Get only converted users
+    converted_users = df[df['Converted'] == True]['User_ID'].unique()
+
+    attribution_results = []
+
+    for user in converted_users:
+        user_journey = df[df['User_ID'] == user].sort_values('Interaction_Time')
+
+        # Get the conversion event
+        conversion_event = user_journey[user_journey['Converted'] == True].iloc[0]
+        conversion_value = conversion_event['Conversion_Value']
+
+        # Get the last touch channel (the channel of the conversion event itself)
+        last_channel = conversion_event['Channel']
+
+        attribution_results.append({
+            'User_ID': user,
+            'Channel': last_channel,
+            'Attributed_Value': conversion_value
+        })
+
+    attribution_df = pd.DataFrame(attribution_results)
+    channel_attribution = attribution_df.groupby('Channel')['Attributed_Value'].sum().reset_index()
+    channel_attribution.columns = ['Channel', 'Revenue']
+
+    return channel_attribution
+
+
+def apply_smart_attribution(df, navigation_threshold_seconds, first_weight, last_weight, middle_weight):
+    """
+    Smart Attribution: U-Shaped model with Navigation Filter
+
+    1. First, filter out "Stories" clicks that happened within navigation_threshold_seconds of conversion
+    2. Then apply U-Shaped attribution to remaining touchpoints
+    """
+    converted_users = df[df['Converted'] == True]['User_ID'].unique()
+
+    attribution_results = []
+
+    for user in converted_users:
+        user_journey = df[df['User_ID'] == user].sort_values('Interaction_Time')
+
+        # Get the conversion event
+        conversion_event = user_journey[user_journey['Converted'] == True].iloc[0]
+        conversion_value = conversion_event['Conversion_Value']
+        conversion_time = conversion_event['Interaction_Time']
+
+        # Get all touchpoints before conversion (excluding the conversion event itself)
+        touchpoints = user_journey[user_journey['Converted'] == False].copy()
+
+        if len(touchpoints) == 0:
+            # Edge case: only conversion event exists, credit it fully
+            attribution_results.append({
+                'User_ID': user,
+                'Channel': conversion_event['Channel'],
+                'Attributed_Value': conversion_value
+            })
+            continue
+
+        # NAVIGATION FILTER: Remove "Stories" clicks within threshold
+        touchpoints['Time_to_Conversion'] = (conversion_time - touchpoints['Interaction_Time']).dt.total_seconds()
+
+        # Filter out Stories that are too close to conversion (navigation clicks)
+        filtered_touchpoints = touchpoints[
+            ~((touchpoints['Channel'] == 'Stories') &
+              (touchpoints['Time_to_Conversion'] <= navigation_threshold_seconds))
+        ].copy()
+
+        if len(filtered_touchpoints) == 0:
+            # If all touchpoints were filtered, credit the conversion event channel
+            attribution_results.append({
+                'User_ID': user,
+                'Channel': conversion_event['Channel'],
+                'Attributed_Value': conversion_value
+            })
+            continue
+
+        # U-SHAPED ATTRIBUTION on filtered touchpoints
+        num_touchpoints = len(filtered_touchpoints)
+
+        # Calculate attribution for each touchpoint
+        for idx, (_, touchpoint) in enumerate(filtered_touchpoints.iterrows()):
+            if num_touchpoints == 1:
+                # Only one touchpoint: give it full credit
+                weight = 1.0
+            elif num_touchpoints == 2:
+                # Two touchpoints: split between first and last
+                weight = first_weight if idx == 0 else last_weight
+            else:
+                # Three or more touchpoints: U-shaped distribution
+                if idx == 0:
+                    # First touch
+                    weight = first_weight
+                elif idx == num_touchpoints - 1:
+                    # Last touch
+                    weight = last_weight
+                else:
+                    # Middle touches: distribute middle_weight equally
+                    num_middle = num_touchpoints - 2
+                    weight = middle_weight / num_middle
+
+            attributed_value = conversion_value * weight
+
+            attribution_results.append({
+                'User_ID': user,
+                'Channel': touchpoint['Channel'],
+                'Attributed_Value': attributed_value
+            })
+
+    attribution_df = pd.DataFrame(attribution_results)
+    channel_attribution = attribution_df.groupby('Channel')['Attributed_Value'].sum().reset_index()
+    channel_attribution.columns = ['Channel', 'Revenue']
+
+    return channel_attribution
+
+
+def get_top_conversion_paths(df, top_n=5):
+    """
+    Get the most common conversion paths.
+    """
+    converted_users = df[df['Converted'] == True]['User_ID'].unique()
+
+    paths = []
+    for user in converted_users:
+        user_journey = df[df['User_ID'] == user].sort_values('Interaction_Time')
+        # Exclude the final conversion event, just get the touchpoint sequence
+        touchpoints = user_journey[user_journey['Converted'] == False]['Channel'].tolist()
+        path_string = ' → '.join(touchpoints) if touchpoints else 'Direct'
+        paths.append(path_string)
+
+    path_df = pd.DataFrame({'Path': paths})
+    path_counts = path_df['Path'].value_counts().head(top_n).reset_index()
+    path_counts.columns = ['Conversion Path', 'Count']
+
+    return path_counts
+
+
+# ---- Baseline marketing_dashboard.py ----
+
+def calculate_attribution(df, model_type, navigation_threshold=60, u_shape_weights=(0.4, 0.4, 0.2)):
+    """
+    Calculates attributed sales volume based on the selected model.
+    """
+    # Initialize attributions
+    channel_revenue = {}
+
+    w_first, w_last, w_middle = u_shape_weights
+
+    for _, row in df.iterrows():
+        journey = row['Journey_List']
+        revenue = row['Loan_Amount']
+        time_seconds = row['Time_To_Convert_Seconds']
+
+        # --- PRE-PROCESSING (SMART MODEL ONLY) ---
+        if model_type == 'Smart Model':
+            # Check for "Navigation Click" bias
+            last_touch = journey[-1]
+            if last_touch == 'Stories' and time_seconds < navigation_threshold:
+                # Ignore the last touch (Stories)
+                # Slicing excluding the last element
+                journey = journey[:-1]
+
+            # If journey becomes empty (rare, but possible if length was 1), skip or attribute to Direct
+            if not journey:
+                continue
+
+        # --- ATTRIBUTION MODELS ---
+
+        if model_type == 'Legacy Last Touch':
+            # Simple Last Touch
+            winner = journey[-1]
+            channel_revenue[winner] = channel_revenue.get(winner, 0) + revenue
+
+        elif model_type == 'Smart Model':
+            # U-Shape (Position Based) on the *cleaned* journey
+            n = len(journey)
+
+            if n == 1:
+                # 100% to single touch
+                touch = journey[0]
+                channel_revenue[touch] = channel_revenue.get(touch, 0) + revenue
+            elif n == 2:
+                # Split 50/50
+                for touch in journey:
+                    channel_revenue[touch] = channel_revenue.get(touch, 0) + (revenue * 0.5)
+            else:
+                # 3+ touchpoints
+                # First
+                channel_revenue[journey[0]] = channel_revenue.get(journey[0], 0) + (revenue * w_first)
+                # Last
+                channel_revenue[journey[-1]] = channel_revenue.get(journey[-1], 0) + (revenue * w_last)
+                # Middle (split remaining w_middle among n-2 items)
+                middle_share = (revenue * w_middle) / (n - 2)
+                for touch in journey[1:-1]:
+                    channel_revenue[touch] = channel_revenue.get(touch, 0) + middle_share
+
+    return channel_revenue
+
+
+# ---- Baseline attribution_logic.py ----
+
+def deduplicate_consecutive(journey):
+    if not journey:
+        return []
+
+    deduplicated = [journey[0]]
+    for channel in journey[1:]:
+        if channel != deduplicated[-1]:
+            deduplicated.append(channel)
+
+    return deduplicated
+
+
+def calculate_u_shape(journey):
+    weights = {}
+    n = len(journey)
+
+    if n == 0:
+        return weights
+
+    if n == 1:
+        weights[journey[0]] = 1.0
+        return weights
+
+    if n == 2:
+        weights[journey[0]] = weights.get(journey[0], 0) + 0.5
+        weights[journey[-1]] = weights.get(journey[-1], 0) + 0.5
+        return weights
+
+    first = journey[0]
+    last = journey[-1]
+    middle_touches = journey[1:-1]
+
+    weights[first] = weights.get(first, 0) + 0.4
+    weights[last] = weights.get(last, 0) + 0.4
+
+    unique_middle = list(set(middle_touches))
+    if unique_middle:
+        middle_share = 0.2 / len(unique_middle)
+        for ch in unique_middle:
+            weights[ch] = weights.get(ch, 0) + middle_share
+
+    return weights
+
+
+def calculate_weighted_score(journey, channel_scores):
+    weights = {}
+    unique_channels = list(set(journey))
+
+    if not unique_channels:
+        return weights
+
+    total_score = sum(channel_scores.get(ch, 0) for ch in unique_channels)
+
+    if total_score > 0:
+        for ch in unique_channels:
+            score = channel_scores.get(ch, 0)
+            weights[ch] = score / total_score
+
+    return weights
+
+
+def process_all_journeys(df, channel_scores):
+    u_shape_results = {}
+    weighted_results = {}
+
+    for _, row in df.iterrows():
+        raw_journey = row['Journey_List']
+        revenue = row.get('Revenue', 1)
+
+        dedup_journey = deduplicate_consecutive(raw_journey)
+
+        if not dedup_journey:
+            continue
+
+        u_shape_weights = calculate_u_shape(dedup_journey)
+        for ch, weight in u_shape_weights.items():
+            u_shape_results[ch] = u_shape_results.get(ch, 0) + (revenue * weight)
+
+        weighted_scores = calculate_weighted_score(dedup_journey, channel_scores)
+        for ch, weight in weighted_scores.items():
+            weighted_results[ch] = weighted_results.get(ch, 0) + (revenue * weight)
+
+    return u_shape_results, weighted_results
+
+
+# ---- Brute-force references of the newer models ----
+
+def user_journeys(df):
+    """Per converted user: (conversion event row, touch rows in time order), first conversion only."""
+    out = []
+    for user in df[df['Converted'] == True]['User_ID'].unique():
+        events = df[df['User_ID'] == user].sort_values('Interaction_Time')
+        out.append((events[events['Converted'] == True].iloc[0], events[events['Converted'] == False]))
+    return out
+
+
+def time_decay_attribution(df, half_life_seconds):
+    """Time Decay per user: 2 ** (-t / half_life) over touches before the conversion, normalized."""
+    revenue = {}
+    for conversion, touches in user_journeys(df):
+        value = conversion['Conversion_Value']
+        ages = (conversion['Interaction_Time'] - touches['Interaction_Time']).dt.total_seconds()
+        before = touches[ages >= 0]
+        if len(before) == 0:
+            revenue[conversion['Channel']] = revenue.get(conversion['Channel'], 0) + value
+            continue
+        weights = 2.0 ** (-ages[ages >= 0] / half_life_seconds)
+        for channel, weight in zip(before['Channel'], weights / weights.sum()):
+            revenue[channel] = revenue.get(channel, 0) + value * weight
+    return revenue
+
+
+def markov_removal_effects(journeys, converted):
+    """
+    Removal effects by building the chain from Python lists and solving the
+    absorption probabilities again for every removed channel.
+    """
+    channels = sorted({ch for journey in journeys for ch in journey})
+    states = ['(start)'] + channels + ['(conversion)', '(null)']
+    index = {state: i for i, state in enumerate(states)}
+    counts = np.zeros((len(states), len(states)))
+    for journey, conv in zip(journeys, converted):
+        journey = deduplicate_consecutive(journey)
+        if not journey:
+            continue
+        path = ['(start)'] + journey + ['(conversion)' if conv else '(null)']
+        for a, b in zip(path[:-1], path[1:]):
+            counts[index[a], index[b]] += 1
+
+    def p_conversion(removed=None):
+        matrix = counts.copy()
+        if removed is not None:
+            # Every transition into the removed channel goes to (null)
+            matrix[:, index['(null)']] += matrix[:, index[removed]]
+            matrix[:, index[removed]] = 0
+            matrix[index[removed], :] = 0
+        out = matrix.sum(axis=1, keepdims=True)
+        p = np.divide(matrix, out, out=np.zeros_like(matrix), where=out > 0)
+        n = len(channels) + 1
+        absorb = np.linalg.solve(np.eye(n) - p[:n, :n], p[:n, index['(conversion)']])
+        return absorb[0]
+
+    base = p_conversion()
+    return {ch: 1 - p_conversion(ch) / base for ch in channels}
+
+
+def shapley_attribution(journeys, revenue):
+    """
+    Shapley credit by enumerating every coalition of every journey's channel
+    set; v(S) = journeys whose channel set is a subset of S.
+    """
+    sets = [frozenset(journey) for journey in journeys]
+
+    def value(coalition):
+        return sum(1 for s in sets if s and s <= coalition)
+
+    credit = {}
+    for channels, amount in zip(sets, revenue):
+        if not channels:
+            continue
+        t = len(channels)
+        phi = {}
+        for player in channels:
+            others = channels - {player}
+            phi[player] = sum(
+                factorial(k) * factorial(t - k - 1) / factorial(t)
+                * (value(frozenset(s) | {player}) - value(frozenset(s)))
+                for k in range(t) for s in combinations(others, k)
+            )
+        total = sum(phi.values())
+        for player, share in phi.items():
+            credit[player] = credit.get(player, 0) + amount * share / total
+    return credit
+
+
+def frame_to_dict(frame, value='Revenue'):
+    return dict(zip(frame['Channel'], frame[value]))
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from attribution_cli import detect_format, main
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / 'loans.xlsx'
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'CLI_CODE': ['001', '002', '003'],
+                      'DT_OPEN': pd.to_datetime(['2024-03-01 12:00', '2024-03-02 09:30', '2024-03-03 00:00'])}
+                     ).to_excel(writer, sheet_name='cash_loan', index=False)
+        pd.DataFrame({'CLIENT_CD': ['1', '1', '2'],
+                      'EVENT_TIME': pd.to_datetime(['2024-02-28 10:00', '2024-03-01 11:00', '2024-03-01 08:00'])}
+                     ).to_excel(writer, sheet_name='push', index=False)
+        pd.DataFrame({'CLIENT_CD': ['1', '2'], 'CREATED': pd.to_datetime(['2024-02-27 00:00', '2024-03-02 09:00'])}
+                     ).to_excel(writer, sheet_name='telemarket', index=False)
+    return str(path)
+
+
+def test_workbook_runs_with_default_models(workbook, tmp_path):
+    output = tmp_path / 'results.csv'
+    assert detect_format(workbook) == 'workbook'
+    assert main([workbook, '--workers', '1', '-o', str(output)]) == 0
+    results = pd.read_csv(output)
+    assert set(results['Model']) == {'last_touch', 'u_shape'}
+    last_touch = results[results['Model'] == 'last_touch'].set_index('Channel')['Revenue']
+    # Client 1 ends on Push, client 2 on Telemarketing, client 3 has no touches
+    assert last_touch['Push'] == 1 and last_touch['Telemarketing'] == 1
+
+
+def test_journeys_without_seconds_skip_the_default_smart(tmp_path, capsys):
+    source = tmp_path / 'journeys.csv'
+    pd.DataFrame({'Journey_List': ['Push → SMS', 'Stories'], 'Revenue': [100, 50]}).to_csv(source, index=False)
+    output = tmp_path / 'results.csv'
+    assert main([str(source), '-o', str(output)]) == 0
+    assert set(pd.read_csv(output)['Model']) == {'last_touch'}
+    assert "skipping the default model 'smart'" in capsys.readouterr().err
+    with pytest.raises(SystemExit, match='Time_To_Convert_Seconds'):
+        main([str(source), '--models', 'smart', '-o', str(output)])
@@ -0,0 +1,126 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from attribution_cube import AttributionCube, build_slice
+from attribution_engine import ConversionTouches
+from bootstrap import journey_credit
+from touch_filters import RuleEvaluator, TouchRule, app_navigation_rule
+
+SLICES = [('last_touch', {}), ('smart', {'navigation_threshold_seconds': 60}),
+          ('time_decay', {'half_life_seconds': 3600})]
+RULES = [app_navigation_rule(60), TouchRule('push_open', channel='Push', max_seconds=600),
+         TouchRule('sms_repeat', channel='SMS', repeat_within_seconds=86400)]
+RULE_PARAMS = {'navigation_threshold_seconds': 60, 'rules': [rule.to_dict() for rule in RULES]}
+
+
+@pytest.fixture(scope='module')
+def touches(interaction_log):
+    return ConversionTouches(interaction_log)
+
+
+def channel_totals(touches, model, params, journeys=None):
+    """(revenue, conversions) per channel; a journey's conversion is split like its revenue."""
+    journey, channel, credit = journey_credit(touches, model, **params)
+    if journeys is not None:
+        keep = np.isin(journey, journeys)
+        journey, channel, credit = journey[keep], channel[keep], credit[keep]
+    share = credit / touches.conversion_value[journey]
+    return (np.bincount(channel, weights=credit, minlength=touches.n_channels),
+            np.bincount(channel, weights=share, minlength=touches.n_channels))
+
+
+@pytest.mark.parametrize('model, params', SLICES)
+def test_full_range_is_the_model_total(touches, model, params):
+    for actual, expected in zip(build_slice(touches, model, params).range_totals(),
+                                channel_totals(touches, model, params)):
+        np.testing.assert_allclose(actual, expected)
+
+
+@pytest.mark.parametrize('model, params', SLICES)
+def test_date_range_matches_filtering_conversions(touches, model, params):
+    cube_slice = build_slice(touches, model, params)
+    start, end = pd.Timestamp('2024-01-10'), pd.Timestamp('2024-01-20')
+    day = touches.conversion_time.astype('datetime64[D]')
+    inside = np.flatnonzero((day >= np.datetime64(start.date())) & (day <= np.datetime64(end.date())))
+    for actual, expected in zip(cube_slice.range_totals(start, end), channel_totals(touches, model, params, inside)):
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_append_equals_building_from_all(interaction_log):
+    users = interaction_log['User_ID'].unique()
+    # Later users first, so the append also extends the day range backwards
+    old = interaction_log[interaction_log['User_ID'].isin(users[len(users) // 2:])]
+    new = interaction_log[interaction_log['User_ID'].isin(users[:len(users) // 2])]
+    cube, full = AttributionCube(), AttributionCube()
+    for model, params in SLICES:
+        cube.add_slice(model, params, old)
+        full.add_slice(model, params, interaction_log)
+    cube.append(new)
+
+    assert cube.days == full.days
+    for model, params in SLICES:
+        for start, end in [(None, None), ('2024-01-08', '2024-01-14'), ('2024-01-25', None)]:
+            for actual, expected in zip(cube.range_totals(model, params, start, end),
+                                        full.range_totals(model, params, start, end)):
+                np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_rule_slice_matches_the_filtered_model(touches):
+    keep = RuleEvaluator(touches).keep_mask(RULES)
+    assert not keep.all()
+    expected = channel_totals(touches, 'smart', {'keep': keep})
+    for cube_slice in (build_slice(touches, 'smart', RULE_PARAMS),
+                       build_slice(touches, 'smart', RULE_PARAMS, keep=keep)):
+        for actual, want in zip(cube_slice.range_totals(), expected):
+            np.testing.assert_allclose(actual, want)
+    unfiltered = build_slice(touches, 'smart', {'navigation_threshold_seconds': 60}).range_totals()[0]
+    assert not np.allclose(unfiltered, expected[0])
+
+
+def test_append_evaluates_the_rules_on_new_touches(interaction_log):
+    users = interaction_log['User_ID'].unique()
+    old = interaction_log[interaction_log['User_ID'].isin(users[:len(users) // 2])]
+    new = interaction_log[interaction_log['User_ID'].isin(users[len(users) // 2:])]
+    cube, full = AttributionCube(), AttributionCube()
+    cube.add_slice('smart', RULE_PARAMS, old)
+    full.add_slice('smart', RULE_PARAMS, interaction_log)
+    cube.append(new)
+    for actual, expected in zip(cube.range_totals('smart', RULE_PARAMS), full.range_totals('smart', RULE_PARAMS)):
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_periods_add_up_to_the_total(touches):
+    cube = AttributionCube(touches.channels)
+    cube.add_slice('smart', {'navigation_threshold_seconds': 60}, touches)
+    weekly = cube.period_frame('smart', {'navigation_threshold_seconds': 60}, 'W')
+    revenue, _ = cube.range_totals('smart', {'navigation_threshold_seconds': 60})
+    totals = weekly.groupby('Channel')['Revenue'].sum()
+    for channel, value in totals.items():
+        assert value == pytest.approx(revenue[touches.channels.code(channel)])
+
+
+def test_least_recently_used_slices_are_dropped(touches):
+    cube = AttributionCube(touches.channels, max_slices=2)
+    cube.add_slice('smart', {'navigation_threshold_seconds': 10}, touches)
+    cube.add_slice('smart', {'navigation_threshold_seconds': 20}, touches)
+    cube.get('smart', {'navigation_threshold_seconds': 10})
+    cube.add_slice('smart', {'navigation_threshold_seconds': 30}, touches)
+    assert cube.get('smart', {'navigation_threshold_seconds': 20}) is None
+    assert cube.get('smart', {'navigation_threshold_seconds': 10}) is not None
+    assert len(cube.slices) == 2
+
+
+def test_concurrent_builds_share_one_slice(touches):
+    cube = AttributionCube(touches.channels)
+    built = []
+    threads = [threading.Thread(target=lambda: built.append(cube.add_slice('time_decay', {}, touches)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cube.slices) == 1
+    assert all(cube_slice is built[0] for cube_slice in built)
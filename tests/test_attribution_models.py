@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import reference_models as ref
+from attribution_engine import ConversionTouches, JourneyBatch
+from attribution_logic import process_all_journeys
+from attribution_models import (apply_last_touch_attribution, apply_smart_attribution, apply_time_decay_attribution,
+                                calculate_attribution, get_top_conversion_paths)
+from sharded_attribution import sharded_credit
+
+SCORES = {'Digital Ads': 3, 'Stories': 1, 'Push': 2, 'SMS': 2, 'Telemarketing': 4}
+
+
+def assert_same_totals(actual, expected):
+    assert set(actual) == set(expected)
+    for channel, value in expected.items():
+        assert actual[channel] == pytest.approx(value, rel=1e-9, abs=1e-6), channel
+
+
+def test_last_touch_matches_baseline(interaction_log):
+    actual = apply_last_touch_attribution(interaction_log)
+    expected = ref.apply_last_touch_attribution(interaction_log)
+    assert actual['Channel'].tolist() == expected['Channel'].tolist()
+    np.testing.assert_allclose(actual['Revenue'], expected['Revenue'])
+
+
+@pytest.mark.parametrize('threshold, weights', [(0, (0.4, 0.4, 0.2)), (60, (0.4, 0.4, 0.2)), (300, (0.5, 0.3, 0.2))])
+def test_smart_matches_baseline(interaction_log, threshold, weights):
+    actual = apply_smart_attribution(interaction_log, threshold, *weights)
+    expected = ref.apply_smart_attribution(interaction_log, threshold, *weights)
+    assert actual['Channel'].tolist() == expected['Channel'].tolist()
+    np.testing.assert_allclose(actual['Revenue'], expected['Revenue'])
+
+
+def test_prebuilt_touches_give_the_same_result(interaction_log):
+    touches = ConversionTouches(interaction_log)
+    pd.testing.assert_frame_equal(apply_smart_attribution(interaction_log, 60, 0.4, 0.4, 0.2, touches=touches),
+                                  apply_smart_attribution(interaction_log, 60, 0.4, 0.4, 0.2))
+
+
+@pytest.mark.parametrize('half_life', [3600, 86400])
+def test_time_decay_matches_loop(interaction_log, half_life):
+    actual = ref.frame_to_dict(apply_time_decay_attribution(interaction_log, half_life))
+    assert_same_totals(actual, ref.time_decay_attribution(interaction_log, half_life))
+
+
+def test_top_paths_match_baseline(interaction_log):
+    actual = get_top_conversion_paths(interaction_log, top_n=50)
+    expected = ref.get_top_conversion_paths(interaction_log, top_n=50)
+    # Ties may be ordered differently: compare counts per path
+    all_paths = ref.get_top_conversion_paths(interaction_log, top_n=10_000)
+    counts = dict(zip(all_paths['Conversion Path'], all_paths['Count']))
+    assert actual['Count'].tolist() == expected['Count'].tolist()
+    assert all(counts[path] == count for path, count in zip(actual['Conversion Path'], actual['Count']))
+
+
+@pytest.mark.parametrize('model', ['Legacy Last Touch', 'Smart Model'])
+@pytest.mark.parametrize('threshold', [0, 60, 200])
+def test_dashboard_matches_baseline(journey_frame, model, threshold):
+    weights = (0.5, 0.3, 0.2)
+    assert_same_totals(calculate_attribution(journey_frame, model, threshold, weights),
+                       ref.calculate_attribution(journey_frame, model, threshold, weights))
+
+
+def test_dashboard_accepts_journey_batch(journey_frame):
+    batch = JourneyBatch.from_journeys(journey_frame['Journey_List'], journey_frame['Loan_Amount'].to_numpy(),
+                                       {'Time_To_Convert_Seconds': journey_frame['Time_To_Convert_Seconds'].to_numpy()})
+    assert_same_totals(calculate_attribution(batch, 'Smart Model'),
+                       ref.calculate_attribution(journey_frame, 'Smart Model'))
+
+
+def test_process_all_journeys_matches_baseline(journey_frame):
+    frame = journey_frame.rename(columns={'Loan_Amount': 'Revenue'})
+    u_shape, weighted = process_all_journeys(frame, SCORES)
+    expected_u_shape, expected_weighted = ref.process_all_journeys(frame, SCORES)
+    assert_same_totals(u_shape, expected_u_shape)
+    assert_same_totals(weighted, expected_weighted)
+
+
+def test_sharded_credit_matches_single_pass(interaction_log, journey_frame):
+    expected = ref.frame_to_dict(apply_smart_attribution(interaction_log, 60, 0.4, 0.4, 0.2))
+    assert_same_totals(sharded_credit(interaction_log, 'smart', {'navigation_threshold_seconds': 60}, workers=1,
+                                      n_shards=8), expected)
+    frame = journey_frame.rename(columns={'Loan_Amount': 'Revenue'})
+    assert_same_totals(sharded_credit(frame, 'u_shape', workers=1, n_shards=8), process_all_journeys(frame, SCORES)[0])
+
+
+def test_sharded_credit_is_the_same_on_a_process_pool(interaction_log, journey_frame):
+    frame = journey_frame.rename(columns={'Loan_Amount': 'Revenue'})
+    for data, model, params in [(interaction_log, 'smart', {'navigation_threshold_seconds': 60}),
+                                (frame, 'u_shape', None)]:
+        single = sharded_credit(data, model, params, workers=1, n_shards=8)
+        pooled = sharded_credit(data, model, params, workers=4, n_shards=8)
+        # Shards merge in shard order, so the sums match bit for bit
+        assert single == pooled
@@ -0,0 +1,131 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from background_jobs import CANCELLED, DONE, FAILED, JobRunner, render_job_status
+from instrumentation import TRACER
+
+
+@pytest.fixture
+def runner():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield JobRunner(executor, debounce_seconds=0.05)
+    executor.shutdown(wait=True)
+
+
+def double(token, x):
+    token.report(0.5, 'halfway')
+    return 2 * x
+
+
+def test_result_and_progress(runner):
+    job = runner.submit('slot', {'x': 2}, double, 2)
+    assert job.wait(5) == DONE
+    assert job.result == 4 and job.progress == 1.0
+    assert runner.display_result(job) == (4, True)
+
+
+def test_same_parameters_reuse_the_job_and_results_are_cached(runner):
+    first = runner.submit('slot', {'x': 1}, double, 1)
+    assert runner.submit('slot', {'x': 1}, double, 1) is first
+    first.wait(5)
+    runner.submit('slot', {'x': 2}, double, 2).wait(5)
+    calls = []
+    cached = runner.submit('slot', {'x': 1}, lambda token, x: calls.append(x), 1)
+    assert cached.done and cached.result == 2 and not calls
+
+
+def test_debounced_burst_only_runs_the_last_job(runner):
+    calls = []
+
+    def record(token, x):
+        calls.append(x)
+        return x
+
+    runner.submit('slot', {'x': 0}, record, 0).wait(5)
+    jobs = [runner.submit('slot', {'x': x}, record, x) for x in range(1, 6)]
+    assert jobs[-1].wait(5) == DONE
+    assert [job.status for job in jobs[:-1]] == [CANCELLED] * 4
+    assert all(job.future is None for job in jobs[:-1])
+    assert calls == [0, 5]
+
+
+def test_running_job_stops_at_its_next_checkpoint(runner):
+    started, release = threading.Event(), threading.Event()
+    reached = []
+
+    def slow(token):
+        started.set()
+        release.wait(5)
+        token.report(0.5)
+        reached.append('after checkpoint')
+
+    first = runner.submit('slot', {'x': 1}, slow)
+    started.wait(5)
+    second = runner.submit('slot', {'x': 2}, double, 2)
+    # The new job waits its turn; the old result stays on screen until then
+    assert runner.display_result(second) == (None, False)
+    release.set()
+    assert first.wait(5) == CANCELLED
+    assert second.wait(5) == DONE
+    assert not reached
+
+
+def test_previous_result_is_shown_until_fresh(runner):
+    runner.submit('slot', {'x': 1}, double, 1).wait(5)
+    gate = threading.Event()
+    job = runner.submit('slot', {'x': 3}, lambda token: gate.wait(5) and 6)
+    assert runner.display_result(job) == (2, False)
+    gate.set()
+    job.wait(5)
+    assert runner.display_result(job) == (6, True)
+
+
+def test_failures_keep_the_last_result(runner):
+    def fail(token):
+        raise RuntimeError('boom')
+
+    job = runner.submit('slot', {}, fail)
+    assert job.wait(5) == FAILED
+    assert runner.display_result(job) == (None, False)
+    assert isinstance(job.error, RuntimeError)
+
+    runner.submit('slot', {'x': 1}, lambda token: 'ok').wait(5)
+    job = runner.submit('slot', {'x': 2}, fail)
+    assert job.wait(5) == FAILED
+    assert runner.display_result(job) == ('ok', False)
+
+
+def test_failures_are_rendered(runner):
+    class Container:
+        def __init__(self):
+            self.calls = []
+
+        def error(self, text):
+            self.calls.append(('error', text))
+
+        def progress(self, value, text):
+            self.calls.append(('progress', text))
+
+    def fail(token):
+        raise RuntimeError('boom')
+
+    job = runner.submit('slot', {}, fail)
+    job.wait(5)
+    container = Container()
+    render_job_status(container, job, showing_previous=True)
+    assert len(container.calls) == 1
+    kind, text = container.calls[0]
+    assert kind == 'error' and 'boom' in text and 'previous result' in text
+
+
+def test_jobs_trace_into_their_own_tracer(runner):
+    def traced(token):
+        with TRACER.span('job.stage'):
+            return 1
+
+    runner.tracing = True
+    job = runner.submit('slot', {}, traced)
+    job.wait(5)
+    assert [span[0] for span in job.tracer.spans] == ['job.stage']
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import synthetic_data
+from attribution_engine import ConversionTouches
+from attribution_models import apply_last_touch_attribution, apply_smart_attribution, apply_time_decay_attribution
+from background_jobs import JobCancelled
+from bootstrap import bootstrap_credit, journey_credit
+
+MODELS = {'last_touch': {}, 'smart': {'navigation_threshold_seconds': 60},
+          'time_decay': {'half_life_seconds': 86400}}
+
+
+def naive_std_errors(touches, models, n_replicates, seed):
+    """Journey-level bootstrap: resample converted users, rerun the credit sums."""
+    rng = np.random.default_rng(seed)
+    n, n_ch = touches.n_journeys, touches.n_channels
+    credit = {}
+    for name, params in models.items():
+        journey, channel, value = journey_credit(touches, name, **params)
+        credit[name] = np.zeros((n, n_ch))
+        np.add.at(credit[name], (journey, channel), value)
+    replicates = {name: [] for name in models}
+    for _ in range(n_replicates):
+        weights = np.bincount(rng.integers(0, n, n), minlength=n)
+        for name in models:
+            replicates[name].append(weights @ credit[name])
+    return {name: np.std(replicates[name], axis=0, ddof=1) for name in models}
+
+
+def test_estimates_are_the_model_totals(interaction_log):
+    touches = ConversionTouches(interaction_log)
+    intervals = bootstrap_credit(touches, MODELS, n_replicates=50, seed=0)
+    expected = {
+        'last_touch': apply_last_touch_attribution(touches),
+        'smart': apply_smart_attribution(touches, 60, 0.4, 0.4, 0.2),
+        'time_decay': apply_time_decay_attribution(touches, 86400),
+    }
+    for name, frame in expected.items():
+        rows = intervals[intervals['Model'] == name]
+        estimates = dict(zip(rows['Channel'], rows['Estimate']))
+        assert set(estimates) == set(frame['Channel'])
+        for channel, revenue in zip(frame['Channel'], frame['Revenue']):
+            assert estimates[channel] == pytest.approx(revenue, rel=1e-9)
+        assert (rows['Lower'] <= rows['Upper']).all()
+
+
+def test_journey_credit_sums_to_each_journey_value(interaction_log):
+    touches = ConversionTouches(interaction_log)
+    # Smart gives a two-touch journey first + last weight, so it needs weights summing to 1 there
+    models = dict(MODELS, smart={'navigation_threshold_seconds': 60, 'first_weight': 0.5, 'last_weight': 0.5,
+                                 'middle_weight': 0.0})
+    for name, params in models.items():
+        journey, _, credit = journey_credit(touches, name, **params)
+        np.testing.assert_allclose(np.bincount(journey, weights=credit, minlength=touches.n_journeys),
+                                   touches.conversion_value)
+
+
+@pytest.mark.parametrize('num_users', [300, 4000])
+def test_std_errors_match_journey_resampling(num_users):
+    # 300 users: small path groups, resampled exactly; 4000: large groups, CLT value sums
+    log = synthetic_data.generate_synthetic_data(num_users=num_users, seed=7)
+    touches = ConversionTouches(log)
+    models = {'last_touch': {}, 'smart': {'navigation_threshold_seconds': 60}}
+    intervals = bootstrap_credit(touches, models, n_replicates=2000, seed=1)
+    expected = naive_std_errors(touches, models, 2000, seed=2)
+    for name in models:
+        rows = intervals[intervals['Model'] == name]
+        codes = touches.channels.encode(rows['Channel'].tolist())
+        np.testing.assert_allclose(rows['Std Error'], expected[name][codes], rtol=0.1)
+
+
+def test_paths_collapse_despite_continuous_values():
+    touches = ConversionTouches(synthetic_data.generate_synthetic_data(num_users=4000, seed=7))
+    intervals = bootstrap_credit(touches, {'last_touch': {}, 'smart': {}}, n_replicates=10, seed=0)
+    assert intervals.attrs['groups'] < touches.n_journeys / 10
+
+
+def test_seeded_runs_repeat(interaction_log):
+    first = bootstrap_credit(interaction_log, MODELS, n_replicates=100, seed=3)
+    second = bootstrap_credit(interaction_log, MODELS, n_replicates=100, seed=3)
+    assert first.equals(second)
+
+
+def test_token_stops_a_superseded_run(interaction_log):
+    class Token:
+        checks = 0
+
+        def check(self):
+            self.checks += 1
+            if self.checks > 1:
+                raise JobCancelled('superseded')
+
+    with pytest.raises(JobCancelled):
+        bootstrap_credit(interaction_log, MODELS, n_replicates=1000, seed=0, token=Token())
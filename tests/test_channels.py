@@ -0,0 +1,46 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from channels import CHANNELS, MAX_SHARED_CHANNELS, ChannelRegistry, Journey
+
+
+def test_encode_interns_in_order():
+    registry = ChannelRegistry(['Push'])
+    codes = registry.encode(pd.Series(['SMS', 'Push', 'SMS', 'Web']))
+    assert codes.tolist() == [1, 0, 1, 2]
+    assert registry.names == ['Push', 'SMS', 'Web']
+    assert registry.decode(codes) == ['SMS', 'Push', 'SMS', 'Web']
+
+
+@pytest.mark.parametrize('missing', [None, np.nan, float('nan')])
+def test_missing_names_are_rejected(missing):
+    registry = ChannelRegistry(['Push', 'SMS'])
+    with pytest.raises(ValueError, match='missing channel'):
+        registry.encode(['Push', missing, 'SMS'])
+    with pytest.raises(ValueError, match='missing channel'):
+        registry.code(missing)
+    assert registry.names == ['Push', 'SMS']
+
+
+def test_registry_cap():
+    registry = ChannelRegistry(['A', 'B'], max_size=3)
+    assert registry.encode(['A', 'C', 'A']).tolist() == [0, 2, 0]
+    with pytest.raises(ValueError, match='full'):
+        registry.encode(['D'])
+    assert len(registry) == 3 and registry.code('B') == 1
+    restored = pickle.loads(pickle.dumps(registry))
+    assert restored.names == registry.names
+    with pytest.raises(ValueError, match='full'):
+        restored.code('D')
+    assert len(CHANNELS) <= MAX_SHARED_CHANNELS
+
+
+def test_journey_equality_and_hash():
+    journey = Journey.from_names(['Push', 'SMS'], revenue=10)
+    assert journey == ['Push', 'SMS']
+    same = Journey.from_names(['Push', 'SMS'], revenue=20)
+    assert journey == same and hash(journey) == hash(same) == hash(('Push', 'SMS'))
+    assert len({journey, same, Journey.from_names(['SMS'])}) == 2
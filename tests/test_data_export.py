@@ -0,0 +1,99 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from attribution_engine import ConversionTouches
+from attribution_models import apply_smart_attribution, apply_time_decay_attribution
+from data_export import (channel_credit_frame, csv_bytes, export_bytes, journey_credit_frame, read_columnar,
+                         write_csv)
+
+MODELS = {'Last Touch': ('last_touch', {}), 'Smart Attribution': ('smart', {'navigation_threshold_seconds': 60}),
+          'Time Decay': ('time_decay', {'half_life_seconds': 86400})}
+
+
+def mixed_frame():
+    return pd.DataFrame({
+        'text': ['plain', 'with, comma', 'with "quote"', 'line\nbreak', None, 'plain'],
+        'category': pd.Categorical(['a', 'b', None, 'a', 'b', 'a']),
+        'flag': [True, False, True, True, False, False],
+        'count': np.arange(6, dtype=np.int64) * 1_000_000_007,
+        'value': [0.1, 1 / 3, np.nan, 1e20, -2.5e-7, 42.0],
+        'time': pd.to_datetime(['2024-01-01 00:00:01', '2024-02-29 12:30:00', '2024-03-01 00:00:00', '2024-12-31 23:59:59',
+                                '2025-01-01 00:00:00', '2024-06-15 06:00:00']),
+    })
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, 20_000])
+def test_csv_is_byte_identical_to_pandas(interaction_log, chunk_rows):
+    assert csv_bytes(interaction_log, chunk_rows) == interaction_log.to_csv(index=False).encode('utf-8')
+    frame = mixed_frame()
+    assert csv_bytes(frame, chunk_rows) == frame.to_csv(index=False).encode('utf-8')
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4])
+def test_datetime_format_does_not_depend_on_the_chunk(chunk_rows):
+    frame = mixed_frame()
+    variants = [
+        frame.assign(time=frame['time'].astype('datetime64[ns]')),
+        frame.assign(time=frame['time'].dt.normalize()),
+        frame.assign(time=frame['time'].where(frame.index != 2)),
+        frame.assign(time=frame['time'] + pd.to_timedelta([0, 0, 0, 0, 0, 1], 'ms'),
+                     delta=pd.to_timedelta([0, 1, 2, 3, 4, 2 * 86400], 's')),
+        frame.assign(time=frame['time'].dt.tz_localize('Europe/Berlin')),
+        frame['time'].where(frame.index != 2).to_frame(),
+    ]
+    for variant in variants:
+        assert csv_bytes(variant, chunk_rows) == variant.to_csv(index=False).encode('utf-8')
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 100])
+def test_nullable_dtypes_match_pandas(chunk_rows):
+    frame = pd.DataFrame({
+        'a': pd.array([1, None, 3], dtype='Int64'),
+        'u': pd.array([1, 2, None], dtype='UInt8'),
+        'flag': pd.array([True, None, False], dtype='boolean'),
+        'value': pd.array([1.5, None, 2.0], dtype='Float64'),
+        'text': pd.array(['x', None, 'z'], dtype='string'),
+        'b': list('xyz'),
+    })
+    assert csv_bytes(frame, chunk_rows) == frame.to_csv(index=False).encode('utf-8')
+
+
+def test_write_csv_streams_to_a_file(interaction_log):
+    buffer = io.BytesIO()
+    written = write_csv(interaction_log, buffer, chunk_rows=100)
+    assert written == len(buffer.getvalue())
+    assert buffer.getvalue() == interaction_log.to_csv(index=False).encode('utf-8')
+
+
+def test_columnar_round_trip(interaction_log):
+    data, file_name, _ = export_bytes(interaction_log, 'columnar', 'events')
+    assert file_name.startswith('events.')
+    restored = read_columnar(data)
+    for name in interaction_log.columns:
+        expected = interaction_log[name]
+        actual = restored[name].astype(object) if expected.dtype == object else restored[name]
+        np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy())
+
+
+def test_credit_tables_match_the_models(interaction_log):
+    touches = ConversionTouches(interaction_log)
+    per_user = journey_credit_frame(touches, MODELS)
+    per_channel = channel_credit_frame(touches, MODELS)
+    summed = per_user.groupby(['Model', 'Channel'], observed=True)['Credit'].sum()
+    for (model, channel), revenue in zip(zip(per_channel['Model'], per_channel['Channel']), per_channel['Revenue']):
+        assert summed[(model, channel)] == pytest.approx(revenue)
+
+    smart = per_channel[per_channel['Model'] == 'Smart Attribution']
+    expected = apply_smart_attribution(touches, 60, 0.4, 0.4, 0.2)
+    assert smart['Channel'].tolist() == expected['Channel'].tolist()
+    np.testing.assert_allclose(smart['Revenue'], expected['Revenue'])
+    decay = per_channel[per_channel['Model'] == 'Time Decay']
+    np.testing.assert_allclose(decay['Revenue'], apply_time_decay_attribution(touches, 86400)['Revenue'])
+
+
+def test_unknown_format_is_rejected(interaction_log):
+    with pytest.raises(ValueError):
+        export_bytes(interaction_log, 'xlsx')
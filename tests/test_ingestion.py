@@ -0,0 +1,86 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from channels import CHANNELS
+from ingestion import (EVENT_CLIENT_COLUMNS, LOAN_CLIENT_COLUMNS, classify_sheet, find_column, load_event_store,
+                       normalize_ids, parse_dates)
+
+
+def test_normalize_ids_matches_normalize_id():
+    values = ['00123', ' 0045 ', 123.0, 77, '000', 0, '', None, np.nan, 'A01', 12.5]
+    expected = ['123', '45', '123', '77', '0', '0', '', '', '', 'A01', '12.5']
+    assert normalize_ids(values).tolist() == expected
+
+
+def test_header_priority():
+    headers = ['CLI_ID', 'CLIENT_CD', 'CLI_CODE', 'DT_OPEN']
+    assert find_column(headers, LOAN_CLIENT_COLUMNS) == 2
+    assert find_column(headers, EVENT_CLIENT_COLUMNS) == 1
+    assert find_column(['CLI_ID'], EVENT_CLIENT_COLUMNS) == 0
+    assert find_column(headers, ('EVENT_TIME',)) == -1
+    assert classify_sheet(' CashLoan ') == ('loans', None)
+    assert classify_sheet('Stories_January') == ('channel', 'stories')
+    assert classify_sheet('summary') == (None, None)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (datetime.datetime(2024, 3, 5, 10, 30), '2024-03-05 10:30'),
+    (pd.Timestamp('2024-03-05 10:30'), '2024-03-05 10:30'),
+    (45292, '2024-01-01'),                         # Excel serial days since 1899-12-30
+    (45292.25, '2024-01-01 06:00'),
+    (np.int64(1), '1899-12-31'),
+    ('2024-03-05 10:30:00', '2024-03-05 10:30'),
+    ('2024-03-05', '2024-03-05'),
+    ('not a date', None),
+    ('', None),
+    (True, None),                                  # typeof boolean -> null
+    (None, None),
+    (20240101, None),                              # far outside the datetime64[ns] range
+    (float('inf'), None),
+])
+def test_parse_dates_matches_to_date(value, expected):
+    expected = np.datetime64('NaT') if expected is None else np.datetime64(pd.Timestamp(expected), 'ns')
+    # Alone (homogeneous fast paths) and inside a mixed column
+    mixed = parse_dates([value, 'x', 45292, datetime.datetime(2024, 1, 1), None])
+    for result in (parse_dates([value])[0], mixed[0]):
+        assert (np.isnat(result) and np.isnat(expected)) or result == expected
+
+
+def test_numeric_columns_take_the_serial_path():
+    serials = np.array([45292, 45293.5, 20240101, np.nan])
+    expected = parse_dates(serials.astype(object))
+    np.testing.assert_array_equal(parse_dates(serials), expected)
+    np.testing.assert_array_equal(parse_dates(pd.array([45292, None], dtype='Int64')), expected[[0, 3]])
+    assert np.isnat(expected[2:]).all()
+
+
+def test_csv_directory(tmp_path):
+    pd.DataFrame({
+        'client_cd': ['999', '998', '997'],             # lower priority than CLI_CODE for loans
+        ' cli_code ': ['0012', '0034', ''],
+        'DT_OPEN': ['2024-03-01 12:00:00', '45352', '2024-03-01'],
+    }).to_csv(tmp_path / 'cash_loan.csv', index=False)
+    pd.DataFrame({
+        'CLI_CODE': ['1', '2', '3'],
+        'CLIENT_CD': ['12', '34', '12'],                 # higher priority for events
+        'EVENT_TIME': ['45351.5', '', '20240101'],      # serials; empty and out-of-range rows dropped
+        'DATE': ['2024-01-01', '2024-01-01', '2024-01-01'],
+    }).to_csv(tmp_path / 'push.csv', index=False)
+    pd.DataFrame({'CLIENT_CD': ['012'], 'DATE': ['2024-02-28 09:00']}).to_csv(tmp_path / 'telemarket_q1.csv',
+                                                                              index=False)
+    pd.DataFrame({'CLIENT_CD': ['12']}).to_csv(tmp_path / 'sms.csv', index=False)
+
+    with pytest.warns(UserWarning, match='sms'):
+        store = load_event_store(str(tmp_path), workers=1, chunk_rows=2)
+    assert store.loan_client_ids.tolist() == ['12', '34']
+    np.testing.assert_array_equal(store.loan_open, np.array(['2024-03-01T12:00', '2024-03-01'], dtype='datetime64[ns]'))
+    assert store.stats == {'Push': 1, 'Telemarketing': 1}
+    events = store.events_frame()
+    assert events['Channel'].tolist() == ['Push', 'Telemarketing']
+    assert events['Event_Time'].tolist() == [pd.Timestamp('2024-02-29 12:00'), pd.Timestamp('2024-02-28 09:00')]
+    # Both events belong to the client of the first loan
+    assert (store.event_client == store.loan_client[0]).all()
+    assert store.channels is CHANNELS
@@ -0,0 +1,48 @@
+import threading
+
+from instrumentation import PROCESS_TRACER, TRACER, Tracer, bind_tracer, use_tracer
+
+
+def test_threads_record_into_their_own_tracer():
+    tracers = [Tracer(enabled=True), Tracer(enabled=False)]
+    before = len(PROCESS_TRACER.spans)
+
+    def session(tracer, name):
+        bind_tracer(tracer)
+        with TRACER.span(name):
+            TRACER.count('rows', 10)
+
+    threads = [threading.Thread(target=session, args=(tracer, f'stage{i}')) for i, tracer in enumerate(tracers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [span[0] for span in tracers[0].spans] == ['stage0'] and tracers[0].counters == {'rows': 10}
+    assert tracers[1].spans == [] and tracers[1].counters == {}
+    assert len(PROCESS_TRACER.spans) == before
+
+
+def test_use_tracer_restores_the_previous_one():
+    outer, inner = Tracer(enabled=True), Tracer(enabled=True)
+    with use_tracer(outer):
+        with use_tracer(inner):
+            with TRACER.span('inner'):
+                pass
+        with TRACER.span('outer'):
+            pass
+    assert [span[0] for span in inner.spans] == ['inner']
+    assert [span[0] for span in outer.spans] == ['outer']
+
+
+def test_merge_and_summary():
+    first, second = Tracer(enabled=True), Tracer(enabled=True)
+    with first.span('a'):
+        pass
+    with second.span('a'):
+        pass
+    second.count('rows', 3)
+    first.merge(second)
+    summary = first.summary()
+    assert summary.loc[summary['Stage'] == 'a', 'Calls'].item() == 2
+    assert first.counters == {'rows': 3}
+    assert len(first.trace_events()) == 3
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from channels import CHANNELS
+from ingestion import EventStore
+from journey_builder import build_loan_journeys
+
+DAY = np.timedelta64(1, 'D')
+MS = np.timedelta64(1, 'ms')
+NS = np.timedelta64(1, 'ns')
+CHANNEL_CODES = [CHANNELS.code(name) for name in ('Push', 'SMS', 'Stories', 'Telemarketing')]
+
+
+def make_store(loans, events):
+    """loans: [(client, DT_OPEN)], events: [(client, time, channel code)]."""
+    loan_client = np.array([c for c, _ in loans], dtype=np.int32)
+    event_client = np.array([c for c, _, _ in events], dtype=np.int32)
+    return EventStore(
+        loan_client=loan_client,
+        loan_open=np.array([t for _, t in loans], dtype='datetime64[ns]'),
+        loan_client_ids=np.array([str(c) for c in loan_client], dtype=object),
+        event_client=event_client,
+        event_time=np.array([t for _, t, _ in events], dtype='datetime64[ns]'),
+        event_channel=np.array([ch for _, _, ch in events], dtype=np.int16),
+        client_keys=np.arange(max(loan_client.max(initial=-1), event_client.max(initial=-1)) + 1, dtype=np.uint64),
+    )
+
+
+def reference_journeys(loans, events):
+    """buildJourneys from upload_script.js, one filter over the client's events per loan."""
+    out = []
+    for client, dt_open in loans:
+        cutoff = np.datetime64(dt_open, 'ns')
+        if cutoff - cutoff.astype('datetime64[D]') < np.timedelta64(1, 's'):
+            cutoff = cutoff.astype('datetime64[D]') + DAY - MS
+        client_loans = sorted((t for c, t in loans if c == client), key=lambda t: np.datetime64(t, 'ns'))
+        index = next(i for i, t in enumerate(client_loans) if t is dt_open)
+        start = np.datetime64(0, 'ns')
+        if index > 0:
+            start = np.datetime64(client_loans[index - 1], 'ns')
+            if start - start.astype('datetime64[D]') < np.timedelta64(60, 's'):
+                start = start.astype('datetime64[D]') + DAY - MS
+        window = sorted((np.datetime64(t, 'ns'), ch) for c, t, ch in events if c == client and start < t <= cutoff)
+        path = []
+        for _, channel in window:
+            if not path or path[-1] != channel:
+                path.append(channel)
+        out.append(path)
+    return out
+
+
+def journeys_of(batch):
+    return [batch.journey(j).codes.tolist() for j in range(len(batch))]
+
+
+def boundary_case():
+    push, sms, stories, tele = CHANNEL_CODES
+    first_open = np.datetime64('2024-03-01T10:00:00', 'ns')
+    second_open = np.datetime64('2024-03-05', 'ns')        # no time of day: window ends at 23:59:59.999
+    midnight_open = np.datetime64('2024-04-01', 'ns')      # previous loan without hours: start at end of that day
+    loans = [(0, second_open), (0, first_open), (1, midnight_open), (1, np.datetime64('2024-04-03T08:00', 'ns')),
+             (2, np.datetime64('2024-01-01T12:00', 'ns')),
+             (3, np.datetime64('2026-01-01T09:00', 'ns'))]  # after every event: cutoff clipped to the key range
+    events = [
+        (0, first_open - NS, push),                       # inside the first window
+        (0, first_open, sms),                             # exactly at DT_OPEN: first loan
+        (0, first_open + NS, stories),                    # just after: second loan
+        (0, second_open + np.timedelta64(23, 'h'), tele),
+        (0, second_open + DAY - MS, push),                # 23:59:59.999: still the second loan
+        (0, second_open + DAY - MS + NS, sms),            # after the cutoff: no loan
+        (1, midnight_open + np.timedelta64(12, 'h'), push),  # same day as a midnight loan: counted there
+        (1, midnight_open + DAY - MS, sms),               # end of that day: still the first loan
+        (1, midnight_open + DAY - MS + NS, stories),      # after the end of day: second loan
+        (1, np.datetime64('2024-04-03T08:00', 'ns'), tele),
+        (2, np.datetime64('2025-01-01', 'ns'), push),     # only after the client's loan
+        (3, np.datetime64('2023-01-01', 'ns'), sms),      # earliest event, long before the client's loan
+        (4, np.datetime64('2024-02-01', 'ns'), tele),     # client without loans
+    ]
+    return loans, events
+
+
+def test_windows_at_the_boundaries():
+    loans, events = boundary_case()
+    push, sms, stories, tele = CHANNEL_CODES
+    batch = build_loan_journeys(make_store(loans, events), dedup=False)
+    assert journeys_of(batch) == [[stories, tele, push], [push, sms], [push, sms], [stories, tele], [], [sms]]
+    assert batch.columns['Is_Organic'].tolist() == [False, False, False, False, True, False]
+    assert journeys_of(batch) == reference_journeys(loans, events)
+
+
+@pytest.mark.parametrize('packed', [True, False])
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_the_per_loan_filter(packed, seed):
+    rng = np.random.default_rng(seed)
+    base = np.datetime64('2024-01-01', 'ns')
+    n_clients = 40
+    loans = [(int(c), base + np.timedelta64(int(rng.integers(0, 60)), 'D')
+              + rng.choice([0, 1, 59, 60]) * np.timedelta64(1, 's') * rng.integers(0, 2) * 3600)
+             for c in rng.integers(0, n_clients, size=80)]
+    events = [(int(c), base + np.timedelta64(int(rng.integers(-86400, 61 * 86400)), 's'), int(rng.choice(CHANNEL_CODES)))
+              for c in rng.integers(0, n_clients + 5, size=600)]
+    # Loans sharing a DT_OPEN with a touch, and touches exactly at a loan's cutoff
+    events += [(c, t, CHANNEL_CODES[0]) for c, t in loans[:20]]
+    if not packed:
+        # Nanosecond times spanning centuries do not fit the packed (client, time) key
+        events += [(n_clients + 9, np.datetime64(1, 'ns'), CHANNEL_CODES[1]),
+                   (n_clients + 9, np.datetime64('2200-01-01', 'ns') + NS, CHANNEL_CODES[1])]
+    expected = reference_journeys(loans, events)
+    assert journeys_of(build_loan_journeys(make_store(loans, events))) == expected
@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from attribution_engine import JourneyBatch, u_shape_credit
+from channels import ChannelRegistry
+from journey_store import JourneyStore
+
+
+def journeys_of(batch):
+    return [batch.journey(j).names() for j in range(len(batch))]
+
+
+def store_files(path):
+    return {name: open(os.path.join(path, name), 'rb').read() for name in sorted(os.listdir(path))}
+
+
+@pytest.fixture
+def parts(journey_frame):
+    frame = journey_frame.rename(columns={'Loan_Amount': 'Revenue'})
+    first = JourneyBatch.from_dataframe(frame.iloc[:150], columns=['Time_To_Convert_Seconds'])
+    # A second batch on its own registry: codes are translated by name
+    registry = ChannelRegistry(['Banner', 'Push', 'Web'])
+    second = JourneyBatch.from_journeys([['Web', 'Push'], [], ['Banner', 'Web', 'Web']], [10.0, 20.0, 30.0],
+                                        {'Time_To_Convert_Seconds': np.array([5, 6, 7])}, registry=registry)
+    return first, second
+
+
+def touch_times(batch, start):
+    return np.datetime64('2024-01-01', 'ns') + np.arange(start, start + len(batch.codes)).astype('timedelta64[s]')
+
+
+def test_round_trip(tmp_path, parts):
+    first, second = parts
+    path = str(tmp_path / 'store')
+    store = JourneyStore.create(path, columns={'Time_To_Convert_Seconds': 'i4'}, touch_time=True)
+    store.append(first, touch_times(first, 0)).append(second, touch_times(second, len(first.codes)))
+
+    reopened = JourneyStore.open(path)
+    assert len(reopened) == len(first) + len(second)
+    full = reopened.batch()
+    assert journeys_of(full) == journeys_of(first) + journeys_of(second)
+    np.testing.assert_array_equal(full.revenue, np.concatenate([first.revenue, second.revenue]))
+    np.testing.assert_array_equal(full.columns['Time_To_Convert_Seconds'],
+                                  np.concatenate([first.columns['Time_To_Convert_Seconds'], [5, 6, 7]]))
+    np.testing.assert_array_equal(reopened.touch_time.view('datetime64[ns]'),
+                                  touch_times(full, 0))
+    assert 'Web' in reopened.channels
+
+    # Chunked reduction equals one pass over everything
+    totals, present = u_shape_credit(full, 0.4, 0.4, 0.2)
+    expected = full.to_channel_dict(totals, present)
+    actual = reopened.reduce_credit(u_shape_credit, 0.4, 0.4, 0.2, chunk_journeys=7)
+    assert actual.keys() == expected.keys()
+    for channel, value in expected.items():
+        assert actual[channel] == pytest.approx(value)
+
+
+@pytest.mark.parametrize('failure', ['channels', 'touch_time', 'column'])
+def test_failed_append_leaves_the_store_unchanged(tmp_path, parts, failure):
+    first, second = parts
+    path = str(tmp_path / 'store')
+    store = JourneyStore.create(path, columns={'Time_To_Convert_Seconds': 'i4'}, touch_time=True)
+    store.append(first, touch_times(first, 0))
+    names, before = store.channels.names, store_files(path)
+
+    times = touch_times(second, 0)
+    if failure == 'channels':
+        registry = ChannelRegistry([f'Channel {i}' for i in range(300)])
+        bad = JourneyBatch(np.arange(300, dtype=np.uint16), [0, 300], [1.0], registry,
+                           {'Time_To_Convert_Seconds': [1]})
+        times = touch_times(bad, 0)
+    elif failure == 'touch_time':
+        bad, times = second, times[:-1]
+    else:
+        bad = JourneyBatch(second.codes, second.offsets, second.revenue, second.channels,
+                           {'Time_To_Convert_Seconds': [1, 2]})
+    with pytest.raises(ValueError):
+        store.append(bad, times)
+
+    assert store.channels.names == names
+    assert store_files(path) == before
+    assert JourneyStore.open(path).channels.names == names
+    # And the store still takes appends
+    store.append(second, touch_times(second, len(first.codes)))
+    assert journeys_of(JourneyStore.open(path).batch()) == journeys_of(first) + journeys_of(second)
+    with open(os.path.join(path, 'manifest.json')) as f:
+        assert json.load(f)['n_journeys'] == len(first) + len(second)
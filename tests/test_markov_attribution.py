@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+import reference_models as ref
+from attribution_engine import JourneyBatch
+from markov_attribution import markov_credit, removal_effects, transition_counts
+
+
+@pytest.fixture
+def journeys(journey_frame):
+    rng = np.random.default_rng(1)
+    converted = rng.random(len(journey_frame)) < 0.6
+    return list(journey_frame['Journey_List']), converted, journey_frame['Loan_Amount'].to_numpy()
+
+
+def test_removal_effects_match_resolving_the_chain(journeys):
+    paths, converted, revenue = journeys
+    batch = JourneyBatch.from_journeys(paths, revenue)
+    _, effects = removal_effects(transition_counts(batch, converted))
+    expected = ref.markov_removal_effects(paths, converted)
+    for channel, effect in expected.items():
+        assert effects[batch.channels.code(channel)] == pytest.approx(effect, abs=1e-10), channel
+
+
+def test_credit_splits_converted_revenue_by_effect(journeys):
+    paths, converted, revenue = journeys
+    batch = JourneyBatch.from_journeys(paths, revenue)
+    totals, present = markov_credit(batch, converted)
+    expected = ref.markov_removal_effects(paths, converted)
+    total_effect = sum(expected.values())
+    for channel, effect in expected.items():
+        code = batch.channels.code(channel)
+        assert present[code]
+        assert totals[code] == pytest.approx(effect / total_effect * revenue[converted].sum(), rel=1e-9)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import reference_models as ref
+from attribution_engine import ConversionTouches, JourneyBatch
+from attribution_models import apply_smart_attribution
+from navigation_index import THRESHOLD_RANGE, build_last_touch_index, build_smart_index
+from touch_filters import RuleEvaluator, TouchRule
+
+
+@pytest.mark.parametrize('threshold', [-1, 0, 17, 60, 150, 299, 10_000])
+@pytest.mark.parametrize('weights', [(0.4, 0.4, 0.2), (0.6, 0.3, 0.1)])
+def test_smart_index_matches_baseline(interaction_log, threshold, weights):
+    touches = ConversionTouches(interaction_log)
+    totals, present = build_smart_index(touches).lookup(threshold, *weights)
+    # Thresholds outside the slider range are clipped to it
+    expected = ref.apply_smart_attribution(interaction_log, min(max(threshold, 0), 300), *weights)
+    actual = touches.to_frame(totals, present)
+    assert actual['Channel'].tolist() == expected['Channel'].tolist()
+    np.testing.assert_allclose(actual['Revenue'], expected['Revenue'], rtol=1e-9)
+
+
+@pytest.mark.parametrize('threshold', [0, 30, 60, 300])
+def test_smart_index_with_extra_rules_matches_the_rules(interaction_log, threshold):
+    touches = ConversionTouches(interaction_log)
+    rules = [TouchRule('push_open', channel='Push', max_seconds=600),
+             TouchRule('sms_repeat', channel='SMS', repeat_within_seconds=86400)]
+    keep = RuleEvaluator(touches).keep_mask(rules)
+    assert not keep.all()
+    totals, present = build_smart_index(touches, keep=keep).lookup(threshold, 0.4, 0.4, 0.2)
+    actual = touches.to_frame(totals, present)
+    expected = apply_smart_attribution(interaction_log, threshold, 0.4, 0.4, 0.2, touches=touches, rules=rules)
+    assert actual['Channel'].tolist() == expected['Channel'].tolist()
+    np.testing.assert_allclose(actual['Revenue'], expected['Revenue'], rtol=1e-9)
+
+
+@pytest.mark.parametrize('threshold', [0, 5, 60, 120, 299, 300])
+def test_last_touch_index_matches_dashboard_baseline(journey_frame, threshold):
+    batch = JourneyBatch.from_journeys(journey_frame['Journey_List'], journey_frame['Loan_Amount'].to_numpy())
+    index = build_last_touch_index(batch, journey_frame['Time_To_Convert_Seconds'].to_numpy())
+    actual = index.lookup_dict(threshold, 0.5, 0.3, 0.2)
+    expected = ref.calculate_attribution(journey_frame, 'Smart Model', threshold, (0.5, 0.3, 0.2))
+    assert set(actual) == set(expected)
+    for channel, value in expected.items():
+        assert actual[channel] == pytest.approx(value, rel=1e-9)
+
+
+def test_sweep_rows_are_lookups(interaction_log):
+    touches = ConversionTouches(interaction_log)
+    index = build_smart_index(touches)
+    curve = index.sweep(0.4, 0.4, 0.2, thresholds=[0, 60, 300])
+    for threshold in (0, 60, 300):
+        totals, _ = index.lookup(threshold, 0.4, 0.4, 0.2)
+        np.testing.assert_allclose(curve.loc[float(threshold)].to_numpy(), totals[touches.channels.encode(curve.columns)])
+
+
+def test_rows_are_bounded_by_distinct_thresholds_in_range():
+    # Many journeys whose Stories touches share a few times to conversion, most outside the range
+    rows = []
+    base = pd.Timestamp('2024-01-01')
+    for user in range(400):
+        conversion = base + pd.Timedelta(days=user)
+        for seconds in (-30, 5, 60, 60, 5000, 90000):
+            rows.append((f'U{user}', 'Stories', conversion - pd.Timedelta(seconds=seconds), False, 0))
+        rows.append((f'U{user}', 'Push', conversion - pd.Timedelta(seconds=200), False, 0))
+        rows.append((f'U{user}', 'Push', conversion, True, 100))
+    df = pd.DataFrame(rows, columns=['User_ID', 'Channel', 'Interaction_Time', 'Converted', 'Conversion_Value'])
+    touches = ConversionTouches(df)
+    index = build_smart_index(touches)
+    assert index.breakpoints.tolist() == [5, 60]
+    assert index.totals.shape[0] == 3
+    for threshold in (0, 4, 5, 59, 60, 299, THRESHOLD_RANGE[1]):
+        totals, present = index.lookup(threshold, 0.4, 0.4, 0.2)
+        expected = ref.apply_smart_attribution(df, threshold, 0.4, 0.4, 0.2)
+        actual = touches.to_frame(totals, present)
+        assert actual['Channel'].tolist() == expected['Channel'].tolist()
+        np.testing.assert_allclose(actual['Revenue'], expected['Revenue'], rtol=1e-9)
@@ -0,0 +1,39 @@
+from collections import Counter
+
+import numpy as np
+
+from attribution_engine import JourneyBatch
+from path_trie import PathTrie
+
+
+def make_batch(journey_frame):
+    return JourneyBatch.from_journeys(journey_frame['Journey_List'], journey_frame['Loan_Amount'].to_numpy())
+
+
+def test_top_paths_match_counter(journey_frame):
+    trie = PathTrie(make_batch(journey_frame))
+    counts = Counter(' → '.join(journey) for journey in journey_frame['Journey_List'])
+    top = trie.top_paths(20)
+    assert top['Count'].tolist() == sorted(counts.values(), reverse=True)[:20]
+    assert all(counts[path] == count for path, count in zip(top['Conversion Path'], top['Count']))
+
+
+def test_ties_keep_first_occurrence_order():
+    trie = PathTrie(JourneyBatch.from_journeys([['Push'], ['SMS'], ['SMS'], ['Push'], ['Banner']]))
+    assert trie.top_paths(3)['Conversion Path'].tolist() == ['Push', 'SMS', 'Banner']
+
+
+def test_prefix_counts_and_revenue(journey_frame):
+    trie = PathTrie(make_batch(journey_frame))
+    journeys, revenue = journey_frame['Journey_List'], journey_frame['Loan_Amount']
+    for prefix in (['Digital Ads'], ['Stories', 'Push'], ['SMS', 'SMS', 'Direct'], ['Banner']):
+        starts = np.array([journey[:len(prefix)] == prefix for journey in journeys])
+        assert trie.prefix_count(prefix) == starts.sum()
+        assert trie.prefix_revenue(prefix) == revenue[starts].sum()
+
+
+def test_next_steps_match_counter(journey_frame):
+    trie = PathTrie(make_batch(journey_frame))
+    steps = Counter(journey[1] for journey in journey_frame['Journey_List'] if journey[0] == 'Push' and len(journey) > 1)
+    frame = trie.next_steps(['Push'])
+    assert dict(zip(frame['Channel'], frame['Count'])) == dict(steps)
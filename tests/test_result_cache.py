@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from result_cache import CACHE_VERSION, ResultCache, dataset_fingerprint
+
+
+def test_get_or_compute_stores_and_hits(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return pd.DataFrame({'Channel': ['Push'], 'Revenue': [1.0]})
+
+    first = cache.get_or_compute('data', 'smart', {'threshold': 60}, compute)
+    second = cache.get_or_compute('data', 'smart', {'threshold': 60}, compute)
+    assert len(calls) == 1 and first.equals(second)
+    cache.flush()
+    stats = ResultCache(str(tmp_path / 'results.sqlite')).stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_keys_depend_on_everything(tmp_path):
+    key = ResultCache.key('data', 'smart', {'threshold': 60})
+    assert key != ResultCache.key('data', 'smart', {'threshold': 50})
+    assert key != ResultCache.key('other', 'smart', {'threshold': 60})
+    assert key != ResultCache.key('data', 'smart', {'threshold': 60}, version=CACHE_VERSION + 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_bytes=2500)
+    for name in 'abc':
+        cache.put(name, b'x' * 1000)
+    assert cache.get('a') is None
+    assert cache.get('c') == b'x' * 1000
+
+
+def test_fingerprint_follows_content(interaction_log):
+    assert dataset_fingerprint(interaction_log) == dataset_fingerprint(interaction_log.copy())
+    changed = interaction_log.copy()
+    changed.loc[0, 'Conversion_Value'] += 1
+    assert dataset_fingerprint(changed) != dataset_fingerprint(interaction_log)
+
+
+def test_seeded_data_has_the_same_fingerprint_in_every_process():
+    script = ("from attribution_models import generate_synthetic_data; from result_cache import dataset_fingerprint; "
+              "print(dataset_fingerprint(generate_synthetic_data(300, seed=42, reference_time='2024-02-01')))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fingerprints = {subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True,
+                                   check=True).stdout.strip() for _ in range(2)}
+    assert len(fingerprints) == 1 and '' not in fingerprints
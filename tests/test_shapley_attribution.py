@@ -0,0 +1,17 @@
+import pytest
+
+import reference_models as ref
+from attribution_engine import JourneyBatch
+from shapley_attribution import shapley_credit
+
+
+def test_shapley_matches_coalition_enumeration(journey_frame):
+    journeys, revenue = list(journey_frame['Journey_List']), journey_frame['Loan_Amount'].to_numpy()
+    batch = JourneyBatch.from_journeys(journeys, revenue)
+    totals, present = shapley_credit(batch)
+    actual = batch.to_channel_dict(totals, present)
+    expected = ref.shapley_attribution(journeys, revenue)
+    assert set(actual) == set(expected)
+    for channel, value in expected.items():
+        assert actual[channel] == pytest.approx(value, rel=1e-9), channel
+    assert sum(actual.values()) == pytest.approx(revenue.sum())
@@ -0,0 +1,74 @@
+import pytest
+
+import reference_models as ref
+import synthetic_data
+from streaming import StreamingAttribution, iter_frame_events, tail_events
+
+REFERENCE_TIME = '2024-02-01'
+
+
+@pytest.fixture(scope='module')
+def synthetic_log():
+    # Every synthetic journey converts on its last event, as the stream requires
+    return synthetic_data.generate_synthetic_data(num_users=400, seed=5, chunk_users=150,
+                                                  reference_time=REFERENCE_TIME)
+
+
+def assert_same_totals(actual, expected):
+    assert set(actual) == set(expected)
+    for channel, value in expected.items():
+        assert actual[channel] == pytest.approx(value, rel=1e-9)
+
+
+@pytest.mark.parametrize('threshold', [0, 60, 300])
+def test_stream_matches_batch(synthetic_log, threshold):
+    stream = StreamingAttribution(threshold, 0.5, 0.3, 0.2).consume(iter_frame_events(synthetic_log))
+    expected = ref.frame_to_dict(ref.apply_smart_attribution(synthetic_log, threshold, 0.5, 0.3, 0.2))
+    assert_same_totals(stream.totals(), expected)
+    assert stream.stats['conversions'] == synthetic_log['Converted'].sum()
+
+
+def test_incremental_totals_match_batch_so_far(synthetic_log):
+    stream = StreamingAttribution()
+    events = list(iter_frame_events(synthetic_log))
+    ordered = synthetic_log.sort_values('Interaction_Time', kind='mergesort')
+    fed = 0
+    for stop in (len(events) // 3, 2 * len(events) // 3, len(events)):
+        stream.consume(events[fed:stop])
+        fed = stop
+        # Users converted so far, with every event they had before converting
+        seen = ordered.iloc[:stop]
+        converted = seen.loc[seen['Converted'] == True, 'User_ID']
+        expected = ref.frame_to_dict(ref.apply_smart_attribution(
+            seen[seen['User_ID'].isin(converted)], 60, 0.4, 0.4, 0.2))
+        assert_same_totals(stream.totals(), expected)
+
+
+def test_tailing_an_appended_csv_matches_the_frame(tmp_path, synthetic_log):
+    path = tmp_path / 'events.csv'
+    synthetic_data.write_synthetic_data(path, num_users=400, seed=5, chunk_users=150, reference_time=REFERENCE_TIME)
+    from_file = StreamingAttribution().consume(tail_events(path))
+    from_frame = StreamingAttribution().consume(iter_frame_events(synthetic_log))
+    # The file holds the chunks one after another; every user lives in one chunk
+    assert_same_totals(from_file.totals(), from_frame.totals())
+
+
+def test_ttl_evicts_idle_users():
+    stream = StreamingAttribution(ttl_seconds=10)
+    stream.process('a', 'Push', 0)
+    stream.process('b', 'SMS', 5 * 10**9)
+    stream.process('b', 'SMS', 20 * 10**9)
+    assert stream.stats['evicted_ttl'] == 1 and list(stream.users) == ['b']
+    # The evicted user's Push is gone: its conversion is credited to the conversion channel alone
+    assert stream.process('a', 'Telemarketing', 21 * 10**9, converted=True, value=100) == {'Telemarketing': 100.0}
+
+
+def test_lru_evicts_the_least_recently_active_user():
+    stream = StreamingAttribution(first_weight=0.5, last_weight=0.5, middle_weight=0, max_users=2)
+    stream.process('a', 'Push', 0)
+    stream.process('b', 'SMS', 1)
+    stream.process('a', 'Push', 2)
+    stream.process('c', 'SMS', 3)
+    assert stream.stats['evicted_lru'] == 1 and list(stream.users) == ['a', 'c']
+    credit = stream.process('a', 'Telemarketing', 4, converted=True, value=10)
+    assert credit == {'Push': 10.0}
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import synthetic_data
+from synthetic_data import (DEFAULT_SCENARIO_MIX, allocate_users, generate_synthetic_data, iter_synthetic_chunks,
+                            write_synthetic_data)
+
+REFERENCE_TIME = '2024-02-01'
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Several random streams even for a small test dataset
+    monkeypatch.setattr(synthetic_data, 'BLOCK_USERS', 64)
+
+
+@pytest.mark.parametrize('num_users', [1, 7, 500, 1001])
+@pytest.mark.parametrize('mix', [DEFAULT_SCENARIO_MIX, {'A': 1, 'B': 1, 'C': 1}, {'A': 0.5, 'noise': 0}])
+def test_allocation_adds_up(num_users, mix):
+    counts = allocate_users(num_users, mix)
+    assert sum(counts.values()) == num_users
+    total = sum(mix.values())
+    for name, count in counts.items():
+        assert abs(count - num_users * mix[name] / total) < 1
+
+
+def test_allocation_matches_the_original_split():
+    assert allocate_users(500, DEFAULT_SCENARIO_MIX) == {'A': 100, 'B': 75, 'C': 38, 'D': 37, 'noise': 250}
+
+
+@pytest.mark.parametrize('mix', [{'A': -1, 'B': 2}, {'A': 0, 'B': 0}])
+def test_allocation_rejects_bad_mixes(mix):
+    with pytest.raises(ValueError):
+        allocate_users(10, mix)
+
+
+def test_same_seed_gives_the_same_log_for_any_chunking(small_blocks):
+    expected = generate_synthetic_data(300, seed=3, reference_time=REFERENCE_TIME)
+    for chunk_users in (7, 64, 100, 299, 300):
+        chunks = list(iter_synthetic_chunks(300, seed=3, chunk_users=chunk_users, reference_time=REFERENCE_TIME))
+        assert all(chunk['User_ID'].nunique() <= chunk_users for chunk in chunks)
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+    assert not generate_synthetic_data(300, seed=4, reference_time=REFERENCE_TIME).equals(expected)
+
+
+def test_chunks_split_users_in_order(small_blocks):
+    chunks = list(iter_synthetic_chunks(300, seed=3, chunk_users=50, reference_time=REFERENCE_TIME))
+    assert [(chunk['User_ID'].min(), chunk['User_ID'].max()) for chunk in chunks] == \
+        [(1 + 50 * i, 50 * (i + 1)) for i in range(6)]
+    for chunk in chunks:
+        assert chunk.index.equals(pd.RangeIndex(len(chunk)))
+        assert chunk.sort_values(['User_ID', 'Interaction_Time'], kind='mergesort').index.equals(chunk.index)
+
+
+def test_appended_csv_is_the_generated_log(tmp_path, small_blocks):
+    path = tmp_path / 'events.csv'
+    rows = write_synthetic_data(path, 300, seed=3, chunk_users=40, reference_time=REFERENCE_TIME)
+    expected = generate_synthetic_data(300, seed=3, reference_time=REFERENCE_TIME)
+    written = pd.read_csv(path, parse_dates=['Interaction_Time'])
+    assert rows == len(expected) == len(written)
+    # One header, then the chunks' rows back to back
+    assert (written['User_ID'] == 'User_ID').sum() == 0
+    for column in ('User_ID', 'Converted', 'Conversion_Value'):
+        assert written[column].tolist() == expected[column].tolist()
+    assert written['Channel'].tolist() == expected['Channel'].astype(str).tolist()
+    assert (written['Interaction_Time'].to_numpy(dtype='datetime64[ns]')
+            == expected['Interaction_Time'].to_numpy(dtype='datetime64[ns]')).all()
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import reference_models as ref
+from attribution_engine import ConversionTouches, JourneyBatch
+from attribution_models import apply_smart_attribution
+from touch_filters import (RuleEvaluator, TouchRule, TouchTable, app_navigation_rule, dashboard_navigation_rule,
+                           parse_rules)
+
+
+@pytest.fixture(scope='module')
+def touches(interaction_log):
+    return ConversionTouches(interaction_log)
+
+
+@pytest.mark.parametrize('threshold', [0, 60, 300])
+def test_app_rule_matches_navigation_mask(touches, threshold):
+    keep = RuleEvaluator(touches).keep_mask([app_navigation_rule(threshold)])
+    np.testing.assert_array_equal(keep, touches.navigation_mask(threshold))
+
+
+def test_dashboard_rule_drops_last_stories_under_threshold(journey_frame):
+    batch = JourneyBatch.from_journeys(journey_frame['Journey_List'], journey_frame['Loan_Amount'].to_numpy(),
+                                       {'Time_To_Convert_Seconds': journey_frame['Time_To_Convert_Seconds'].to_numpy()})
+    drop = RuleEvaluator(TouchTable.from_batch(batch)).drop_mask([dashboard_navigation_rule(60)])
+    expected = np.concatenate([
+        [i == len(journey) - 1 and channel == 'Stories' and seconds < 60 for i, channel in enumerate(journey)]
+        for journey, seconds in zip(journey_frame['Journey_List'], journey_frame['Time_To_Convert_Seconds'])
+    ])
+    np.testing.assert_array_equal(drop, expected)
+
+
+def test_repeat_and_position_rules_match_loops(touches):
+    rules = parse_rules([
+        {'name': 'sms_repeat', 'channel': 'SMS', 'repeat_within_seconds': 86400},
+        {'name': 'first_push', 'channel': 'Push', 'position': 'first'},
+    ])
+    drop = RuleEvaluator(touches).drop_mask(rules)
+
+    expected = np.zeros(len(touches.touch_channel), dtype=bool)
+    sms, push = touches.channel_code('SMS'), touches.channel_code('Push')
+    for journey in range(touches.n_journeys):
+        rows = np.flatnonzero(touches.touch_journey == journey)
+        last_sms = None
+        for k, row in enumerate(rows):
+            if touches.touch_channel[row] == sms:
+                gap = None if last_sms is None else (touches.touch_time[row] - last_sms) / np.timedelta64(1, 's')
+                expected[row] |= gap is not None and gap <= 86400
+                last_sms = touches.touch_time[row]
+            expected[row] |= k == 0 and touches.touch_channel[row] == push
+    np.testing.assert_array_equal(drop, expected)
+
+
+def test_rule_masks_are_cached_by_spec(touches):
+    evaluator = RuleEvaluator(touches)
+    evaluator.keep_mask([app_navigation_rule(60), TouchRule('push', channel='Push', max_seconds=30)])
+    evaluator.keep_mask([app_navigation_rule(60), TouchRule('push', channel='Push', max_seconds=40)])
+    assert evaluator.evaluations == 3
+
+
+def test_extra_rules_feed_smart_attribution(interaction_log, touches):
+    rule = TouchRule('push', channel='Push', max_seconds=300)
+    filtered = interaction_log[~((interaction_log['Channel'] == 'Push') & ~interaction_log['Converted'] &
+                                 interaction_log['User_ID'].isin(touches.user_ids) &
+                                 _seconds_to_conversion(interaction_log, touches).le(300))]
+    actual = apply_smart_attribution(interaction_log, 60, 0.4, 0.4, 0.2, touches=touches, rules=[rule])
+    expected = ref.apply_smart_attribution(filtered, 60, 0.4, 0.4, 0.2)
+    assert actual['Channel'].tolist() == expected['Channel'].tolist()
+    np.testing.assert_allclose(actual['Revenue'], expected['Revenue'])
+
+
+def _seconds_to_conversion(log, touches):
+    conversion = dict(zip(touches.user_ids, touches.conversion_time))
+    times = log['User_ID'].map(conversion)
+    return (times - log['Interaction_Time']).dt.total_seconds()
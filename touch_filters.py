@@ -0,0 +1,233 @@
+"""
+Touch Filter Rules
+Declarative rules for dropping touches before attribution, compiled to
+vectorized boolean masks over a columnar touch table. The Stories
+navigation filter becomes one rule among others:
+
+    rules = parse_rules([
+        {'name': 'stories_navigation', 'channel': 'Stories', 'max_seconds': 60},
+        {'name': 'push_open', 'channel': 'Push', 'max_seconds': 10},
+        {'name': 'banner_view', 'channel': 'Banner', 'where': {'Clicked': False}},
+        {'name': 'sms_repeat', 'channel': 'SMS', 'repeat_within_seconds': 3600},
+    ])
+    keep = RuleEvaluator(TouchTable.from_touches(touches)).keep_mask(rules)
+
+A rule drops the touches that satisfy all of its conditions; a touch is kept
+if no rule drops it. The derived columns the conditions share (last touch
+flags, gap to the previous same-channel touch) are computed once per table,
+and every rule's mask is cached by the rule's spec, so changing one rule
+re-evaluates only that rule.
+
+The two existing navigation filters differ and are kept as they are:
+app.py drops any Stories touch with time to conversion <= threshold
+(`app_navigation_rule`); marketing_dashboard.py drops a last-touch Stories
+with seconds < threshold (`dashboard_navigation_rule`).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from attribution_engine import ConversionTouches
+
+POSITIONS = ('any', 'first', 'last')
+# Cached per-rule masks per evaluator (slider moves create new rule specs)
+DEFAULT_MAX_CACHED_RULES = 64
+
+
+class TouchTable:
+    """
+    Columnar touch table the rules run on. One entry per touch, grouped by
+    journey and time ordered inside a journey:
+        channel: channel codes (registry `channels`)
+        journey: journey index of every touch
+        seconds: seconds from the touch to conversion (NaN where unknown)
+        time_ns: int64 touch timestamps, or None if the source has none
+        columns: {name: array} of extra per-touch attributes for `where`
+    """
+
+    def __init__(self, channels, channel, journey, n_journeys, seconds, time_ns=None, columns=None):
+        self.channels = channels
+        self.channel = np.asarray(channel)
+        self.journey = np.asarray(journey, dtype=np.int64)
+        self.n_journeys = n_journeys
+        self.seconds = np.asarray(seconds, dtype=np.float64)
+        self.time_ns = None if time_ns is None else np.asarray(time_ns, dtype=np.int64)
+        self.columns = dict(columns or {})
+        self._derived = {}
+
+    @classmethod
+    def from_touches(cls, touches):
+        """Touches of a ConversionTouches view (app.py interaction log)."""
+        return cls(touches.channels, touches.touch_channel, touches.touch_journey, touches.n_journeys,
+                   touches.time_to_conversion, touches.touch_time.astype('datetime64[ns]').view(np.int64),
+                   touches.touch_columns)
+
+    @classmethod
+    def from_batch(cls, batch, seconds_col='Time_To_Convert_Seconds'):
+        """
+        Touches of a JourneyBatch (marketing_dashboard.py). The per-journey
+        `seconds_col` is the time from the last touch to conversion, so only
+        last touches get seconds; there are no touch timestamps.
+        """
+        seg = batch.segment_ids()
+        is_last = batch.positions() == batch.lengths[seg] - 1
+        seconds = np.where(is_last, batch.columns[seconds_col][seg], np.nan) if len(seg) else np.zeros(0)
+        table = cls(batch.channels, batch.codes, seg, batch.n_journeys, seconds)
+        table._derived['is_last'] = is_last
+        return table
+
+    def __len__(self):
+        return len(self.channel)
+
+    @property
+    def is_first(self):
+        if 'is_first' not in self._derived:
+            first = np.ones(len(self), dtype=bool)
+            first[1:] = self.journey[1:] != self.journey[:-1]
+            self._derived['is_first'] = first
+        return self._derived['is_first']
+
+    @property
+    def is_last(self):
+        if 'is_last' not in self._derived:
+            last = np.ones(len(self), dtype=bool)
+            last[:-1] = self.journey[1:] != self.journey[:-1]
+            self._derived['is_last'] = last
+        return self._derived['is_last']
+
+    @property
+    def same_channel_gap(self):
+        """Seconds since the previous touch of the same channel in the same journey (inf if none)."""
+        if 'same_channel_gap' not in self._derived:
+            if self.time_ns is None:
+                raise ValueError("repeat_within_seconds needs touch timestamps (TouchTable.from_touches)")
+            order = np.lexsort((np.arange(len(self)), self.channel, self.journey))
+            journey, channel, time = self.journey[order], self.channel[order], self.time_ns[order]
+            gap = np.full(len(self), np.inf)
+            same = (journey[1:] == journey[:-1]) & (channel[1:] == channel[:-1])
+            gap[1:][same] = (time[1:][same] - time[:-1][same]) / 1e9
+            self._derived['same_channel_gap'] = np.empty(len(self))
+            self._derived['same_channel_gap'][order] = gap
+        return self._derived['same_channel_gap']
+
+
+class TouchRule:
+    """
+    One declarative drop rule; all given conditions must hold:
+        channel: channel name or list of names (None = every channel)
+        max_seconds: time to conversion <= max_seconds (< if inclusive=False)
+        position: 'any', 'first' or 'last' touch of the journey
+        where: {column: value or list of values} on TouchTable.columns
+        repeat_within_seconds: previous same-channel touch of the journey at most this long before
+    """
+
+    def __init__(self, name=None, channel=None, max_seconds=None, inclusive=True, position='any', where=None,
+                 repeat_within_seconds=None):
+        if position not in POSITIONS:
+            raise ValueError(f"position must be one of {POSITIONS}, got {position!r}")
+        self.name = name
+        self.channel = channel
+        self.max_seconds = max_seconds
+        self.inclusive = inclusive
+        self.position = position
+        self.where = dict(where or {})
+        self.repeat_within_seconds = repeat_within_seconds
+
+    @property
+    def key(self):
+        """Hashable spec of the rule (cache key); the name is only a label."""
+        channels = None if self.channel is None else tuple(np.atleast_1d(self.channel).tolist())
+        where = tuple(sorted((column, tuple(np.atleast_1d(value).tolist())) for column, value in self.where.items()))
+        return (channels, self.max_seconds, self.inclusive, self.position, where, self.repeat_within_seconds)
+
+    def to_dict(self):
+        spec = {'name': self.name, 'channel': self.channel, 'max_seconds': self.max_seconds,
+                'inclusive': self.inclusive, 'position': self.position, 'where': self.where,
+                'repeat_within_seconds': self.repeat_within_seconds}
+        return {k: v for k, v in spec.items() if v is not None and v != {}}
+
+    def __repr__(self):
+        return f"TouchRule({self.to_dict()})"
+
+    def mask(self, table):
+        """Boolean mask of the touches this rule drops."""
+        drop = np.ones(len(table), dtype=bool)
+        if self.channel is not None:
+            codes = [table.channels.get(name) for name in np.atleast_1d(self.channel).tolist()]
+            drop &= np.isin(table.channel, codes)
+        if self.position == 'first':
+            drop &= table.is_first
+        elif self.position == 'last':
+            drop &= table.is_last
+        if self.max_seconds is not None:
+            drop &= (table.seconds <= self.max_seconds) if self.inclusive else (table.seconds < self.max_seconds)
+        for column, value in self.where.items():
+            drop &= np.isin(table.columns[column], np.atleast_1d(value))
+        if self.repeat_within_seconds is not None:
+            drop &= table.same_channel_gap <= self.repeat_within_seconds
+        return drop
+
+
+def parse_rules(spec):
+    """Rules from a declarative spec: a list of TouchRule keyword dicts (e.g. loaded from JSON)."""
+    return [rule if isinstance(rule, TouchRule) else TouchRule(**rule) for rule in spec]
+
+
+def app_navigation_rule(navigation_threshold_seconds, channel='Stories'):
+    """app.py Navigation Filter: any `channel` touch within the threshold (inclusive) of conversion."""
+    return TouchRule('navigation', channel=channel, max_seconds=navigation_threshold_seconds)
+
+
+def dashboard_navigation_rule(navigation_threshold, channel='Stories'):
+    """marketing_dashboard.py Smart Model: a last-touch `channel` less than the threshold before conversion."""
+    return TouchRule('navigation', channel=channel, max_seconds=navigation_threshold, inclusive=False,
+                     position='last')
+
+
+class RuleEvaluator:
+    """
+    Evaluates rule sets on one TouchTable, caching each rule's mask by its
+    spec (LRU, `max_cached_rules`), so only new or changed rules are computed.
+    Safe to share between threads (e.g. Streamlit sessions via st.cache_resource).
+    """
+
+    def __init__(self, table, max_cached_rules=DEFAULT_MAX_CACHED_RULES):
+        if isinstance(table, ConversionTouches):
+            table = TouchTable.from_touches(table)
+        self.table = table
+        self.max_cached_rules = max_cached_rules
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+        self.evaluations = 0
+
+    def rule_mask(self, rule):
+        key = rule.key
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+
+        mask = rule.mask(self.table)
+        with self._lock:
+            self.evaluations += 1
+            self._masks[key] = mask
+            while len(self._masks) > self.max_cached_rules:
+                self._masks.popitem(last=False)
+        return mask
+
+    def drop_mask(self, rules):
+        """Touches dropped by any of the rules."""
+        drop = np.zeros(len(self.table), dtype=bool)
+        for rule in rules:
+            drop |= self.rule_mask(rule)
+        return drop
+
+    def keep_mask(self, rules):
+        return ~self.drop_mask(rules)
+
+    def drop_counts(self, rules):
+        """{rule name (or repr): touches it drops}, overlapping drops counted per rule."""
+        return {rule.name or repr(rule): int(self.rule_mask(rule).sum()) for rule in rules}